@@ -0,0 +1,284 @@
+"""
+Intent Router — cheap local triage in front of the ReAct agent.
+
+Rules catch the obvious cases (greetings, thanks, off-topic chatter) and
+answer them from templates. A small keyword/feature model scores the rest;
+confident single-tool intents run the tool directly and make one synthesis
+call. Anything ambiguous or coaching-heavy goes to the full ReAct loop.
+"""
+
+import json
+import re
+from agents.llm_router import generate
+from agents.react_agent import build_player_context, simple_fallback
+from tools.game_tools import execute_tool
+from tools.game_names import find_game_mentions
+from tools.compaction import compact_observation
+
+# Minimum score (and margin over the runner-up) for a tool intent to skip ReAct
+ROUTE_MIN_SCORE = 2.0
+ROUTE_MIN_MARGIN = 1.0
+
+GREETING_RE = re.compile(
+    r"^(hi+|hey+|hello+|yo+|sup|hiya|howdy|good (morning|afternoon|evening)|what'?s up)"
+    r"( there)?( nexus)?[\s!.,?]*$",
+    re.IGNORECASE,
+)
+THANKS_RE = re.compile(
+    r"^(thanks?( a lot| so much)?( you)?|thank you( so much)?|ty|thx|cheers|appreciate it)"
+    r"( nexus)?[\s!.,]*$",
+    re.IGNORECASE,
+)
+CAPABILITIES_RE = re.compile(
+    r"^(who are you|what are you|what can you do|help)[\s?!.]*$", re.IGNORECASE
+)
+SMALL_TALK_RE = re.compile(
+    r"^(how are you( doing)?|how'?s it going|what'?s new)[\s?!.]*$", re.IGNORECASE
+)
+
+GAMING_TERMS = {
+    "game", "games", "gaming", "play", "playing", "rank", "ranked", "elo", "meta", "build",
+    "builds", "champion", "champ", "agent", "hero", "main", "role", "duo", "team", "queue",
+    "patch", "tier", "mmr", "lane", "jungle", "support", "carry", "aim", "fps", "moba",
+    "rpg", "loadout", "weapon", "skin", "esports", "tilt", "climb", "steam", "console",
+}
+# Things inside a game — asking for a recommendation of one of these is coaching,
+# not game discovery, so it counts against the recommend intent
+IN_GAME_TERMS = {
+    "build", "builds", "champion", "champions", "champ", "champs", "agent", "agents",
+    "hero", "heroes", "main", "role", "lane", "jungle", "support", "carry", "loadout",
+    "loadouts", "weapon", "weapons", "skin", "skins", "item", "items", "rune", "runes",
+    "deck", "decks", "class", "spec", "talent", "talents", "comp", "strategy", "settings",
+}
+OFF_TOPIC_TERMS = {
+    "weather", "recipe", "cook", "cooking", "stock", "stocks", "crypto", "bitcoin",
+    "politics", "election", "president", "homework", "essay", "math", "equation",
+    "diet", "medicine", "doctor", "lawyer", "taxes", "dating", "relationship", "movie",
+    "movies", "song", "lyrics", "poem", "translate", "code", "python", "javascript",
+}
+
+OFF_TOPIC_REPLY = (
+    "I appreciate the chat, but I'm your gaming coach — let's keep the focus on your games! "
+    "What do you want to work on?"
+)
+
+# Linear keyword/feature model: intent → feature → weight
+FEATURE_WEIGHTS = {
+    "game_meta": {
+        "meta": 2.0, "tier": 1.5, "tier list": 1.0, "patch": 1.5, "strongest": 1.5,
+        "best": 0.8, "op": 1.0, "broken": 1.0, "top picks": 1.5, "right now": 0.5,
+        "one_game": 1.0, "personal": -1.5, "no_game": -3.0,
+    },
+    "game_info": {
+        "what is": 1.5, "tell me about": 2.0, "about": 0.5, "how long": 1.0,
+        "free to play": 1.5, "platforms": 1.5, "developer": 1.5, "worth it": 1.0,
+        "one_game": 1.0, "personal": -1.5, "no_game": -3.0,
+    },
+    # A bare "recommend"/"suggest" is not enough on its own: it also needs a
+    # discovery cue (games like, new game, ...) or to be about games at all
+    "recommend": {
+        "recommend": 1.0, "recommendation": 1.0, "suggest": 1.0, "similar": 1.5,
+        "games like": 2.0, "new game": 2.0, "what should i play": 2.5, "something like": 1.5,
+        "game_noun": 1.0, "in_game": -3.0, "two_games": -1.0,
+    },
+    "compare": {
+        "vs": 2.0, "versus": 2.0, "compare": 2.0, "difference": 1.5, "better": 0.5,
+        "or": 0.5, "two_games": 2.0, "no_game": -3.0, "one_game": -1.5,
+    },
+}
+
+# Words that signal a personal coaching conversation — these need the full agent
+PERSONAL_TERMS = {"i", "i'm", "im", "my", "me", "mine", "myself", "we", "our"}
+
+SYNTHESIS_INSTRUCTION = (
+    "You are Nexus, a gaming AI coach. Answer the player's message using the tool data "
+    "provided — it is LIVE and overrides your training knowledge. Reference their rank, "
+    "role and goals where relevant. 2-3 short paragraphs max, end with a next step or "
+    "question. Start your reply with a mood tag like [MOOD:excited]. Available moods: "
+    "happy, empathy, excited, thinking, curious, proud, frustrated, idle, playful, "
+    "intense, supportive, impressed."
+)
+
+
+def _features(text, games):
+    lowered = text.lower()
+    words = re.findall(r"[a-z0-9']+", lowered)
+    padded = " " + " ".join(words) + " "
+
+    features = {}
+    for weights in FEATURE_WEIGHTS.values():
+        for feature in weights:
+            if " " in feature or feature.isalpha():
+                if f" {feature} " in padded:
+                    features[feature] = 1.0
+
+    features["no_game"] = 1.0 if not games else 0.0
+    features["one_game"] = 1.0 if len(games) == 1 else 0.0
+    features["two_games"] = 1.0 if len(games) == 2 else 0.0
+    features["personal"] = 1.0 if PERSONAL_TERMS & set(words) else 0.0
+    features["game_noun"] = 1.0 if {"game", "games"} & set(words) else 0.0
+    features["in_game"] = 1.0 if IN_GAME_TERMS & set(words) else 0.0
+    return features, set(words)
+
+
+def classify_intent(message, user_data=None):
+    """
+    Classify a message without calling the LLM.
+
+    Returns {"intent", "score", "games"}. Intents: greeting, thanks, capabilities,
+    small_talk, off_topic, game_meta, game_info, recommend, compare, agent.
+    """
+    text = message.strip()
+    profile = (user_data or {}).get("profile") or {}
+    games = find_game_mentions(text, profile.get("favorite_games", []))
+
+    for intent, pattern in (
+        ("greeting", GREETING_RE),
+        ("thanks", THANKS_RE),
+        ("capabilities", CAPABILITIES_RE),
+        ("small_talk", SMALL_TALK_RE),
+    ):
+        if pattern.match(text):
+            return {"intent": intent, "score": 1.0, "games": games}
+
+    features, words = _features(text, games)
+
+    if not games and not (GAMING_TERMS & words) and (OFF_TOPIC_TERMS & words):
+        return {"intent": "off_topic", "score": 1.0, "games": games}
+
+    scores = {
+        intent: sum(weight * features.get(feature, 0.0) for feature, weight in weights.items())
+        for intent, weights in FEATURE_WEIGHTS.items()
+    }
+    ranked = sorted(scores.items(), key=lambda kv: kv[1], reverse=True)
+    best, best_score = ranked[0]
+    runner_up = ranked[1][1] if len(ranked) > 1 else 0.0
+
+    if best_score >= ROUTE_MIN_SCORE and best_score - runner_up >= ROUTE_MIN_MARGIN:
+        return {"intent": best, "score": round(best_score, 2), "games": games}
+    return {"intent": "agent", "score": round(best_score, 2), "games": games}
+
+
+def _tool_call_for(route, user_data):
+    """Map a routed intent to a single (tool_name, params), or None."""
+    games = route["games"]
+    intent = route["intent"]
+
+    if intent == "game_meta" and len(games) == 1:
+        return "search_game_info", {"game": games[0], "query_type": "meta"}
+    if intent == "game_info" and len(games) == 1:
+        return "search_game_info", {"game": games[0], "query_type": "general"}
+    if intent == "compare" and len(games) == 2:
+        return "compare_games", {"game1": games[0], "game2": games[1]}
+    if intent == "recommend" and len(games) <= 1:
+        favorites = ((user_data or {}).get("profile") or {}).get("favorite_games", [])
+        based_on = games[0] if games else (favorites[0] if favorites else None)
+        if based_on:
+            return "recommend_games", {"based_on": based_on}
+    return None
+
+
+def _templated_reply(intent, user_data, username):
+    profile = (user_data or {}).get("profile") or {}
+    games = profile.get("favorite_games", [])
+    main_game = games[0] if games else None
+
+    if intent == "greeting":
+        if main_game:
+            return (
+                f"Hey {username}! Good to see you. Want to pick up where we left off on "
+                f"{main_game}, or is there something new on your mind?"
+            ), "happy"
+        return (
+            f"Hey {username}! I'm Nexus, your gaming coach. What are you playing right now?"
+        ), "happy"
+    if intent == "thanks":
+        return (
+            f"Anytime, {username}! Go put it into practice — and tell me how it goes. "
+            f"What do you want to tackle next?"
+        ), "proud"
+    if intent == "capabilities":
+        return (
+            f"I'm Nexus, your gaming coach, {username}. I can pull up the live meta for any "
+            f"game, compare games, recommend new ones that fit how you play, and build you a "
+            f"plan to climb or improve. Where do you want to start?"
+        ), "excited"
+    if intent == "off_topic":
+        return OFF_TOPIC_REPLY, "playful"
+    return None, None
+
+
+def _synthesize(user_message, conversation_history, user_data, username, observation):
+    prompt = (
+        f"{build_player_context(user_data, username)}\n\n"
+        f"TOOL DATA:\n{observation}\n\n"
+        f"PLAYER MESSAGE:\n{user_message}"
+    )
+    response = generate(
+        "fast_path",
+        (conversation_history or [])[-4:] + [prompt],
+        config={
+            "system_instruction": SYNTHESIS_INSTRUCTION,
+            "temperature": 0.7,
+            "max_output_tokens": 500,
+        },
+    )
+    answer = response.text.strip()
+    mood = "idle"
+    mood_match = re.match(r"^\[MOOD:(\w+)\]\s*", answer)
+    if mood_match:
+        mood = mood_match.group(1).lower()
+        answer = answer[mood_match.end() :].strip()
+    return answer, mood
+
+
+def run_fast_path(
+    user_message, conversation_history=None, user_data=None, username="Player", session_id=None
+):
+    """
+    Answer a message without the ReAct loop when the intent is clear.
+
+    Returns a result dict shaped like run_react_agent's, or None when the
+    message should go to the full agent.
+    """
+    route = classify_intent(user_message, user_data)
+    intent = route["intent"]
+    trace = [{"type": "route", "content": f"{intent} ({route['score']})"}]
+
+    reply, mood = _templated_reply(intent, user_data, username)
+    if reply:
+        trace.append({"type": "answer", "content": reply[:100] + "..."})
+        return {"response": reply, "mood": mood, "reasoning_trace": trace, "tools_used": []}
+
+    if intent == "small_talk":
+        reply = simple_fallback((conversation_history or []) + [user_message], username)
+        return {"response": reply, "mood": "happy", "reasoning_trace": trace, "tools_used": []}
+
+    call = _tool_call_for(route, user_data)
+    if not call:
+        return None
+
+    tool_name, params = call
+    tool_call = f"{tool_name}({json.dumps(params)})"
+    trace.append({"type": "tool_call", "content": tool_call})
+
+    tool_result = execute_tool(tool_name, params, user_data=user_data, session_id=session_id)
+    observation, compaction = compact_observation(tool_name, tool_result)
+    trace.append(
+        {
+            "type": "observation",
+            "content": observation[:300] + "...",
+            "saved_bytes": compaction["saved_bytes"],
+        }
+    )
+
+    try:
+        answer, mood = _synthesize(
+            user_message, conversation_history, user_data, username, observation
+        )
+    except Exception as e:
+        print(f"[WARN] Fast-path synthesis failed, handing off to agent: {e}")
+        return None
+
+    trace.append({"type": "answer", "content": answer[:100] + "..."})
+    return {"response": answer, "mood": mood, "reasoning_trace": trace, "tools_used": [tool_call]}
@@ -0,0 +1,168 @@
+"""
+LLM Router — per-call-site model routing with hedged requests.
+
+Every Gemini call names its call site. The site decides the model tier and
+the latency SLO. When a primary request runs past the site's hedge threshold
+(its observed p95, capped by the SLO), a duplicate request is fired and
+whichever finishes first wins. Hedges are rate-limited by a per-site budget
+and the losing request is cancelled if it hasn't started, or ignored if it has.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from google import genai
+from config import GEMINI_API_KEY
+
+client = genai.Client(api_key=GEMINI_API_KEY)
+
+MODEL_TIERS = {
+    "standard": os.getenv("LLM_MODEL_STANDARD", "gemini-2.0-flash"),
+    "light": os.getenv("LLM_MODEL_LIGHT", "gemini-2.0-flash-lite"),
+}
+
+# site → tier, latency SLO and whether a slow primary may be hedged.
+# Background sites never hedge: nobody is waiting on them.
+CALL_SITES = {
+    "agent_step": {"tier": "standard", "slo_ms": 6000, "hedge": True},
+    "fast_path": {"tier": "standard", "slo_ms": 5000, "hedge": True},
+    "simple_fallback": {"tier": "standard", "slo_ms": 4000, "hedge": True},
+    "welcome": {"tier": "standard", "slo_ms": 5000, "hedge": True},
+    "tip": {"tier": "light", "slo_ms": 3000, "hedge": True},
+    "recommendations": {"tier": "standard", "slo_ms": 6000, "hedge": True},
+    "guide": {"tier": "standard", "slo_ms": 8000, "hedge": True},
+    "data_fetcher": {"tier": "standard", "slo_ms": 6000, "hedge": True},
+    "build_ai_profile": {"tier": "standard", "slo_ms": 10000, "hedge": False},
+    "evolve_profile": {"tier": "light", "slo_ms": 10000, "hedge": False},
+    "evolve_batch": {"tier": "light", "slo_ms": 30000, "hedge": False},
+}
+DEFAULT_SITE = {"tier": "standard", "slo_ms": 6000, "hedge": False}
+
+HEDGE_BUDGET_RATIO = 0.1      # hedges per primary request, per site
+HEDGE_BUDGET_BURST = 2        # hedges allowed before the ratio kicks in
+HEDGE_MIN_SAMPLES = 20        # p95 needs this many samples before it replaces the SLO
+LATENCY_WINDOW = 200
+
+_pool = ThreadPoolExecutor(max_workers=32, thread_name_prefix="llm")
+
+
+class _SiteStats:
+    def __init__(self):
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.requests = 0
+        self.errors = 0
+        self.hedges_fired = 0
+        self.hedges_won = 0
+        self.hedges_skipped = 0
+
+    def percentile(self, pct):
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def _site_stats(site):
+    with _stats_lock:
+        if site not in _stats:
+            _stats[site] = _SiteStats()
+        return _stats[site]
+
+
+def model_for(site):
+    """Model name a call site routes to."""
+    return MODEL_TIERS[CALL_SITES.get(site, DEFAULT_SITE)["tier"]]
+
+
+def _hedge_threshold_ms(site, stats):
+    slo = CALL_SITES.get(site, DEFAULT_SITE)["slo_ms"]
+    with _stats_lock:
+        if len(stats.latencies) < HEDGE_MIN_SAMPLES:
+            return slo
+        return min(slo, stats.percentile(95))
+
+
+def _take_hedge_budget(stats):
+    with _stats_lock:
+        allowed = stats.hedges_fired < HEDGE_BUDGET_BURST + stats.requests * HEDGE_BUDGET_RATIO
+        if allowed:
+            stats.hedges_fired += 1
+        else:
+            stats.hedges_skipped += 1
+        return allowed
+
+
+def _call(model, contents, config):
+    start = time.perf_counter()
+    response = client.models.generate_content(model=model, contents=contents, config=config)
+    return response, (time.perf_counter() - start) * 1000
+
+
+def generate(site, contents, config=None, model=None):
+    """
+    generate_content routed by call site, hedged when the primary is slow.
+
+    Raises whatever the underlying call raised if every attempt fails.
+    """
+    settings = CALL_SITES.get(site, DEFAULT_SITE)
+    model = model or MODEL_TIERS[settings["tier"]]
+    stats = _site_stats(site)
+    with _stats_lock:
+        stats.requests += 1
+
+    primary = _pool.submit(_call, model, contents, config)
+    attempts = [primary]
+
+    if settings["hedge"]:
+        threshold = _hedge_threshold_ms(site, stats) / 1000
+        done, _ = wait([primary], timeout=threshold)
+        if not done and _take_hedge_budget(stats):
+            attempts.append(_pool.submit(_call, model, contents, config))
+
+    pending = set(attempts)
+    error = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            try:
+                response, elapsed_ms = future.result()
+            except Exception as e:
+                error = e
+                continue
+
+            for loser in pending:
+                loser.cancel()
+            with _stats_lock:
+                stats.latencies.append(elapsed_ms)
+                if future is not primary:
+                    stats.hedges_won += 1
+            return response
+
+    with _stats_lock:
+        stats.errors += 1
+    raise error
+
+
+def get_router_stats():
+    """Per-site request, latency and hedge counters."""
+    with _stats_lock:
+        report = {}
+        for site, stats in _stats.items():
+            p50, p95 = stats.percentile(50), stats.percentile(95)
+            report[site] = {
+                "model": model_for(site),
+                "requests": stats.requests,
+                "errors": stats.errors,
+                "p50_ms": round(p50, 1) if p50 is not None else None,
+                "p95_ms": round(p95, 1) if p95 is not None else None,
+                "hedges_fired": stats.hedges_fired,
+                "hedges_won": stats.hedges_won,
+                "hedges_skipped_budget": stats.hedges_skipped,
+            }
+        return report
@@ -4,13 +4,39 @@ Profile Intelligence — builds and evolves AI understanding of the player.
 Two main functions:
   1. build_ai_profile()  — called after signup, generates a deep player analysis
   2. evolve_profile()    — called after conversations, extracts new insights
+
+Evolution is incremental: callers pass only the messages since the user's
+watermark, the prompt carries a compact digest rather than the full
+ai_profile, and a local heuristic skips the LLM when nothing in the new
+messages could change the profile.
 """
 
 import json
-from google import genai
-from config import GEMINI_API_KEY
+import re
+from agents.llm_router import generate
+from tools.game_names import find_game_mentions
+
+EVOLVE_MAX_MESSAGES = 12       # newest user messages considered per evolution
+EVOLVE_MESSAGE_CHARS = 300
+PROFILE_DIGEST_CHARS = 600
+DIGEST_FIELD_CHARS = 160
+DIGEST_FIELDS = [
+    "player_archetype", "personality_notes", "skill_assessment", "growth_areas",
+    "recent_mood", "discovered_interests", "conversation_hooks",
+]
 
-client = genai.Client(api_key=GEMINI_API_KEY)
+PROFILE_SIGNAL_MIN_WORDS = 4
+PROFILE_SIGNAL_TERMS = {
+    "main", "maining", "rank", "ranked", "elo", "mmr", "hardstuck", "stuck", "climb",
+    "climbing", "demoted", "promoted", "tilt", "tilted", "frustrated", "burnout",
+    "goal", "goals", "improve", "casual", "competitive", "grind", "grinding", "hours",
+    "duo", "team", "role", "playstyle", "started", "quit", "switched", "favorite",
+    "love", "hate", "enjoy", "struggle", "struggling", "weak", "bad", "good",
+}
+PROFILE_SIGNAL_PHRASES = (
+    "i main", "i play", "i'm a", "im a", "i am a", "my rank", "my main", "my team",
+    "i want to", "i've been", "ive been", "i usually", "i prefer", "i'm new", "i just",
+)
 
 
 def build_ai_profile(profile_data, username):
@@ -59,9 +85,9 @@ def build_ai_profile(profile_data, username):
         profile_text += f"GOALS (what they want help with): {', '.join(readable)}\n"
 
     try:
-        response = client.models.generate_content(
-            model="gemini-2.0-flash",
-            contents=[
+        response = generate(
+            "build_ai_profile",
+            [
                 f"You are an expert gaming coach analyst. Based on this player profile, write a "
                 f"coaching analysis in JSON format. This will be used by a gaming AI coach to "
                 f"deeply understand and ACTIVELY HELP this player reach their goals.\n\n"
@@ -181,9 +207,9 @@ def generate_welcome_message(profile_data, ai_profile, username):
         )
 
     try:
-        response = client.models.generate_content(
-            model="gemini-2.0-flash",
-            contents=[
+        response = generate(
+            "welcome",
+            [
                 f"You are Nexus, a gaming AI coach. This player just signed up and this is your "
                 f"FIRST message to them. You are NOT a passive assistant — you are their coach "
                 f"who has already studied their file and is ready to work.\n\n"
@@ -206,82 +232,124 @@ def generate_welcome_message(profile_data, ai_profile, username):
         return response.text.strip()
     except Exception as e:
         print(f"[WARN] Welcome message generation failed: {e}")
-        if games and goals:
-            goal_text = "climb the ranks" if "rank" in goals else "level up your game"
-            return (
-                f"Hey {username}! I've got your profile loaded — "
-                f"{ranks.get(games[0], '')} {roles.get(games[0], '')} in {games[0]}. "
-                f"You said you want to {goal_text}, so let's get to work. "
-                f"What's the biggest thing holding you back right now?"
-            )
-        return f"Hey {username}! I'm Nexus, your gaming coach. Tell me what you're working on and let's get started."
-
-
-def evolve_profile(user_id, conversation_messages, existing_ai_profile):
+        return fallback_welcome_message(profile_data, username)
+
+
+def fallback_welcome_message(profile_data, username):
+    """Templated welcome used when the AI welcome isn't available."""
+    games = profile_data.get("favorite_games", [])
+    ranks = profile_data.get("ranks", {})
+    roles = profile_data.get("main_roles", {})
+    goals = profile_data.get("goals", [])
+
+    if games and goals:
+        goal_text = "climb the ranks" if "rank" in goals else "level up your game"
+        return (
+            f"Hey {username}! I've got your profile loaded — "
+            f"{ranks.get(games[0], '')} {roles.get(games[0], '')} in {games[0]}. "
+            f"You said you want to {goal_text}, so let's get to work. "
+            f"What's the biggest thing holding you back right now?"
+        )
+    return f"Hey {username}! I'm Nexus, your gaming coach. Tell me what you're working on and let's get started."
+
+
+def has_profile_signal(messages):
     """
-    After a conversation, extract new insights about the player.
-    Returns updated ai_profile or None if no meaningful update.
+    Cheap local check for whether new messages could change the profile.
+
+    Game mentions, self-descriptions ("I main...", "my rank") and goal or
+    mood words count as signal; short chatter and pure questions don't.
     """
-    if len(conversation_messages) < 4:
-        return None
+    for text in messages:
+        lowered = text.lower()
+        words = set(re.findall(r"[a-z0-9']+", lowered))
+        if len(words) < PROFILE_SIGNAL_MIN_WORDS:
+            continue
+        if find_game_mentions(text):
+            return True
+        if words & PROFILE_SIGNAL_TERMS:
+            return True
+        if any(phrase in lowered for phrase in PROFILE_SIGNAL_PHRASES):
+            return True
+    return False
+
+
+def profile_digest(ai_profile, max_chars=PROFILE_DIGEST_CHARS):
+    """Compact, bounded text view of an ai_profile for evolution prompts."""
+    if not ai_profile:
+        return "(no profile yet)"
+    lines = []
+    for field in DIGEST_FIELDS:
+        value = ai_profile.get(field)
+        if not value:
+            continue
+        if isinstance(value, list):
+            value = ", ".join(str(v) for v in value[:5])
+        lines.append(f"{field}: {str(value)[:DIGEST_FIELD_CHARS]}")
+    return "\n".join(lines)[:max_chars] or "(no profile yet)"
+
 
-    # Get the last few user messages
-    user_msgs = [m["content"] for m in conversation_messages if m.get("role") == "user"][-5:]
-    if not user_msgs:
+def parse_insights(text):
+    """Parse the model's JSON reply, tolerating markdown fences."""
+    text = text.strip()
+    if text.startswith("```"):
+        text = text.split("\n", 1)[1] if "\n" in text else text[3:]
+    if text.endswith("```"):
+        text = text[:-3]
+    return json.loads(text.strip())
+
+
+def merge_insights(existing_ai_profile, insights):
+    """Fold extracted insights into a copy of the ai_profile; None if nothing new."""
+    if not insights or all(not v for v in insights.values()):
         return None
 
-    conversation_text = "\n".join(f"- {msg}" for msg in user_msgs)
-    existing_notes = json.dumps(existing_ai_profile) if existing_ai_profile else "{}"
+    updated = dict(existing_ai_profile) if existing_ai_profile else {}
+    if insights.get("updated_personality_notes"):
+        updated["personality_notes"] = insights["updated_personality_notes"]
+    if insights.get("mood_pattern"):
+        updated["recent_mood"] = insights["mood_pattern"]
+    if insights.get("topics_to_follow_up"):
+        existing_hooks = updated.get("conversation_hooks", [])
+        updated["conversation_hooks"] = (insights["topics_to_follow_up"] + existing_hooks)[:8]
+    if insights.get("new_interests"):
+        existing_interests = updated.get("discovered_interests", [])
+        updated["discovered_interests"] = list(set(existing_interests + insights["new_interests"]))[:10]
+    if insights.get("skill_observations"):
+        updated["skill_assessment"] = insights["skill_observations"]
+    return updated
 
-    try:
-        response = client.models.generate_content(
-            model="gemini-2.0-flash",
-            contents=[
-                f"You are analyzing a gamer's recent messages to update their player profile.\n\n"
-                f"Existing profile analysis:\n{existing_notes}\n\n"
-                f"Recent messages from the player:\n{conversation_text}\n\n"
-                f"Extract any NEW insights about this player. Only include fields that have "
-                f"genuinely new information. Respond with JSON:\n"
-                f'{{"new_interests": ["any new games or topics they mentioned"],\n'
-                f'"mood_pattern": "their general mood/attitude in these messages",\n'
-                f'"skill_observations": "anything revealed about their skill level",\n'
-                f'"updated_personality_notes": "refined understanding of their personality",\n'
-                f'"topics_to_follow_up": ["specific things to remember for next time"]}}\n'
-                f"Respond ONLY with valid JSON. If nothing new to add, respond with {{}}"
-            ],
-            config={"temperature": 0.3, "max_output_tokens": 300},
-        )
 
-        text = response.text.strip()
-        if text.startswith("```"):
-            text = text.split("\n", 1)[1] if "\n" in text else text[3:]
-        if text.endswith("```"):
-            text = text[:-3]
-        text = text.strip()
+def evolve_profile(user_id, new_messages, existing_ai_profile):
+    """
+    Extract new insights from the player's messages since the last evolution.
+
+    new_messages are the user's message texts, oldest first. Returns the
+    updated ai_profile, or None if there was nothing meaningful to add.
+    LLM and JSON errors propagate so the caller can retry the same messages.
+    """
+    new_messages = [m for m in new_messages if m and m.strip()][-EVOLVE_MAX_MESSAGES:]
+    if not has_profile_signal(new_messages):
+        return None
 
-        insights = json.loads(text)
-
-        # Only update if there's actual content
-        if not insights or all(not v for v in insights.values()):
-            return None
-
-        # Merge with existing
-        updated = dict(existing_ai_profile) if existing_ai_profile else {}
-        if insights.get("updated_personality_notes"):
-            updated["personality_notes"] = insights["updated_personality_notes"]
-        if insights.get("mood_pattern"):
-            updated["recent_mood"] = insights["mood_pattern"]
-        if insights.get("topics_to_follow_up"):
-            existing_hooks = updated.get("conversation_hooks", [])
-            updated["conversation_hooks"] = (insights["topics_to_follow_up"] + existing_hooks)[:8]
-        if insights.get("new_interests"):
-            existing_interests = updated.get("discovered_interests", [])
-            updated["discovered_interests"] = list(set(existing_interests + insights["new_interests"]))[:10]
-        if insights.get("skill_observations"):
-            updated["skill_assessment"] = insights["skill_observations"]
-
-        return updated
+    conversation_text = "\n".join(f"- {msg[:EVOLVE_MESSAGE_CHARS]}" for msg in new_messages)
+
+    response = generate(
+        "evolve_profile",
+        [
+            f"You are analyzing a gamer's recent messages to update their player profile.\n\n"
+            f"Current profile (summary):\n{profile_digest(existing_ai_profile)}\n\n"
+            f"New messages from the player:\n{conversation_text}\n\n"
+            f"Extract any NEW insights about this player. Only include fields that have "
+            f"genuinely new information. Respond with JSON:\n"
+            f'{{"new_interests": ["any new games or topics they mentioned"],\n'
+            f'"mood_pattern": "their general mood/attitude in these messages",\n'
+            f'"skill_observations": "anything revealed about their skill level",\n'
+            f'"updated_personality_notes": "refined understanding of their personality",\n'
+            f'"topics_to_follow_up": ["specific things to remember for next time"]}}\n'
+            f"Respond ONLY with valid JSON. If nothing new to add, respond with {{}}"
+        ],
+        config={"temperature": 0.3, "max_output_tokens": 300},
+    )
+    return merge_insights(existing_ai_profile, parse_insights(response.text))
 
-    except Exception as e:
-        print(f"[WARN] Profile evolution failed: {e}")
-        return None
\ No newline at end of file
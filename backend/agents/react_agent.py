@@ -6,13 +6,20 @@ The agent now receives both raw profile data AND the AI-generated
 player analysis for deeply personalized responses.
 """
 
+import hashlib
 import json
 import re
-from google import genai
-from config import GEMINI_API_KEY
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from google.genai import types
+from config import GEMINI_CONTEXT_CACHE, GEMINI_CONTEXT_CACHE_TTL_SECONDS
+from agents.llm_router import client, generate, model_for
 from tools.game_tools import TOOL_DEFINITIONS, execute_tool
+from tools.compaction import compact_observation
+from tools.game_names import canonical_game_name, find_game_mentions
 
-client = genai.Client(api_key=GEMINI_API_KEY)
 
 REACT_SYSTEM_PROMPT = """You are Nexus, an expert gaming AI COACH — not a passive assistant.
 
@@ -23,12 +30,6 @@ CRITICAL IDENTITY:
 You have access to these tools that fetch LIVE, CURRENT data:
 {tools}
 
-=== PLAYER PROFILE ===
-{profile}
-
-=== YOUR DEEPER ANALYSIS ===
-{ai_analysis}
-
 === COACHING PHILOSOPHY ===
 
 You are NOT a chatbot that waits for questions. You are a COACH who:
@@ -93,6 +94,20 @@ FINAL_ANSWER:
 [MOOD:playful]
 I appreciate the chat, but I'm your gaming coach — let's keep the focus on your games! What do you want to work on?"""
 
+# Per-user section, appended after the static prefix so the prefix stays byte-identical
+PLAYER_CONTEXT_TEMPLATE = """=== PLAYER PROFILE ===
+{profile}
+
+=== YOUR DEEPER ANALYSIS ===
+{ai_analysis}"""
+
+PLAYER_BLOCK_CACHE_SIZE = 512
+
+# Speculative prefetch budget
+PREFETCH_GAMES_PER_TURN = 2
+PREFETCH_MAX_IN_FLIGHT = 4       # process-wide cap on speculative fetches
+PREFETCH_WAIT_SECONDS = 20       # how long a hit may wait on an unfinished fetch
+
 
 def build_tools_description():
     lines = []
@@ -191,6 +206,213 @@ def build_ai_analysis_block(user_data):
     return "\n".join(parts) if parts else "(No analysis yet)"
 
 
+# ── Prompt assembly ─────────────────────────────────────────────
+
+# Static parts never change while the process runs — build them once
+TOOLS_DESCRIPTION = build_tools_description()
+STATIC_SYSTEM_PROMPT = REACT_SYSTEM_PROMPT.format(tools=TOOLS_DESCRIPTION)
+
+_player_blocks = OrderedDict()
+_player_blocks_lock = threading.Lock()
+
+_prefix_cache = {"name": None, "expires_at": 0.0, "retry_at": 0.0, "creating": False}
+_prefix_cache_lock = threading.Lock()
+
+
+def _profile_stamp(user_data):
+    """Version stamp for the profile + AI analysis a player block is built from."""
+    if not user_data:
+        return "anonymous"
+    if user_data.get("profile_version") is not None:
+        return f"v{user_data['profile_version']}"
+    payload = json.dumps(
+        [user_data.get("profile"), user_data.get("ai_profile")], sort_keys=True, default=str
+    )
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def build_player_context(user_data, username):
+    """Profile + analysis section of the prompt, memoized by profile version stamp."""
+    user_id = user_data.get("_id") if user_data else None
+    key = (str(user_id), username, _profile_stamp(user_data))
+
+    with _player_blocks_lock:
+        block = _player_blocks.get(key)
+        if block is not None:
+            _player_blocks.move_to_end(key)
+            return block
+
+    block = PLAYER_CONTEXT_TEMPLATE.format(
+        profile=build_profile_block(user_data, username),
+        ai_analysis=build_ai_analysis_block(user_data),
+    )
+
+    with _player_blocks_lock:
+        _player_blocks[key] = block
+        while len(_player_blocks) > PLAYER_BLOCK_CACHE_SIZE:
+            _player_blocks.popitem(last=False)
+    return block
+
+
+def _get_prefix_cache_name():
+    """
+    Return the name of a server-side cache holding STATIC_SYSTEM_PROMPT, or None.
+
+    Creation failures (prompt below the model's minimum cacheable size, quota,
+    unsupported model) back off for ten minutes and fall through to sending the
+    full prompt, which still benefits from implicit prefix caching.
+
+    One caller creates the cache, outside the lock; the others meanwhile use
+    the old cache while it is still live, or the full prompt.
+    """
+    if not GEMINI_CONTEXT_CACHE:
+        return None
+
+    now = time.time()
+    with _prefix_cache_lock:
+        name = _prefix_cache["name"] if now < _prefix_cache["expires_at"] else None
+        if name and now < _prefix_cache["expires_at"] - 60:
+            return name
+        if _prefix_cache["creating"] or now < _prefix_cache["retry_at"]:
+            return name
+        _prefix_cache["creating"] = True
+
+    try:
+        cache = client.caches.create(
+            model=model_for("agent_step"),
+            config=types.CreateCachedContentConfig(
+                display_name="nexus-react-prefix",
+                system_instruction=STATIC_SYSTEM_PROMPT,
+                ttl=f"{GEMINI_CONTEXT_CACHE_TTL_SECONDS}s",
+            ),
+        )
+    except Exception as e:
+        print(f"[WARN] Context cache unavailable, sending full prompt: {e}")
+        with _prefix_cache_lock:
+            _prefix_cache.update(name=None, retry_at=now + 600, creating=False)
+        return None
+
+    with _prefix_cache_lock:
+        _prefix_cache.update(
+            name=cache.name, expires_at=now + GEMINI_CONTEXT_CACHE_TTL_SECONDS, creating=False
+        )
+    return cache.name
+
+
+def _invalidate_prefix_cache():
+    with _prefix_cache_lock:
+        _prefix_cache.update(name=None, expires_at=0.0)
+
+
+def _generate_agent_step(messages, player_context):
+    """One ReAct step. Uses the cached static prefix when available."""
+    generation = {"temperature": 0.7, "max_output_tokens": 600}
+
+    cache_name = _get_prefix_cache_name()
+    if cache_name:
+        # Cached content can't be combined with system_instruction, so the
+        # per-user section rides along as a leading context turn instead.
+        contents = [
+            {"role": "user", "parts": [{"text": player_context}]},
+            {"role": "model", "parts": [{"text": "Understood — I have their profile."}]},
+        ] + messages
+        try:
+            return generate(
+                "agent_step",
+                contents,
+                config={"cached_content": cache_name, **generation},
+            )
+        except Exception as e:
+            print(f"[WARN] Cached prompt call failed, retrying uncached: {e}")
+            _invalidate_prefix_cache()
+
+    return generate(
+        "agent_step",
+        messages,
+        config={
+            "system_instruction": f"{STATIC_SYSTEM_PROMPT}\n\n{player_context}",
+            **generation,
+        },
+    )
+
+
+# ── Speculative prefetch ────────────────────────────────────────
+
+_prefetch_pool = ThreadPoolExecutor(max_workers=PREFETCH_MAX_IN_FLIGHT, thread_name_prefix="prefetch")
+_prefetch_slots = threading.BoundedSemaphore(PREFETCH_MAX_IN_FLIGHT)
+_prefetch_stats = {"issued": 0, "hits": 0, "misses": 0, "wasted": 0, "over_budget": 0}
+_prefetch_stats_lock = threading.Lock()
+
+
+def _count_prefetch(stat, amount=1):
+    with _prefetch_stats_lock:
+        _prefetch_stats[stat] += amount
+
+
+def get_prefetch_stats():
+    """Counters for speculative prefetch, including hit rate over issued fetches."""
+    with _prefetch_stats_lock:
+        stats = dict(_prefetch_stats)
+    stats["hit_rate"] = round(stats["hits"] / stats["issued"], 3) if stats["issued"] else 0.0
+    return stats
+
+
+class SpeculativePrefetch:
+    """
+    Warms search_game_info(game, "meta") for games the first step will likely ask about.
+
+    Games named in the message come first, then the player's favorites. Fetches
+    run alongside the first Gemini call; if the model then requests one of them
+    the observation is taken from memory instead of fetching again.
+    """
+
+    def __init__(self, user_message, user_data, session_id=None):
+        favorites = ((user_data or {}).get("profile") or {}).get("favorite_games", [])
+        games = find_game_mentions(user_message, favorites) or favorites[:1]
+        self.games = games[:PREFETCH_GAMES_PER_TURN]
+        self.user_data = user_data
+        self.session_id = session_id
+        self._futures = {}
+
+    def start(self):
+        for game in self.games:
+            if not _prefetch_slots.acquire(blocking=False):
+                _count_prefetch("over_budget")
+                continue
+            params = {"game": game, "query_type": "meta"}
+            future = _prefetch_pool.submit(
+                execute_tool, "search_game_info", params, self.user_data, self.session_id
+            )
+            future.add_done_callback(lambda _: _prefetch_slots.release())
+            self._futures[game.lower()] = future
+            _count_prefetch("issued")
+        return self
+
+    def take(self, tool_name, params):
+        """Return the prefetched result matching this tool call, or None."""
+        if tool_name != "search_game_info" or params.get("query_type", "meta") != "meta":
+            return None
+        key = canonical_game_name(params.get("game", "")).lower()
+        future = self._futures.pop(key, None)
+        if future is None:
+            _count_prefetch("misses")
+            return None
+        try:
+            result = future.result(timeout=PREFETCH_WAIT_SECONDS)
+        except (FutureTimeout, Exception) as e:
+            print(f"[WARN] Prefetch for {key} unusable: {e}")
+            _count_prefetch("misses")
+            return None
+        _count_prefetch("hits")
+        return result
+
+    def finish(self):
+        """Record prefetches the model never asked for."""
+        if self._futures:
+            _count_prefetch("wasted", len(self._futures))
+            self._futures.clear()
+
+
 def parse_agent_response(text):
     lines = text.strip().split("\n")
     result = {"thought": None, "action": None, "action_input": None, "final_answer": None}
@@ -249,9 +471,9 @@ def strip_react_internals(text):
 
 def simple_fallback(messages, username):
     try:
-        response = client.models.generate_content(
-            model="gemini-2.0-flash",
-            contents=messages,
+        response = generate(
+            "simple_fallback",
+            messages,
             config={
                 "system_instruction": (
                     f"You are Nexus, a gaming AI companion. The user's name is {username}. "
@@ -268,113 +490,112 @@ def simple_fallback(messages, username):
 
 
 def run_react_agent(
-    user_message, conversation_history=None, user_data=None, username="Player", max_steps=4
+    user_message,
+    conversation_history=None,
+    user_data=None,
+    username="Player",
+    max_steps=4,
+    session_id=None,
 ):
     if conversation_history is None:
         conversation_history = []
 
-    tools_desc = build_tools_description()
-    profile_block = build_profile_block(user_data, username)
-    ai_analysis_block = build_ai_analysis_block(user_data)
-
-    system_prompt = REACT_SYSTEM_PROMPT.format(
-        tools=tools_desc,
-        profile=profile_block,
-        ai_analysis=ai_analysis_block,
-    )
+    player_context = build_player_context(user_data, username)
 
     messages = conversation_history + [user_message]
     reasoning_trace = []
 
-    for step in range(max_steps):
-        try:
-            response = client.models.generate_content(
-                model="gemini-2.0-flash",
-                contents=messages,
-                config={
-                    "system_instruction": system_prompt,
-                    "temperature": 0.7,
-                    "max_output_tokens": 600,
-                },
-            )
-        except Exception as e:
-            print(f"[ERROR] Gemini API call failed: {e}")
-            return {
-                "response": "I'm having trouble connecting right now. Try again in a moment.",
-                "mood": "empathy",
-                "reasoning_trace": reasoning_trace,
-                "tools_used": [],
-            }
-
-        agent_text = response.text
-        parsed = parse_agent_response(agent_text)
-
-        if parsed["thought"]:
-            reasoning_trace.append({"type": "thought", "content": parsed["thought"]})
+    prefetch = SpeculativePrefetch(user_message, user_data, session_id).start()
+    try:
+        for step in range(max_steps):
+            try:
+                response = _generate_agent_step(messages, player_context)
+            except Exception as e:
+                print(f"[ERROR] Gemini API call failed: {e}")
+                return {
+                    "response": "I'm having trouble connecting right now. Try again in a moment.",
+                    "mood": "empathy",
+                    "reasoning_trace": reasoning_trace,
+                    "tools_used": [],
+                }
+
+            agent_text = response.text
+            parsed = parse_agent_response(agent_text)
+
+            if parsed["thought"]:
+                reasoning_trace.append({"type": "thought", "content": parsed["thought"]})
+
+            if parsed["final_answer"]:
+                mood = "idle"
+                answer = parsed["final_answer"]
+                mood_match = re.match(r"^\[MOOD:(\w+)\]\s*", answer)
+                if mood_match:
+                    mood = mood_match.group(1).lower()
+                    answer = answer[mood_match.end() :].strip()
+
+                answer = strip_react_internals(answer)
+                reasoning_trace.append({"type": "answer", "content": answer[:100] + "..."})
+
+                return {
+                    "response": answer,
+                    "mood": mood,
+                    "reasoning_trace": reasoning_trace,
+                    "tools_used": [t["content"] for t in reasoning_trace if t["type"] == "tool_call"],
+                }
+
+            if parsed["action"] and parsed["action_input"]:
+                tool_name = parsed["action"]
+                tool_params = parsed["action_input"]
+
+                reasoning_trace.append(
+                    {"type": "tool_call", "content": f"{tool_name}({json.dumps(tool_params)})"}
+                )
+
+                tool_result = prefetch.take(tool_name, tool_params)
+                if tool_result is None:
+                    tool_result = execute_tool(
+                        tool_name, tool_params, user_data=user_data, session_id=session_id
+                    )
+                result_str, compaction = compact_observation(tool_name, tool_result)
+
+                reasoning_trace.append(
+                    {
+                        "type": "observation",
+                        "content": result_str[:300] + "...",
+                        "saved_bytes": compaction["saved_bytes"],
+                    }
+                )
+
+                observation_text = (
+                    f"\nOBSERVATION: {result_str}\n\n"
+                    "Based on this data, provide your FINAL_ANSWER (or call another tool if needed):"
+                )
+                messages.append(agent_text)
+                messages.append(observation_text)
+                continue
 
-        if parsed["final_answer"]:
             mood = "idle"
-            answer = parsed["final_answer"]
-            mood_match = re.match(r"^\[MOOD:(\w+)\]\s*", answer)
+            answer = strip_react_internals(agent_text)
+            mood_match = re.match(r"^\[MOOD:(\w+)\]\s*", agent_text)
             if mood_match:
                 mood = mood_match.group(1).lower()
-                answer = answer[mood_match.end() :].strip()
 
-            answer = strip_react_internals(answer)
-            reasoning_trace.append({"type": "answer", "content": answer[:100] + "..."})
+            if not answer or len(answer) < 5:
+                answer = simple_fallback(messages, username)
 
             return {
                 "response": answer,
                 "mood": mood,
                 "reasoning_trace": reasoning_trace,
-                "tools_used": [t["content"] for t in reasoning_trace if t["type"] == "tool_call"],
+                "tools_used": [],
             }
 
-        if parsed["action"] and parsed["action_input"]:
-            tool_name = parsed["action"]
-            tool_params = parsed["action_input"]
-
-            reasoning_trace.append(
-                {"type": "tool_call", "content": f"{tool_name}({json.dumps(tool_params)})"}
-            )
-
-            tool_result = execute_tool(tool_name, tool_params, user_data=user_data)
-            result_str = json.dumps(tool_result, indent=2)
-            if len(result_str) > 3000:
-                result_str = result_str[:3000] + "\n... (truncated)"
-
-            reasoning_trace.append(
-                {"type": "observation", "content": result_str[:300] + "..."}
-            )
-
-            observation_text = (
-                f"\nOBSERVATION: {result_str}\n\n"
-                "Based on this data, provide your FINAL_ANSWER (or call another tool if needed):"
-            )
-            messages.append(agent_text)
-            messages.append(observation_text)
-            continue
-
-        mood = "idle"
-        answer = strip_react_internals(agent_text)
-        mood_match = re.match(r"^\[MOOD:(\w+)\]\s*", agent_text)
-        if mood_match:
-            mood = mood_match.group(1).lower()
-
-        if not answer or len(answer) < 5:
-            answer = simple_fallback(messages, username)
-
+        fallback = simple_fallback(conversation_history + [user_message], username)
         return {
-            "response": answer,
-            "mood": mood,
+            "response": fallback,
+            "mood": "happy",
             "reasoning_trace": reasoning_trace,
-            "tools_used": [],
+            "tools_used": [t["content"] for t in reasoning_trace if t["type"] == "tool_call"],
         }
-
-    fallback = simple_fallback(conversation_history + [user_message], username)
-    return {
-        "response": fallback,
-        "mood": "happy",
-        "reasoning_trace": reasoning_trace,
-        "tools_used": [t["content"] for t in reasoning_trace if t["type"] == "tool_call"],
-    }
\ No newline at end of file
+    finally:
+        prefetch.finish()
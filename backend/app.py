@@ -1,30 +1,82 @@
 """GG Nexus — Flask application entry point."""
 
-import threading
-from flask import Flask, request, jsonify
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor, wait
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
-from config import GEMINI_API_KEY
-from agents.react_agent import run_react_agent
-from agents.profile_intelligence import generate_welcome_message, evolve_profile
+from werkzeug.middleware.proxy_fix import ProxyFix
+from agents.react_agent import run_react_agent, get_prefetch_stats
+from agents.llm_router import generate, get_router_stats
+from agents.intent_router import run_fast_path
+from agents.profile_intelligence import generate_welcome_message, fallback_welcome_message
+from config import PROFILE_EVOLVE_ONLINE, TRUSTED_PROXIES
 from routes.auth import auth_bp, token_required
+from routes.rate_limit import rate_limited, rate_limiter
 from models.conversation import (
-    save_message,
-    get_conversation_history,
+    get_budgeted_history,
     get_user_sessions,
-    get_user_context_summary,
+    get_session_page,
+    iter_session_messages,
+    session_cache,
+    get_user_activity,
+    reconcile_user_activity,
+    ensure_session_indexes,
 )
-from models.user import find_user_by_id, get_full_user, update_ai_profile
+from models.search import ensure_search_indexes, search_messages
+from models.user import get_cached_user, get_full_user, set_welcome_message, user_cache
 from tools.data_fetcher import fetch_game_data, fetch_recommendations_for
+from workers.chat_queue import JOB_WAIT_MAX_SECONDS, ChatJobQueue, QueueFull, describe_chat_error
+from workers.profile_queue import interactive, profile_queue, profile_ready
+from workers.password_pool import password_pool
+from workers.turn_writer import turn_writer
 import re
+import threading
 import time
 import traceback
 
 app = Flask(__name__)
+if TRUSTED_PROXIES:
+    # remote_addr becomes the client's address from X-Forwarded-For (rate limits key on it)
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXIES)
 CORS(app)
 app.register_blueprint(auth_bp)
 
-rate_limits = {}
-RATE_LIMIT_SECONDS = 2
+HISTORY_PAGE_SIZE = 50
+# Longest the welcome endpoint waits on an in-flight profile build. A build is two
+# LLM calls, so a slow one ends in the template welcome rather than a longer wait.
+WELCOME_WAIT_SECONDS = 5
+
+# User messages per user between profile evolutions
+EVOLVE_EVERY_USER_MESSAGES = 3
+_evolve_pending = {}
+_evolve_lock = threading.Lock()
+
+# Queue chat turns by default instead of only when the client asks for "async": true
+CHAT_ASYNC_DEFAULT = os.getenv("CHAT_ASYNC_DEFAULT", "false").lower() == "true"
+
+# Dashboard game cards: fetched in parallel, slow ones returned as pending
+DASHBOARD_MAX_GAMES = 8
+DASHBOARD_FETCH_WORKERS = int(os.getenv("DASHBOARD_FETCH_WORKERS", "8"))
+DASHBOARD_GAME_TIMEOUT_SECONDS = float(os.getenv("DASHBOARD_GAME_TIMEOUT_SECONDS", "4"))
+_dashboard_pool = ThreadPoolExecutor(max_workers=DASHBOARD_FETCH_WORKERS, thread_name_prefix="dashboard")
+_dashboard_fetches = {}  # lowercased game → in-flight meta fetch, shared across requests
+_dashboard_lock = threading.Lock()
+
+# Requests that don't count as interactive load for background workers
+BACKGROUND_EXEMPT_PREFIXES = ("/api/health", "/api/chat/jobs/")
+
+
+@app.before_request
+def _track_interactive_start():
+    if not request.path.startswith(BACKGROUND_EXEMPT_PREFIXES):
+        interactive.enter()
+
+
+@app.teardown_request
+def _track_interactive_end(exc):
+    if not request.path.startswith(BACKGROUND_EXEMPT_PREFIXES):
+        interactive.exit()
 
 
 @app.route("/api/health", methods=["GET"])
@@ -48,38 +100,53 @@ def health_check():
 @app.route("/api/chat/welcome", methods=["GET"])
 @token_required
 def chat_welcome(current_user):
-    """Generate a personalized AI welcome message using the full player profile."""
-    import time as _time
+    """Return the personalized welcome the profile build pipeline stored for this player."""
+    user_id = current_user["_id"]
+    since = profile_ready.version(user_id)
 
-    full_user = get_full_user(current_user["_id"])
+    full_user = current_user
     profile = full_user.get("profile", {})
-    ai_profile = full_user.get("ai_profile")
     username = full_user.get("username", "Player")
 
-    has_profile = bool(profile.get("favorite_games"))
-    print(f"[DEBUG] Welcome for {username}: has_profile={has_profile}, games={profile.get('favorite_games', [])}, ai_profile={'YES' if ai_profile else 'NO'}")
-
-    if not has_profile:
+    if not profile.get("favorite_games"):
         return jsonify({
             "message": f"Hey {username}! I'm Nexus, your gaming AI. Tell me what games you play and I'll help with strategy, builds, recommendations — anything gaming!",
             "mood": "happy",
         })
 
-    # If AI profile isn't ready yet (background thread still building), poll for up to 5s
-    if not ai_profile:
-        for _ in range(10):
-            _time.sleep(0.5)
-            full_user = get_full_user(current_user["_id"])
-            ai_profile = full_user.get("ai_profile")
-            if ai_profile:
-                break
+    message = full_user.get("welcome_message")
+    if not message:
+        # The cached user may predate a build that finished in another process
+        full_user = get_full_user(user_id)
+        message = full_user.get("welcome_message")
+    if message:
+        return jsonify({"message": message, "mood": "excited"})
 
-    message = generate_welcome_message(profile, ai_profile, username)
+    ai_profile = full_user.get("ai_profile")
+    if ai_profile and not profile_queue.has_pending(user_id, "build"):
+        # Profile built before welcomes were stored — generate once and keep it
+        message = generate_welcome_message(profile, ai_profile, username)
+        set_welcome_message(user_id, message, full_user.get("profile_version"))
+        return jsonify({"message": message, "mood": "excited"})
+
+    # Build queued or running — wait for its notification instead of polling the DB.
+    # The wait doesn't count as interactive load, or the worker would yield to it.
+    interactive.exit()
+    try:
+        profile_ready.wait(user_id, since, WELCOME_WAIT_SECONDS)
+    finally:
+        interactive.enter()
+    # Read back even on timeout: the notification is per process, and a build
+    # finished by another worker process stores its welcome without waking us
+    message = get_full_user(user_id).get("welcome_message")
+    if not message:
+        message = fallback_welcome_message(profile, username)
     return jsonify({"message": message, "mood": "excited"})
 
 
 @app.route("/api/chat", methods=["POST"])
 @token_required
+@rate_limited("chat")
 def chat_endpoint(current_user):
     data = request.get_json()
     if not data or "message" not in data:
@@ -89,93 +156,171 @@ def chat_endpoint(current_user):
     session_id = data.get("session_id", "default")
     user_id = current_user["_id"]
 
-    now = time.time()
-    if now - rate_limits.get(user_id, 0) < RATE_LIMIT_SECONDS:
-        return jsonify({"error": "Please wait a moment before sending another message"}), 429
-    rate_limits[user_id] = now
+    # Opt-in async mode: queue the turn and let the client poll or subscribe
+    if data.get("async", CHAT_ASYNC_DEFAULT):
+        try:
+            job_id = chat_queue.submit(user_id, {"message": user_message, "session_id": session_id})
+        except QueueFull:
+            response = jsonify({"error": "Nexus is very busy — please try again shortly"})
+            response.headers["Retry-After"] = "5"
+            return response, 503
+        return jsonify({
+            "job_id": job_id,
+            "status": "queued",
+            "session_id": session_id,
+            "poll_url": f"/api/chat/jobs/{job_id}",
+            "events_url": f"/api/chat/jobs/{job_id}/events",
+        }), 202
 
     try:
-        history = get_conversation_history(user_id, session_id)
-        full_user = get_full_user(user_id)
+        return jsonify(_run_chat_turn(user_id, user_message, session_id))
+    except Exception as e:
+        print(f"[ERROR] Chat endpoint: {e}")
+        traceback.print_exc()
+        message, status = describe_chat_error(e)
+        return jsonify({"error": message}), status
+
 
+def _run_chat_turn(user_id, user_message, session_id):
+    """Run one chat turn end to end and return the response payload."""
+    history = get_budgeted_history(user_id, session_id)
+    full_user = get_cached_user(user_id)
+
+    username = full_user.get("username", "Player")
+    result = run_fast_path(user_message, history, full_user, username, session_id)
+    if result is None:
         result = run_react_agent(
             user_message=user_message,
             conversation_history=history,
             user_data=full_user,
-            username=current_user.get("username", "Player"),
+            username=username,
+            session_id=session_id,
         )
 
-        ai_response = result["response"]
-        mood = result.get("mood", "idle")
-        reasoning = result.get("reasoning_trace", [])
-        tools_used = result.get("tools_used", [])
-
-        mood_match = re.match(r"^\[MOOD:\w+\]\s*", ai_response)
-        if mood_match:
-            ai_response = ai_response[mood_match.end() :].strip()
-
-        save_message(user_id, "user", user_message, session_id)
-        save_message(user_id, "assistant", ai_response, session_id)
-
-        # Evolve profile in background every 6+ messages
-        _maybe_evolve_profile(user_id, session_id, full_user)
-
-        return jsonify(
-            {
-                "response": ai_response,
-                "mood": mood,
-                "session_id": session_id,
-                "agent_info": {
-                    "reasoning_steps": len(reasoning),
-                    "tools_used": tools_used,
-                    "trace": reasoning,
-                },
-            }
-        )
+    ai_response = result["response"]
+    mood = result.get("mood", "idle")
+    reasoning = result.get("reasoning_trace", [])
+    tools_used = result.get("tools_used", [])
 
-    except Exception as e:
-        error_msg = str(e)
-        print(f"[ERROR] Chat endpoint: {error_msg}")
-        traceback.print_exc()
-        if "429" in error_msg or "RESOURCE_EXHAUSTED" in error_msg:
-            return jsonify({"error": "AI is busy — please try again in a few seconds"}), 429
-        return jsonify({"error": "Something went wrong. Please try again."}), 500
+    mood_match = re.match(r"^\[MOOD:\w+\]\s*", ai_response)
+    if mood_match:
+        ai_response = ai_response[mood_match.end() :].strip()
 
+    turn_writer.save(user_id, session_id, user_message, ai_response)
+
+    # Evolve profile in background every EVOLVE_EVERY_USER_MESSAGES user messages
+    _maybe_evolve_profile(user_id)
+
+    return {
+        "response": ai_response,
+        "mood": mood,
+        "session_id": session_id,
+        "agent_info": {
+            "reasoning_steps": len(reasoning),
+            "tools_used": tools_used,
+            "trace": reasoning,
+        },
+    }
 
-def _maybe_evolve_profile(user_id, session_id, full_user):
-    """Run profile evolution in background if enough messages have accumulated."""
-    try:
-        from models.conversation import conversations_collection
-        msg_count = conversations_collection.count_documents(
-            {"user_id": user_id, "session_id": session_id}
-        )
 
-        # Evolve after every 6 messages in a session
-        if msg_count > 0 and msg_count % 6 == 0:
-            messages = list(
-                conversations_collection.find(
-                    {"user_id": user_id, "session_id": session_id}
-                ).sort("timestamp", -1).limit(10)
-            )
-            messages.reverse()
-
-            formatted = [{"role": m["role"], "content": m["content"]} for m in messages]
-            existing_ai = full_user.get("ai_profile")
-
-            def _evolve():
-                try:
-                    updated = evolve_profile(user_id, formatted, existing_ai)
-                    if updated:
-                        update_ai_profile(user_id, updated)
-                        print(f"[OK] Profile evolved for user {user_id}")
-                except Exception as e:
-                    print(f"[WARN] Profile evolution failed: {e}")
-
-            thread = threading.Thread(target=_evolve)
-            thread.daemon = True
-            thread.start()
-    except Exception:
-        pass
+def _process_chat_job(user_id, payload):
+    with interactive:
+        return _run_chat_turn(user_id, payload["message"], payload.get("session_id", "default"))
+
+
+chat_queue = ChatJobQueue(handler=_process_chat_job)
+
+
+def start_background_workers():
+    """Start queue workers and prepare indexes — only in the process that serves requests."""
+    chat_queue.start()
+    profile_queue.start()
+    turn_writer.start()
+    ensure_session_indexes()
+    ensure_search_indexes()
+    rate_limiter.ensure_indexes()
+
+
+# Imported by a WSGI server: this process serves, so start now. Under
+# `python app.py` the __main__ block decides (the reloader parent never serves),
+# and bcrypt pool workers re-import this file as __mp_main__ and start nothing.
+if __name__ not in ("__main__", "__mp_main__"):
+    start_background_workers()
+
+
+@app.route("/api/chat/jobs/<job_id>", methods=["GET"])
+@token_required
+def get_chat_job(current_user, job_id):
+    """
+    Poll an async chat job. ?wait=N long-polls for up to N seconds.
+
+    A long-poll holds a request thread, so N is capped at JOB_WAIT_MAX_SECONDS;
+    clients that need longer poll again.
+    """
+    wait_seconds = min(request.args.get("wait", 0, type=float), JOB_WAIT_MAX_SECONDS)
+    if wait_seconds > 0:
+        job = chat_queue.wait(job_id, current_user["_id"], wait_seconds)
+    else:
+        job = chat_queue.get(job_id, current_user["_id"])
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job)
+
+
+@app.route("/api/chat/jobs/<job_id>/events", methods=["GET"])
+@token_required
+def stream_chat_job(current_user, job_id):
+    """
+    Server-sent events: one 'status' event per change, ending with the result.
+
+    Like every JWT route it needs the Authorization header, which a browser
+    EventSource can't send — read it with a streaming fetch, or poll
+    /api/chat/jobs/<id>?wait=N instead. The stream holds a request thread, so
+    it closes after JOB_WAIT_MAX_SECONDS even if the job is still running; the
+    client opens a new one and it picks up from the current status.
+    """
+    user_id = current_user["_id"]
+    if not chat_queue.get(job_id, user_id):
+        return jsonify({"error": "Job not found"}), 404
+
+    def events():
+        last_status = None
+        deadline = time.time() + JOB_WAIT_MAX_SECONDS
+        while time.time() < deadline:
+            job = chat_queue.wait(job_id, user_id, max(0.1, deadline - time.time()))
+            if job is None:
+                return
+            if job["status"] != last_status:
+                last_status = job["status"]
+                yield f"event: status\ndata: {json.dumps(job)}\n\n"
+            else:
+                yield ": keep-alive\n\n"
+            if job["status"] in ("done", "failed"):
+                return
+
+    return Response(stream_with_context(events()), mimetype="text/event-stream")
+
+
+def _maybe_evolve_profile(user_id):
+    """
+    Queue profile evolution once enough new user messages have arrived.
+
+    Counts turns in memory instead of querying Mongo on every chat; the
+    evolve task reads everything past the user's watermark, so a counter
+    lost on restart only delays evolution, it never drops messages.
+    """
+    if not PROFILE_EVOLVE_ONLINE:
+        return
+    with _evolve_lock:
+        pending = _evolve_pending.get(user_id, 0) + 1
+        if pending < EVOLVE_EVERY_USER_MESSAGES:
+            _evolve_pending[user_id] = pending
+            return
+        _evolve_pending.pop(user_id, None)
+    try:
+        profile_queue.enqueue(user_id, "evolve")
+    except Exception as e:
+        print(f"[WARN] Could not queue profile evolution: {e}")
 
 
 @app.route("/api/chat/sessions", methods=["GET"])
@@ -188,29 +333,124 @@ def get_sessions(current_user):
 @app.route("/api/chat/history/<session_id>", methods=["GET"])
 @token_required
 def get_session_history(current_user, session_id):
-    from models.conversation import conversations_collection
+    """Newest page of a session's messages; pass ?before=<next_cursor> for older pages."""
+    try:
+        limit = int(request.args.get("limit", HISTORY_PAGE_SIZE))
+        messages, next_cursor = get_session_page(
+            current_user["_id"], session_id, limit=limit, before=request.args.get("before")
+        )
+    except ValueError:
+        return jsonify({"error": "Invalid limit or cursor"}), 400
 
-    messages = list(
-        conversations_collection.find(
-            {"user_id": current_user["_id"], "session_id": session_id}
-        ).sort("timestamp", 1)
-    )
+    return jsonify({
+        "messages": [_history_entry(msg) for msg in messages],
+        "session_id": session_id,
+        "next_cursor": next_cursor,
+        "has_more": next_cursor is not None,
+    })
+
+
+@app.route("/api/chat/history/<session_id>/export", methods=["GET"])
+@token_required
+def export_session_history(current_user, session_id):
+    """Stream a whole session as JSON without holding it in memory."""
+    user_id = current_user["_id"]
+
+    def generate_json():
+        yield f'{{"session_id": {json.dumps(session_id)}, "messages": ['
+        for i, msg in enumerate(iter_session_messages(user_id, session_id)):
+            yield ("," if i else "") + json.dumps(_history_entry(msg))
+        yield "]}"
+
+    response = Response(stream_with_context(generate_json()), mimetype="application/json")
+    response.headers["Content-Disposition"] = f'attachment; filename="nexus-chat-{session_id}.json"'
+    return response
+
+
+@app.route("/api/chat/search", methods=["GET"])
+@token_required
+def search_history(current_user):
+    """Ranked full-text search across all of the player's conversations."""
+    query = request.args.get("q", "").strip()
+    if not query:
+        return jsonify({"error": "Query parameter q is required"}), 400
+    try:
+        page = int(request.args.get("page", 1))
+        limit = int(request.args.get("limit", 20))
+    except ValueError:
+        return jsonify({"error": "page and limit must be integers"}), 400
+
+    results = search_messages(current_user["_id"], query, page=page, page_size=limit)
+    return jsonify({"query": query, **results})
 
-    formatted = [
-        {
-            "role": msg["role"],
-            "content": msg["content"],
-            "timestamp": msg["timestamp"].isoformat(),
-        }
-        for msg in messages
-    ]
 
-    return jsonify({"messages": formatted, "session_id": session_id})
+def _history_entry(msg):
+    return {
+        "role": msg["role"],
+        "content": msg["content"],
+        "timestamp": msg["timestamp"].isoformat(),
+    }
 
 
 # ── Dashboard ────────────────────────────────────────────────────
 
 
+def _fetch_dashboard_meta(game_name):
+    meta = fetch_game_data(game_name, "meta")
+    meta.pop("_cache", None)
+    meta.pop("_source", None)
+    return meta
+
+
+def _dashboard_fetch(game_name):
+    """The in-flight meta fetch for a game, started if none is running."""
+    key = game_name.lower()
+    with _dashboard_lock:
+        future = _dashboard_fetches.get(key)
+        started = future is None
+        if started:
+            future = _dashboard_fetches[key] = _dashboard_pool.submit(_fetch_dashboard_meta, game_name)
+    if started:
+        future.add_done_callback(lambda f: _forget_dashboard_fetch(key, f))
+    return future
+
+
+def _forget_dashboard_fetch(key, future):
+    with _dashboard_lock:
+        if _dashboard_fetches.get(key) is future:
+            del _dashboard_fetches[key]
+
+
+def _collect_dashboard_games(profile, game_names):
+    """
+    Game cards for game_names, waiting at most DASHBOARD_GAME_TIMEOUT_SECONDS.
+
+    Returns (cards, pending names). Fetches still running when the wait ends
+    keep going, so a follow-up request picks up their results.
+    """
+    futures = [(name, _dashboard_fetch(name)) for name in game_names]
+    wait([f for _, f in futures], timeout=DASHBOARD_GAME_TIMEOUT_SECONDS)
+
+    cards, pending = [], []
+    for name, future in futures:
+        card = {
+            "name": name,
+            "rank": profile.get("ranks", {}).get(name),
+            "role": profile.get("main_roles", {}).get(name),
+            "skill": profile.get("skill_levels", {}).get(name),
+        }
+        if not future.done():
+            card.update(status="pending", meta=None)
+            pending.append(name)
+        elif future.exception():
+            print(f"[WARN] Dashboard fetch failed for {name}: {future.exception()}")
+            card.update(status="error", meta={"error": "Could not fetch data"})
+        else:
+            card.update(status="ready", meta=future.result())
+        cards.append(card)
+    return cards, pending
+
+
 @app.route("/api/dashboard/games", methods=["GET"])
 @token_required
 def dashboard_games(current_user):
@@ -220,30 +460,24 @@ def dashboard_games(current_user):
     if not favorite_games:
         return jsonify({"games": [], "message": "No favorite games set"})
 
-    results = []
-    for game_name in favorite_games[:8]:
-        try:
-            meta = fetch_game_data(game_name, "meta")
-            meta.pop("_cache", None)
-            meta.pop("_source", None)
-            results.append({
-                "name": game_name,
-                "meta": meta,
-                "rank": profile.get("ranks", {}).get(game_name),
-                "role": profile.get("main_roles", {}).get(game_name),
-                "skill": profile.get("skill_levels", {}).get(game_name),
-            })
-        except Exception as e:
-            print(f"[WARN] Dashboard fetch failed for {game_name}: {e}")
-            results.append({
-                "name": game_name,
-                "meta": {"error": "Could not fetch data"},
-                "rank": profile.get("ranks", {}).get(game_name),
-                "role": profile.get("main_roles", {}).get(game_name),
-                "skill": profile.get("skill_levels", {}).get(game_name),
-            })
-
-    return jsonify({"games": results})
+    cards, pending = _collect_dashboard_games(profile, favorite_games[:DASHBOARD_MAX_GAMES])
+    payload = {"games": cards, "pending": pending}
+    if pending:
+        payload["poll_url"] = "/api/dashboard/games/pending"
+    return jsonify(payload)
+
+
+@app.route("/api/dashboard/games/pending", methods=["GET"])
+@token_required
+def dashboard_pending_games(current_user):
+    """Late results for cards /api/dashboard/games returned as pending (?game=...&game=...)."""
+    profile = current_user.get("profile", {})
+    favorites = profile.get("favorite_games", [])[:DASHBOARD_MAX_GAMES]
+    requested = set(request.args.getlist("game"))
+    game_names = [name for name in favorites if name in requested]
+
+    cards, pending = _collect_dashboard_games(profile, game_names)
+    return jsonify({"games": cards, "pending": pending})
 
 
 @app.route("/api/dashboard/game/<game_name>", methods=["GET"])
@@ -272,8 +506,9 @@ def dashboard_single_game(current_user, game_name):
 
 @app.route("/api/dashboard/tip", methods=["GET"])
 @token_required
+@rate_limited("tips")
 def dashboard_tip(current_user):
-    full_user = get_full_user(current_user["_id"])
+    full_user = current_user
     profile = full_user.get("profile", {})
     ai_profile = full_user.get("ai_profile", {})
     username = current_user.get("username", "Player")
@@ -290,11 +525,9 @@ def dashboard_tip(current_user):
         context += f"Ranks: {', '.join(f'{g}: {r}' for g, r in ranks.items())}\n"
 
     try:
-        from google import genai
-        tip_client = genai.Client(api_key=GEMINI_API_KEY)
-        response = tip_client.models.generate_content(
-            model="gemini-2.0-flash",
-            contents=[
+        response = generate(
+            "tip",
+            [
                 f"Based on this gamer's profile, give ONE short, specific, actionable gaming tip "
                 f"(2-3 sentences max). Be specific to their games and rank. Not generic.\n\n"
                 f"Profile:\n{context}"
@@ -312,9 +545,10 @@ def dashboard_tip(current_user):
 
 @app.route("/api/recommendations", methods=["GET"])
 @token_required
+@rate_limited("recommendations")
 def get_recommendations(current_user):
     """AI-powered game recommendations based on player profile."""
-    full_user = get_full_user(current_user["_id"])
+    full_user = current_user
     profile = full_user.get("profile", {})
     ai_profile = full_user.get("ai_profile", {})
     games = profile.get("favorite_games", [])
@@ -344,11 +578,9 @@ def get_recommendations(current_user):
         context += f"What resonates: {ai_profile['recommendations_angle']}\n"
 
     try:
-        from google import genai
-        rec_client = genai.Client(api_key=GEMINI_API_KEY)
-        response = rec_client.models.generate_content(
-            model="gemini-2.0-flash",
-            contents=[
+        response = generate(
+            "recommendations",
+            [
                 f"Suggest 4 games for this player. Keep reasons SHORT (1 sentence each).\n\n"
                 f"Profile:\n{context}\n\n"
                 f'Respond ONLY with a valid JSON array, no markdown:\n'
@@ -394,6 +626,7 @@ def get_recommendations(current_user):
 
 @app.route("/api/guides/generate", methods=["POST"])
 @token_required
+@rate_limited("guides")
 def generate_guide(current_user):
     """Generate a personalized guide for a specific game/topic."""
     data = request.get_json()
@@ -403,7 +636,7 @@ def generate_guide(current_user):
     if not game:
         return jsonify({"error": "Game name is required"}), 400
 
-    full_user = get_full_user(current_user["_id"])
+    full_user = current_user
     profile = full_user.get("profile", {})
     rank = profile.get("ranks", {}).get(game, "unknown")
     role = profile.get("main_roles", {}).get(game)
@@ -428,11 +661,9 @@ def generate_guide(current_user):
     prompt = topic_prompts.get(topic, topic_prompts["general"])
 
     try:
-        from google import genai
-        guide_client = genai.Client(api_key=GEMINI_API_KEY)
-        response = guide_client.models.generate_content(
-            model="gemini-2.0-flash",
-            contents=[
+        response = generate(
+            "guide",
+            [
                 f"{prompt}\n\n"
                 f"Tailor this specifically for: {player_context}\n\n"
                 f"Format with clear sections. Use markdown headers (##). "
@@ -459,22 +690,16 @@ def generate_guide(current_user):
 @token_required
 def get_player_stats(current_user):
     """Aggregate player stats from conversations and profile."""
-    from models.conversation import conversations_collection
-
     user_id = current_user["_id"]
-    full_user = get_full_user(user_id)
+    full_user = current_user
     profile = full_user.get("profile", {})
     ai_profile = full_user.get("ai_profile", {})
-
-    total_messages = conversations_collection.count_documents({"user_id": user_id, "role": "user"})
-    total_sessions = len(list(conversations_collection.distinct("session_id", {"user_id": user_id})))
-
-    # Get most discussed topics from recent messages
-    recent_msgs = list(
-        conversations_collection.find(
-            {"user_id": user_id, "role": "user"}
-        ).sort("timestamp", -1).limit(20)
-    )
+    # One counter document. Counters never recomputed from stored messages may hold
+    # only the turns since they were introduced, so those are rebuilt once here.
+    activity = get_user_activity(user_id)
+    if not activity or not activity.get("reconciled_at"):
+        activity = reconcile_user_activity(user_id)
+    mentions = activity.get("game_mentions") or {}
 
     return jsonify({
         "profile": {
@@ -486,8 +711,13 @@ def get_player_stats(current_user):
             "goals": profile.get("goals", []),
         },
         "activity": {
-            "total_messages": total_messages,
-            "total_sessions": total_sessions,
+            "total_messages": activity.get("total_messages", 0),
+            "total_sessions": activity.get("total_sessions", 0),
+            "last_active": activity["last_active"].isoformat() if activity.get("last_active") else None,
+            "top_games": [
+                {"game": game, "mentions": count}
+                for game, count in sorted(mentions.items(), key=lambda kv: kv[1], reverse=True)[:5]
+            ],
             "member_since": full_user.get("created_at", "").isoformat() if full_user.get("created_at") else None,
         },
         "ai_insights": {
@@ -562,6 +792,22 @@ def view_cache(current_user):
     return jsonify({"cache": list_cached_keys()})
 
 
+@app.route("/api/admin/metrics", methods=["GET"])
+@token_required
+def view_metrics(current_user):
+    return jsonify({
+        "prefetch": get_prefetch_stats(),
+        "llm": get_router_stats(),
+        "chat_queue": chat_queue.stats(),
+        "profile_queue": profile_queue.stats(),
+        "turn_writer": turn_writer.stats(),
+        "session_cache": session_cache.stats(),
+        "user_cache": user_cache.stats(),
+        "password_pool": password_pool.stats(),
+        "rate_limits": rate_limiter.stats(),
+    })
+
+
 @app.route("/api/admin/cache/refresh", methods=["POST"])
 @token_required
 def refresh_cache(current_user):
@@ -589,4 +835,7 @@ if __name__ == "__main__":
     print("🔐 JWT authentication enabled")
     print("💾 MongoDB connected")
     print("🌐 Server running at http://localhost:5000\n")
+    # debug=True runs the app in a reloader child; the watching parent only restarts it
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_background_workers()
     app.run(debug=True, port=5000)
\ No newline at end of file
@@ -0,0 +1,882 @@
+"""
+Record/replay harness — runs the backend offline against recorded fixtures.
+
+Recording wraps the real Gemini client and requests.get, and snapshots Mongo
+collections, writing everything to one JSON fixture file. Replay installs
+fake clients that answer from the fixture with configurable latency
+injection, so the agent and Flask endpoints run with no network or database.
+
+install() must be called before any backend module is imported, because
+the backend creates its Gemini and Mongo clients at import time.
+"""
+
+import copy
+import hashlib
+import os
+import random
+import re
+import threading
+import time
+from collections import defaultdict
+from types import SimpleNamespace
+from bson import ObjectId, json_util
+
+DEFAULT_GEMINI_TEXT = "[MOOD:idle]\nKeep grinding — consistency beats talent."
+
+
+# ── Latency injection and per-stage timing ──────────────────────
+
+
+class LatencyModel:
+    """Injected delay per service, as (mean_ms, jitter_ms)."""
+
+    def __init__(self, **services):
+        self.services = {name: spec if isinstance(spec, tuple) else (spec, 0) for name, spec in services.items()}
+        self._rng = random.Random(1234)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def parse(cls, spec):
+        """Parse 'gemini=400:100,http=80,mongo=1' into a LatencyModel."""
+        services = {}
+        for part in filter(None, (spec or "").split(",")):
+            name, _, value = part.partition("=")
+            mean, _, jitter = value.partition(":")
+            services[name.strip()] = (float(mean or 0), float(jitter or 0))
+        return cls(**services)
+
+    def delay(self, service):
+        mean, jitter = self.services.get(service, (0, 0))
+        if mean <= 0 and jitter <= 0:
+            return
+        with self._lock:
+            ms = max(0.0, self._rng.gauss(mean, jitter) if jitter else mean)
+        time.sleep(ms / 1000)
+
+
+class StageTimer:
+    """Thread-safe accumulator of time spent in each faked service."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.totals = defaultdict(float)
+            self.calls = defaultdict(int)
+
+    def add(self, stage, seconds):
+        with self._lock:
+            self.totals[stage] += seconds
+            self.calls[stage] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                stage: {"calls": self.calls[stage], "total_ms": round(total * 1000, 2)}
+                for stage, total in self.totals.items()
+            }
+
+
+STAGES = StageTimer()
+
+
+class _timed:
+    def __init__(self, stage, latency):
+        self.stage = stage
+        self.latency = latency
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        if self.latency:
+            self.latency.delay(self.stage)
+
+    def __exit__(self, *exc):
+        STAGES.add(self.stage, time.perf_counter() - self.start)
+
+
+# ── Fixtures ────────────────────────────────────────────────────
+
+
+def _request_text(contents, config):
+    """Flatten a generate_content request into plain text for matching."""
+    chunks = []
+
+    def walk(value):
+        if isinstance(value, str):
+            chunks.append(value)
+        elif isinstance(value, dict):
+            for key in ("text", "parts", "system_instruction"):
+                if key in value:
+                    walk(value[key])
+        elif isinstance(value, (list, tuple)):
+            for item in value:
+                walk(item)
+        elif hasattr(value, "text") and isinstance(getattr(value, "text"), str):
+            chunks.append(value.text)
+
+    walk(config or {})
+    walk(contents)
+    return "\n".join(chunks)
+
+
+def _request_key(model, contents, config):
+    text = f"{model}\n{_request_text(contents, config)}"
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class Fixture:
+    """
+    Recorded responses for one scenario.
+
+    gemini: list of {"key": sha1} (exact recorded requests) or {"match": substring}
+            (hand-written rules) entries, each with a "text" response.
+    http:   url → {"status": int, "json": ...}
+    mongo:  collection name → list of documents (extended JSON on disk)
+    """
+
+    def __init__(self, gemini=None, http=None, mongo=None, default_text=DEFAULT_GEMINI_TEXT):
+        self.gemini = gemini or []
+        self.http = http or {}
+        self.mongo = mongo or {}
+        self.default_text = default_text
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._by_key = {e["key"]: e for e in self.gemini if e.get("key")}
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            raw = json_util.loads(f.read())
+        return cls(
+            gemini=raw.get("gemini"),
+            http=raw.get("http"),
+            mongo=raw.get("mongo"),
+            default_text=raw.get("default_text", DEFAULT_GEMINI_TEXT),
+        )
+
+    def save(self, path):
+        payload = {
+            "default_text": self.default_text,
+            "gemini": self.gemini,
+            "http": self.http,
+            "mongo": self.mongo,
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(json_util.dumps(payload, indent=2))
+
+    def record_gemini(self, model, contents, config, text):
+        entry = {"key": _request_key(model, contents, config), "model": model, "text": text}
+        with self._lock:
+            self.gemini.append(entry)
+            self._by_key[entry["key"]] = entry
+
+    def lookup_gemini(self, model, contents, config):
+        entry = self._by_key.get(_request_key(model, contents, config))
+        if entry:
+            return entry["text"]
+        request_text = _request_text(contents, config)
+        for rule in self.gemini:
+            if rule.get("match") and rule["match"] in request_text:
+                return rule["text"]
+        with self._lock:
+            self.misses += 1
+        return self.default_text
+
+    def snapshot_mongo(self, db, collections, limit=1000):
+        for name in collections:
+            self.mongo[name] = list(db[name].find({}, {"password_hash": 0}).limit(limit))
+
+
+# ── Fake Gemini ─────────────────────────────────────────────────
+
+
+class FakeGeminiResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class _FakeModels:
+    def __init__(self, fixture, latency):
+        self.fixture = fixture
+        self.latency = latency
+
+    def generate_content(self, model=None, contents=None, config=None):
+        with _timed("gemini", self.latency):
+            return FakeGeminiResponse(self.fixture.lookup_gemini(model, contents, config))
+
+
+class _FakeCaches:
+    def create(self, *args, **kwargs):
+        raise RuntimeError("Context caching is not available in replay mode")
+
+
+class FakeGenaiClient:
+    """Stands in for google.genai.Client, answering from a Fixture."""
+
+    def __init__(self, fixture, latency=None):
+        self.models = _FakeModels(fixture, latency)
+        self.caches = _FakeCaches()
+
+
+class _RecordingModels:
+    def __init__(self, real_models, fixture):
+        self._real = real_models
+        self._fixture = fixture
+
+    def generate_content(self, model=None, contents=None, config=None):
+        with _timed("gemini", None):
+            response = self._real.generate_content(model=model, contents=contents, config=config)
+        self._fixture.record_gemini(model, contents, config, response.text)
+        return response
+
+
+class RecordingGenaiClient:
+    """Wraps a real google.genai.Client and records every generate_content response."""
+
+    def __init__(self, real_client, fixture):
+        self._real = real_client
+        self.models = _RecordingModels(real_client.models, fixture)
+        self.caches = real_client.caches
+
+
+# ── Fake HTTP ───────────────────────────────────────────────────
+
+
+class FakeHttpResponse:
+    def __init__(self, status_code, payload):
+        self.status_code = status_code
+        self._payload = payload
+
+    def json(self):
+        return copy.deepcopy(self._payload)
+
+
+def make_fake_get(fixture, latency=None):
+    def fake_get(url, *args, **kwargs):
+        with _timed("http", latency):
+            entry = fixture.http.get(url)
+            if entry is None:
+                return FakeHttpResponse(404, {})
+            return FakeHttpResponse(entry.get("status", 200), entry.get("json"))
+
+    return fake_get
+
+
+def make_recording_get(real_get, fixture):
+    def recording_get(url, *args, **kwargs):
+        with _timed("http", None):
+            response = real_get(url, *args, **kwargs)
+        try:
+            fixture.http[url] = {"status": response.status_code, "json": response.json()}
+        except ValueError:
+            pass
+        return response
+
+    return recording_get
+
+
+# ── Fake Mongo ──────────────────────────────────────────────────
+
+
+class _Missing:
+    pass
+
+
+MISSING = _Missing()
+
+
+def _resolve(doc, path):
+    """All values at a dotted path, descending into arrays of sub-documents."""
+    values = [doc]
+    for part in path.split("."):
+        next_values = []
+        for value in values:
+            if isinstance(value, dict):
+                if part in value:
+                    next_values.append(value[part])
+            elif isinstance(value, list):
+                if part.isdigit() and int(part) < len(value):
+                    next_values.append(value[int(part)])
+                else:
+                    next_values.extend(v[part] for v in value if isinstance(v, dict) and part in v)
+        values = next_values
+    return values
+
+
+def _compare(op, value, target):
+    try:
+        if op == "$gt":
+            return value > target
+        if op == "$gte":
+            return value >= target
+        if op == "$lt":
+            return value < target
+        if op == "$lte":
+            return value <= target
+    except TypeError:
+        return False
+    return False
+
+
+def _equals(values, target):
+    if target is None:
+        return not values or any(v is None for v in values)
+    return any(v == target or (isinstance(v, list) and target in v) for v in values)
+
+
+def _match_condition(values, cond):
+    if isinstance(cond, dict) and cond and all(k.startswith("$") for k in cond):
+        for op, target in cond.items():
+            if op == "$eq" and not _equals(values, target):
+                return False
+            if op == "$ne" and _equals(values, target):
+                return False
+            if op in ("$gt", "$gte", "$lt", "$lte") and not any(_compare(op, v, target) for v in values):
+                return False
+            if op == "$in" and not any(_equals(values, t) for t in target):
+                return False
+            if op == "$nin" and any(_equals(values, t) for t in target):
+                return False
+            if op == "$exists" and bool(values) != bool(target):
+                return False
+            if op == "$regex":
+                flags = re.IGNORECASE if "i" in cond.get("$options", "") else 0
+                if not any(isinstance(v, str) and re.search(target, v, flags) for v in values):
+                    return False
+        return True
+    if isinstance(cond, re.Pattern):
+        return any(isinstance(v, str) and cond.search(v) for v in values)
+    return _equals(values, cond)
+
+
+def match_document(doc, query):
+    for key, cond in (query or {}).items():
+        if key == "$or":
+            if not any(match_document(doc, q) for q in cond):
+                return False
+        elif key == "$and":
+            if not all(match_document(doc, q) for q in cond):
+                return False
+        elif key == "$text":
+            from pymongo.errors import OperationFailure
+
+            raise OperationFailure("text index required for $text query", code=27)
+        elif not _match_condition(_resolve(doc, key), cond):
+            return False
+    return True
+
+
+def _set_path(doc, path, value):
+    parts = path.split(".")
+    target = doc
+    for part in parts[:-1]:
+        target = target.setdefault(part, {})
+    target[parts[-1]] = value
+
+
+def _get_path(doc, path, default=None):
+    target = doc
+    for part in path.split("."):
+        if not isinstance(target, dict) or part not in target:
+            return default
+        target = target[part]
+    return target
+
+
+def _unset_path(doc, path):
+    parts = path.split(".")
+    target = doc
+    for part in parts[:-1]:
+        target = target.get(part)
+        if not isinstance(target, dict):
+            return
+    target.pop(parts[-1], None)
+
+
+def _apply_update(doc, update, inserting=False):
+    if not any(k.startswith("$") for k in update):
+        keep_id = doc.get("_id")
+        doc.clear()
+        doc.update(copy.deepcopy(update))
+        if keep_id is not None:
+            doc["_id"] = keep_id
+        return
+
+    for op, fields in update.items():
+        for path, value in fields.items():
+            value = copy.deepcopy(value)
+            current = _get_path(doc, path, MISSING)
+            if op == "$set" or (op == "$setOnInsert" and inserting):
+                _set_path(doc, path, value)
+            elif op == "$unset":
+                _unset_path(doc, path)
+            elif op == "$inc":
+                _set_path(doc, path, (0 if current is MISSING else current) + value)
+            elif op == "$min":
+                if current is MISSING or value < current:
+                    _set_path(doc, path, value)
+            elif op == "$max":
+                if current is MISSING or value > current:
+                    _set_path(doc, path, value)
+            elif op in ("$push", "$addToSet"):
+                items = list(current) if isinstance(current, list) else []
+                if isinstance(value, dict) and "$each" in value:
+                    new_items = value["$each"]
+                    slice_to = value.get("$slice")
+                else:
+                    new_items, slice_to = [value], None
+                for item in new_items:
+                    if op == "$push" or item not in items:
+                        items.append(item)
+                if slice_to is not None:
+                    items = items[slice_to:] if slice_to < 0 else items[:slice_to]
+                _set_path(doc, path, items)
+
+
+def _project(doc, projection):
+    if not projection:
+        return copy.deepcopy(doc)
+    if isinstance(projection, (list, tuple)):
+        projection = {field: 1 for field in projection}
+    include = {k: v for k, v in projection.items() if k != "_id" and v}
+    if include:
+        result = {}
+        if projection.get("_id", 1):
+            result["_id"] = doc.get("_id")
+        for path in include:
+            head, _, rest = path.partition(".")
+            if rest and isinstance(doc.get(head), list):
+                # "array.field" keeps that field of each element
+                result[head] = []
+                for item in doc[head]:
+                    kept = {}
+                    value = _get_path(item, rest, MISSING) if isinstance(item, dict) else MISSING
+                    if value is not MISSING:
+                        _set_path(kept, rest, copy.deepcopy(value))
+                    result[head].append(kept)
+                continue
+            value = _get_path(doc, path, MISSING)
+            if value is not MISSING:
+                _set_path(result, path, copy.deepcopy(value))
+        return result
+    result = copy.deepcopy(doc)
+    for path, flag in projection.items():
+        if not flag:
+            _unset_path(result, path)
+    return result
+
+
+def _sort_documents(docs, sort):
+    if not sort:
+        return docs
+    if isinstance(sort, dict):
+        sort = list(sort.items())
+    for field, direction in reversed(sort):
+        if isinstance(direction, dict):
+            continue  # {"$meta": ...} sorts are applied by the caller
+
+        def key(doc, field=field):
+            value = _get_path(doc, field, MISSING)
+            return (0, "") if value is MISSING or value is None else (1, value)
+
+        docs.sort(key=key, reverse=direction == -1)
+    return docs
+
+
+class FakeCursor:
+    def __init__(self, collection, query, projection):
+        self._collection = collection
+        self._query = query
+        self._projection = projection
+        self._sort = None
+        self._skip = 0
+        self._limit = 0
+
+    def sort(self, key_or_list, direction=None):
+        self._sort = [(key_or_list, direction or 1)] if isinstance(key_or_list, str) else list(key_or_list)
+        return self
+
+    def skip(self, n):
+        self._skip = n
+        return self
+
+    def limit(self, n):
+        self._limit = n
+        return self
+
+    def batch_size(self, n):
+        return self
+
+    def __iter__(self):
+        docs = _sort_documents(self._collection._matching(self._query), self._sort)
+        docs = docs[self._skip:]
+        if self._limit:
+            docs = docs[: self._limit]
+        return iter([_project(d, self._projection) for d in docs])
+
+
+class FakeCollection:
+    """In-memory subset of pymongo's Collection API used by the backend."""
+
+    def __init__(self, database, name, latency=None):
+        self.database = database
+        self.name = name
+        self.latency = latency
+        self._docs = []
+        self._lock = threading.RLock()
+
+    def _matching(self, query):
+        with self._lock:
+            return [d for d in self._docs if match_document(d, query)]
+
+    def _op(self):
+        return _timed("mongo", self.latency)
+
+    def seed(self, documents):
+        with self._lock:
+            self._docs = [copy.deepcopy(d) for d in documents]
+
+    # Reads
+
+    def find(self, filter=None, projection=None, **kwargs):
+        with self._op():
+            cursor = FakeCursor(self, filter or {}, projection)
+            if kwargs.get("sort"):
+                cursor.sort(kwargs["sort"])
+            if kwargs.get("limit"):
+                cursor.limit(kwargs["limit"])
+            return cursor
+
+    def find_one(self, filter=None, projection=None, sort=None, **kwargs):
+        with self._op():
+            docs = _sort_documents(self._matching(filter or {}), sort)
+            return _project(docs[0], projection) if docs else None
+
+    def count_documents(self, filter, **kwargs):
+        with self._op():
+            return len(self._matching(filter))
+
+    def estimated_document_count(self):
+        return len(self._docs)
+
+    def distinct(self, key, filter=None):
+        with self._op():
+            values = []
+            for doc in self._matching(filter or {}):
+                for value in _resolve(doc, key):
+                    if value not in values:
+                        values.append(value)
+            return values
+
+    def aggregate(self, pipeline, **kwargs):
+        with self._op():
+            docs = [copy.deepcopy(d) for d in self._matching({})]
+            for stage in pipeline:
+                (name, spec), = stage.items()
+                if name == "$match":
+                    docs = [d for d in docs if match_document(d, spec)]
+                elif name == "$sort":
+                    docs = _sort_documents(docs, list(spec.items()))
+                elif name == "$skip":
+                    docs = docs[spec:]
+                elif name == "$limit":
+                    docs = docs[:spec]
+                elif name == "$group":
+                    docs = _group(docs, spec)
+                elif name == "$project":
+                    docs = [_project(d, spec) for d in docs]
+                elif name == "$count":
+                    docs = [{spec: len(docs)}]
+            return iter(docs)
+
+    # Writes
+
+    def _insert(self, document):
+        document.setdefault("_id", ObjectId())
+        if any(d["_id"] == document["_id"] for d in self._docs):
+            from pymongo.errors import DuplicateKeyError
+
+            raise DuplicateKeyError(f"E11000 duplicate key error collection: {self.name}")
+        self._docs.append(copy.deepcopy(document))
+        return document["_id"]
+
+    def insert_one(self, document):
+        with self._op(), self._lock:
+            return SimpleNamespace(inserted_id=self._insert(document), acknowledged=True)
+
+    def insert_many(self, documents, ordered=True):
+        from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+        with self._op(), self._lock:
+            ids, errors = [], []
+            for index, document in enumerate(documents):
+                try:
+                    ids.append(self._insert(document))
+                except DuplicateKeyError as e:
+                    errors.append({"index": index, "code": 11000, "errmsg": str(e)})
+                    if ordered:
+                        break
+            if errors:
+                raise BulkWriteError({"writeErrors": errors, "nInserted": len(ids)})
+            return SimpleNamespace(inserted_ids=ids, acknowledged=True)
+
+    def _upsert_doc(self, filter, update):
+        doc = {k: copy.deepcopy(v) for k, v in filter.items() if not k.startswith("$") and not isinstance(v, dict)}
+        _apply_update(doc, update, inserting=True)
+        doc.setdefault("_id", ObjectId())
+        self._docs.append(doc)
+        return doc
+
+    def update_one(self, filter, update, upsert=False, **kwargs):
+        with self._op(), self._lock:
+            docs = self._matching(filter)
+            if docs:
+                _apply_update(docs[0], update)
+                return SimpleNamespace(matched_count=1, modified_count=1, upserted_id=None)
+            if upsert:
+                doc = self._upsert_doc(filter, update)
+                return SimpleNamespace(matched_count=0, modified_count=0, upserted_id=doc["_id"])
+            return SimpleNamespace(matched_count=0, modified_count=0, upserted_id=None)
+
+    def update_many(self, filter, update, upsert=False, **kwargs):
+        with self._op(), self._lock:
+            docs = self._matching(filter)
+            for doc in docs:
+                _apply_update(doc, update)
+            if not docs and upsert:
+                doc = self._upsert_doc(filter, update)
+                return SimpleNamespace(matched_count=0, modified_count=0, upserted_id=doc["_id"])
+            return SimpleNamespace(matched_count=len(docs), modified_count=len(docs), upserted_id=None)
+
+    def replace_one(self, filter, replacement, upsert=False, **kwargs):
+        return self.update_one(filter, replacement, upsert=upsert)
+
+    def find_one_and_update(
+        self, filter, update, projection=None, sort=None, upsert=False, return_document=False, **kwargs
+    ):
+        with self._op(), self._lock:
+            docs = _sort_documents(self._matching(filter), sort)
+            if docs:
+                before = copy.deepcopy(docs[0])
+                _apply_update(docs[0], update)
+                return _project(docs[0] if return_document else before, projection)
+            if upsert:
+                doc = self._upsert_doc(filter, update)
+                return _project(doc, projection) if return_document else None
+            return None
+
+    def find_one_and_delete(self, filter, projection=None, sort=None, **kwargs):
+        with self._op(), self._lock:
+            docs = _sort_documents(self._matching(filter), sort)
+            if not docs:
+                return None
+            self._docs.remove(docs[0])
+            return _project(docs[0], projection)
+
+    def delete_one(self, filter):
+        with self._op(), self._lock:
+            docs = self._matching(filter)
+            if docs:
+                self._docs.remove(docs[0])
+            return SimpleNamespace(deleted_count=len(docs[:1]))
+
+    def delete_many(self, filter):
+        with self._op(), self._lock:
+            docs = self._matching(filter)
+            for doc in docs:
+                self._docs.remove(doc)
+            return SimpleNamespace(deleted_count=len(docs))
+
+    def bulk_write(self, requests, ordered=True):
+        """Apply pymongo write-model objects (InsertOne, UpdateOne, DeleteOne, ...)."""
+        counts = defaultdict(int)
+        upserted_ids = {}
+        for index, request in enumerate(requests):
+            kind = type(request).__name__
+            if kind == "InsertOne":
+                self.insert_one(request._doc)
+                counts["inserted"] += 1
+            elif kind in ("UpdateOne", "UpdateMany", "ReplaceOne"):
+                method = self.update_many if kind == "UpdateMany" else self.update_one
+                result = method(request._filter, request._doc, upsert=bool(request._upsert))
+                counts["matched"] += result.matched_count
+                if result.upserted_id:
+                    counts["upserted"] += 1
+                    upserted_ids[index] = result.upserted_id
+            elif kind in ("DeleteOne", "DeleteMany"):
+                method = self.delete_many if kind == "DeleteMany" else self.delete_one
+                counts["deleted"] += method(request._filter).deleted_count
+        return SimpleNamespace(
+            inserted_count=counts["inserted"],
+            matched_count=counts["matched"],
+            modified_count=counts["matched"],
+            upserted_count=counts["upserted"],
+            upserted_ids=upserted_ids,
+            deleted_count=counts["deleted"],
+        )
+
+    # Indexes (no-ops in memory)
+
+    def create_index(self, keys, **kwargs):
+        return kwargs.get("name") or "_".join(str(k) for k in (keys if isinstance(keys, str) else [k for k, _ in keys]))
+
+    def create_indexes(self, indexes):
+        return [getattr(i, "document", {}).get("name", "index") for i in indexes]
+
+    def index_information(self):
+        return {"_id_": {"key": [("_id", 1)]}}
+
+
+def _group_key(doc, spec):
+    if isinstance(spec, str) and spec.startswith("$"):
+        return _get_path(doc, spec[1:])
+    if isinstance(spec, dict):
+        return tuple((k, _group_key(doc, v)) for k, v in spec.items())
+    return spec
+
+
+def _expr_value(doc, expr):
+    if isinstance(expr, dict):
+        if len(expr) == 1:
+            (op, args), = expr.items()
+            if op == "$cond":
+                condition, then, otherwise = args
+                return _expr_value(doc, then if _expr_value(doc, condition) else otherwise)
+            if op == "$eq":
+                left, right = (_expr_value(doc, a) for a in args)
+                return left == right
+        return {k: _expr_value(doc, v) for k, v in expr.items()}
+    return _group_key(doc, expr)
+
+
+def _group(docs, spec):
+    groups = {}
+    order = []
+    for doc in docs:
+        key = _group_key(doc, spec["_id"])
+        hashable = json_util.dumps(key)
+        if hashable not in groups:
+            groups[hashable] = {"_id": dict(key) if isinstance(key, tuple) else key}
+            order.append(hashable)
+        group = groups[hashable]
+        for field, accumulator in spec.items():
+            if field == "_id":
+                continue
+            (op, expr), = accumulator.items()
+            value = _expr_value(doc, expr)
+            if op == "$sum":
+                group[field] = group.get(field, 0) + (value or 0)
+            elif op == "$max":
+                group[field] = value if field not in group else max(group[field], value)
+            elif op == "$min":
+                group[field] = value if field not in group else min(group[field], value)
+            elif op == "$first":
+                group.setdefault(field, value)
+            elif op == "$last":
+                group[field] = value
+            elif op == "$push":
+                group.setdefault(field, []).append(value)
+            elif op == "$addToSet":
+                bucket = group.setdefault(field, [])
+                if value not in bucket:
+                    bucket.append(value)
+    return [groups[k] for k in order]
+
+
+class FakeDatabase:
+    def __init__(self, client, name, latency=None):
+        self.client = client
+        self.name = name
+        self.latency = latency
+        self._collections = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, name):
+        with self._lock:
+            if name not in self._collections:
+                self._collections[name] = FakeCollection(self, name, self.latency)
+            return self._collections[name]
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    def get_collection(self, name):
+        return self[name]
+
+    def list_collection_names(self):
+        return list(self._collections)
+
+    def command(self, *args, **kwargs):
+        return {"ok": 1.0}
+
+
+class FakeMongoClient:
+    """Stands in for pymongo.MongoClient; every database lives in memory."""
+
+    def __init__(self, *args, latency=None, **kwargs):
+        self.latency = latency
+        self._databases = {}
+        self.admin = FakeDatabase(self, "admin")
+
+    def __getitem__(self, name):
+        if name not in self._databases:
+            self._databases[name] = FakeDatabase(self, name, self.latency)
+        return self._databases[name]
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    def get_database(self, name=None):
+        return self[name or "gg_nexus"]
+
+    def close(self):
+        pass
+
+
+# ── Installation ────────────────────────────────────────────────
+
+_installed = {}
+
+
+def install(fixture, latency=None, db_name="gg_nexus"):
+    """
+    Patch google.genai.Client, requests.get and pymongo.MongoClient for replay.
+
+    Returns the fake Mongo client, whose database is seeded from the fixture.
+    """
+    os.environ.setdefault("GEMINI_API_KEY", "replay-key")
+    os.environ.setdefault("JWT_SECRET", "replay-secret-for-offline-benchmarks-only")
+
+    import pymongo
+    import requests
+    from google import genai
+
+    mongo = FakeMongoClient(latency=latency)
+    for name, documents in fixture.mongo.items():
+        mongo[db_name][name].seed(documents)
+
+    genai.Client = lambda *args, **kwargs: FakeGenaiClient(fixture, latency)
+    requests.get = make_fake_get(fixture, latency)
+    pymongo.MongoClient = lambda *args, **kwargs: mongo
+
+    _installed.update(fixture=fixture, mongo=mongo, mode="replay")
+    return mongo
+
+
+def install_recorder(fixture):
+    """Patch google.genai.Client and requests.get to record real responses into fixture."""
+    import requests
+    from google import genai
+
+    real_client_cls = genai.Client
+    genai.Client = lambda *args, **kwargs: RecordingGenaiClient(real_client_cls(*args, **kwargs), fixture)
+    requests.get = make_recording_get(requests.get, fixture)
+
+    _installed.update(fixture=fixture, mode="record")
+    return fixture
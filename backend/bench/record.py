@@ -0,0 +1,53 @@
+"""
+Record a replay fixture from the real Gemini, HTTP and Mongo backends.
+
+Needs a working backend/.env. Runs the given messages through the agent and
+fetches dashboard data for the given games, then snapshots Mongo collections.
+Run from backend/:
+
+    python -m bench.record --out bench/fixtures/recorded.json \
+        --username alice --message "what's the valorant meta?" --game Valorant
+"""
+
+import argparse
+from bench.harness import Fixture, install_recorder
+
+SNAPSHOT_COLLECTIONS = ["users", "conversations", "data_cache", "session_summaries"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Record a GG Nexus replay fixture")
+    parser.add_argument("--out", required=True)
+    parser.add_argument("--username", help="existing user whose profile drives the agent")
+    parser.add_argument("--message", action="append", default=[])
+    parser.add_argument("--game", action="append", default=[])
+    parser.add_argument("--snapshot-limit", type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    fixture = Fixture()
+    install_recorder(fixture)
+
+    # Imported after the recorder is installed so module-level clients are wrapped
+    from agents.react_agent import run_react_agent
+    from models.user import db, find_user_by_username, get_full_user
+    from tools.data_fetcher import fetch_game_data
+
+    user = get_full_user(str(find_user_by_username(args.username)["_id"])) if args.username else None
+    username = user["username"] if user else "Player"
+
+    for message in args.message:
+        result = run_react_agent(message, [], user, username)
+        print(f"[OK] Recorded agent run: {message[:60]} -> {len(result['reasoning_trace'])} steps")
+
+    for game in args.game:
+        fetch_game_data(game, "meta", force_refresh=True)
+        fetch_game_data(game, "general", force_refresh=True)
+        print(f"[OK] Recorded game data: {game}")
+
+    fixture.snapshot_mongo(db, SNAPSHOT_COLLECTIONS, limit=args.snapshot_limit)
+    fixture.save(args.out)
+    print(f"[OK] Fixture written to {args.out}: {len(fixture.gemini)} Gemini, {len(fixture.http)} HTTP entries")
+
+
+if __name__ == "__main__":
+    main()
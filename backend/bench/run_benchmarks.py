@@ -0,0 +1,226 @@
+"""
+Offline benchmark suite for the agent and hot API endpoints.
+
+Replays a fixture through fake Gemini/HTTP/Mongo clients with injected
+latency and reports per-benchmark latency percentiles, throughput and the
+time spent in each faked stage. Run from backend/:
+
+    python -m bench.run_benchmarks
+    python -m bench.run_benchmarks --latency gemini=400:120,http=60:20,mongo=1 --concurrency 16
+    python -m bench.run_benchmarks --only chat --requests 200 --json bench_output.json
+"""
+
+import argparse
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from bench.harness import STAGES, Fixture, LatencyModel, install
+
+FIXTURE_DIR = Path(__file__).parent / "fixtures"
+
+AGENT_MESSAGE = "I'm stuck in Gold as a jungle main in League, how do I start climbing?"
+
+SAMPLE_AGENT_TEXTS = [
+    'THOUGHT: Check the meta.\nACTION: search_game_info\nACTION_INPUT: {"game": "Valorant", "query_type": "meta"}',
+    'THOUGHT: Compare them.\nACTION: compare_games\nACTION_INPUT: {"game1": "Valorant",\n"game2": "Counter-Strike 2"}',
+    "THOUGHT: Enough data.\nFINAL_ANSWER:\n[MOOD:proud]\nNice climb! Keep your champion pool tight.\nWhat's next?",
+    "[MOOD:playful]\nJust a plain reply without any ReAct markers at all.",
+]
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def measure(name, fn, iterations=1, concurrency=1):
+    """Run fn(i) iterations times across a thread pool and summarize the timings."""
+    STAGES.reset()
+    latencies = []
+    errors = []
+
+    def one(i):
+        start = time.perf_counter()
+        try:
+            fn(i)
+        except Exception as e:
+            errors.append(repr(e))
+        latencies.append(time.perf_counter() - start)
+
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(iterations)))
+    wall = time.perf_counter() - wall_start
+
+    stages = STAGES.snapshot()
+    stage_ms = sum(s["total_ms"] for s in stages.values())
+    mean_ms = sum(latencies) / len(latencies) * 1000 if latencies else 0.0
+
+    return {
+        "name": name,
+        "iterations": iterations,
+        "concurrency": concurrency,
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+        "mean_ms": round(mean_ms, 3),
+        "p50_ms": round(_percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(_percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(_percentile(latencies, 99) * 1000, 3),
+        "throughput_per_s": round(iterations / wall, 2) if wall else 0.0,
+        "stages": {
+            stage: {**s, "per_op_ms": round(s["total_ms"] / iterations, 3)} for stage, s in stages.items()
+        },
+        # Time per operation not spent waiting on a faked service
+        "overhead_ms": round(max(0.0, mean_ms - stage_ms / iterations), 3),
+    }
+
+
+def seed_users(count):
+    """Create benchmark users directly in the (fake) users collection."""
+    from models.user import users_collection
+
+    users = []
+    for i in range(count):
+        doc = {
+            "username": f"bench_user_{i}",
+            "email": f"bench_user_{i}@example.com",
+            "password_hash": "x",
+            "profile": {
+                "favorite_games": ["League of Legends", "Valorant"],
+                "playstyle": ["competitive"],
+                "platforms": ["PC"],
+                "goals": ["rank", "improve"],
+                "skill_levels": {"League of Legends": "Advanced"},
+                "ranks": {"League of Legends": "Gold II", "Valorant": "Silver 3"},
+                "main_roles": {"League of Legends": "Jungle"},
+                "personal": {"age_range": "18-24", "gender": "", "region": "EUW"},
+            },
+            "ai_profile": {"player_archetype": "grinder", "growth_areas": "vision, wave management"},
+            "created_at": datetime.utcnow(),
+            "last_active": datetime.utcnow(),
+        }
+        users_collection.insert_one(doc)
+        users.append(doc)
+    return users
+
+
+def run_suite(args):
+    fixture = Fixture.load(args.fixture)
+    install(fixture, LatencyModel.parse(args.latency))
+
+    # Backend modules must be imported after install() so they pick up the fakes
+    from agents.react_agent import parse_agent_response, run_react_agent
+    from app import app
+    from models.user import get_full_user
+    from routes.auth import generate_token
+    from tools.game_tools import execute_tool
+
+    users = seed_users(max(args.requests, args.iterations, 1))
+    tokens = [generate_token(u["_id"]) for u in users]
+    full_user = get_full_user(str(users[0]["_id"]))
+
+    benchmarks = {
+        "parse": lambda: measure(
+            "parse_agent_response",
+            lambda i: parse_agent_response(SAMPLE_AGENT_TEXTS[i % len(SAMPLE_AGENT_TEXTS)]),
+            iterations=args.iterations * 100,
+        ),
+        "tool_cold": lambda: measure(
+            "execute_tool search_game_info (no memo)",
+            lambda i: execute_tool("search_game_info", {"game": "League of Legends"}),
+            iterations=args.iterations,
+            concurrency=args.concurrency,
+        ),
+        "tool_warm": lambda: measure(
+            "execute_tool search_game_info (session memo)",
+            lambda i: execute_tool("search_game_info", {"game": "League of Legends"}, session_id="bench"),
+            iterations=args.iterations,
+            concurrency=args.concurrency,
+        ),
+        "agent": lambda: measure(
+            "run_react_agent",
+            lambda i: run_react_agent(AGENT_MESSAGE, [], full_user, full_user["username"]),
+            iterations=args.iterations,
+            concurrency=args.concurrency,
+        ),
+        "dashboard": lambda: measure(
+            "GET /api/dashboard/games",
+            lambda i: _request(app, "get", "/api/dashboard/games", tokens[i % len(tokens)]),
+            iterations=args.iterations,
+            concurrency=args.concurrency,
+        ),
+        "chat": lambda: measure(
+            "POST /api/chat (concurrent)",
+            lambda i: _request(
+                app,
+                "post",
+                "/api/chat",
+                tokens[i % len(tokens)],
+                {"message": AGENT_MESSAGE, "session_id": f"bench-{i}"},
+            ),
+            iterations=args.requests,
+            concurrency=args.concurrency,
+        ),
+    }
+
+    selected = args.only or list(benchmarks)
+    results = [benchmarks[name]() for name in selected]
+    return {"fixture": str(args.fixture), "latency": args.latency, "gemini_misses": fixture.misses, "results": results}
+
+
+def _request(app, method, path, token, body=None):
+    client = app.test_client()
+    response = getattr(client, method)(path, json=body, headers={"Authorization": f"Bearer {token}"})
+    if response.status_code >= 400:
+        raise RuntimeError(f"{method.upper()} {path} -> {response.status_code}: {response.get_data(as_text=True)[:200]}")
+    return response
+
+
+def print_report(report):
+    print(f"\nFixture: {report['fixture']}   latency: {report['latency'] or 'none'}")
+    header = f"{'benchmark':<46}{'n':>6}{'conc':>6}{'mean':>10}{'p50':>10}{'p95':>10}{'p99':>10}{'ops/s':>10}{'err':>5}"
+    print(header)
+    print("-" * len(header))
+    for r in report["results"]:
+        print(
+            f"{r['name']:<46}{r['iterations']:>6}{r['concurrency']:>6}{r['mean_ms']:>10.2f}"
+            f"{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}{r['p99_ms']:>10.2f}"
+            f"{r['throughput_per_s']:>10.1f}{r['errors']:>5}"
+        )
+        stages = ", ".join(
+            f"{stage} {s['per_op_ms']:.2f}ms/op ({s['calls']} calls)" for stage, s in sorted(r["stages"].items())
+        )
+        print(f"    stages: {stages or '-'}; overhead {r['overhead_ms']:.2f}ms/op")
+        if r["first_error"]:
+            print(f"    first error: {r['first_error']}")
+    if report["gemini_misses"]:
+        print(f"\n[WARN] {report['gemini_misses']} Gemini requests had no fixture entry (default text used)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline GG Nexus benchmarks")
+    parser.add_argument("--fixture", default=str(FIXTURE_DIR / "default.json"))
+    parser.add_argument("--latency", default="", help="e.g. gemini=400:120,http=60:20,mongo=1 (mean:jitter ms)")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=50, help="requests for the concurrent /api/chat run")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument(
+        "--only", nargs="*", choices=["parse", "tool_cold", "tool_warm", "agent", "dashboard", "chat"]
+    )
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args(argv)
+
+    report = run_suite(args)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
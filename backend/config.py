@@ -14,6 +14,37 @@ JWT_EXPIRATION_HOURS = 24  # Token expires after 24 hours
 # === Database ===
 MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/gg_nexus")
 
+# === Prompt caching ===
+# Server-side Gemini context caching for the static ReAct prompt prefix (opt-in)
+GEMINI_CONTEXT_CACHE = os.getenv("GEMINI_CONTEXT_CACHE", "false").lower() == "true"
+GEMINI_CONTEXT_CACHE_TTL_SECONDS = int(os.getenv("GEMINI_CONTEXT_CACHE_TTL_SECONDS", "3600"))
+
+# === Profile evolution ===
+# Evolve profiles during chat traffic; turn off when workers/evolve_batch.py runs on a schedule
+PROFILE_EVOLVE_ONLINE = os.getenv("PROFILE_EVOLVE_ONLINE", "true").lower() == "true"
+
+# === Chat persistence ===
+# Buffer chat turns and write them in batches off the request thread
+CHAT_WRITE_BEHIND = os.getenv("CHAT_WRITE_BEHIND", "false").lower() == "true"
+
+# Store messages in per-session bucket documents instead of one document each
+# (run migrations/bucket_conversations.py before switching an existing deployment)
+CHAT_BUCKET_STORAGE = os.getenv("CHAT_BUCKET_STORAGE", "false").lower() == "true"
+CHAT_BUCKET_SIZE = int(os.getenv("CHAT_BUCKET_SIZE", "50"))
+
+# === Passwords ===
+# bcrypt work factor for new hashes; stored hashes with a different cost are rehashed on login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+# === Rate limiting ===
+# Where limiter state lives: "memory" (one process), "mongo" (shared by every
+# worker and host) or "sqlite" (shared by the workers on one host)
+RATE_LIMIT_STORAGE = os.getenv("RATE_LIMIT_STORAGE", "memory").lower()
+RATE_LIMIT_SQLITE_PATH = os.getenv("RATE_LIMIT_SQLITE_PATH", "rate_limits.sqlite3")
+# Reverse proxies in front of the app (Vite dev server, nginx, a load balancer);
+# their X-Forwarded-For hops are trusted for the client address
+TRUSTED_PROXIES = int(os.getenv("TRUSTED_PROXIES", "0"))
+
 # === Validation ===
 if not GEMINI_API_KEY:
     raise ValueError("GEMINI_API_KEY not found! Check your backend/.env file")
\ No newline at end of file
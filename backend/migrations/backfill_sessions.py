@@ -0,0 +1,77 @@
+"""
+Backfill the materialized `sessions` collection from existing messages.
+
+Safe to run while the app is serving traffic and safe to re-run: counts and
+last_time only ever move up ($max), and a preview written by live traffic
+is never replaced. Run from backend/:
+
+    python -m migrations.backfill_sessions
+    python -m migrations.backfill_sessions --batch-size 500
+"""
+
+import argparse
+from pymongo import UpdateOne
+from models.conversation import (
+    SESSION_PREVIEW_CHARS,
+    conversations_collection,
+    ensure_session_indexes,
+    sessions_collection,
+)
+
+
+def backfill(batch_size=1000):
+    """Rebuild session summaries from conversations; returns the number of sessions written."""
+    ensure_session_indexes()
+    pipeline = [
+        {"$sort": {"timestamp": 1}},
+        {
+            "$group": {
+                "_id": {"user_id": "$user_id", "session_id": "$session_id"},
+                "last_message": {"$last": "$content"},
+                "created_at": {"$min": "$timestamp"},
+                "last_time": {"$max": "$timestamp"},
+                "message_count": {"$sum": 1},
+                "user_message_count": {"$sum": {"$cond": [{"$eq": ["$role", "user"]}, 1, 0]}},
+            }
+        },
+    ]
+
+    written = 0
+    batch = []
+    for s in conversations_collection.aggregate(pipeline, allowDiskUse=True):
+        batch.append(UpdateOne(
+            {"user_id": s["_id"]["user_id"], "session_id": s["_id"]["session_id"]},
+            {
+                "$max": {
+                    "last_time": s["last_time"],
+                    "message_count": s["message_count"],
+                    "user_message_count": s["user_message_count"],
+                },
+                "$setOnInsert": {
+                    "created_at": s["created_at"],
+                    "last_message": s["last_message"][: SESSION_PREVIEW_CHARS + 1],
+                },
+            },
+            upsert=True,
+        ))
+        if len(batch) >= batch_size:
+            sessions_collection.bulk_write(batch, ordered=False)
+            written += len(batch)
+            batch = []
+    if batch:
+        sessions_collection.bulk_write(batch, ordered=False)
+        written += len(batch)
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backfill the sessions collection")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    written = backfill(args.batch_size)
+    print(f"[OK] Backfilled {written} sessions")
+
+
+if __name__ == "__main__":
+    main()
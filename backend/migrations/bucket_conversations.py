@@ -0,0 +1,91 @@
+"""
+Convert per-message `conversations` documents into `conversation_buckets`.
+
+Each session's messages are packed oldest-first into buckets of
+CHAT_BUCKET_SIZE. Messages already present in a bucket (matched by _id) are
+skipped, so the tool can be re-run after an interruption or after live
+traffic has started writing buckets; only the missing messages are written,
+as buckets of their own. The source collection is left in place; drop it
+once CHAT_BUCKET_STORAGE=true is live and verified. Run from backend/ before
+switching the flag on:
+
+    python -m migrations.bucket_conversations
+    python -m migrations.bucket_conversations --dry-run
+"""
+
+import argparse
+from config import CHAT_BUCKET_SIZE
+from models.conversation import (
+    _bucket_entry,
+    conversation_buckets_collection,
+    conversations_collection,
+    ensure_bucket_indexes,
+)
+
+
+def _buckets_for(user_id, session_id, messages):
+    for start in range(0, len(messages), CHAT_BUCKET_SIZE):
+        chunk = messages[start:start + CHAT_BUCKET_SIZE]
+        yield {
+            "user_id": user_id,
+            "session_id": session_id,
+            "count": len(chunk),
+            "first_time": chunk[0]["timestamp"],
+            "last_time": chunk[-1]["timestamp"],
+            "messages": [_bucket_entry(m) for m in chunk],
+        }
+
+
+def _bucketed_ids(user_id, session_id):
+    ids = set()
+    for bucket in conversation_buckets_collection.find(
+        {"user_id": user_id, "session_id": session_id}, {"messages._id": 1}
+    ):
+        ids.update(m["_id"] for m in bucket.get("messages", []))
+    return ids
+
+
+def migrate(dry_run=False):
+    """Bucket every message not yet in a bucket; returns (sessions, messages, buckets) written."""
+    if not dry_run:
+        ensure_bucket_indexes()
+
+    pairs = conversations_collection.aggregate([
+        {"$group": {"_id": {"user_id": "$user_id", "session_id": "$session_id"}}}
+    ], allowDiskUse=True)
+
+    sessions = messages_written = buckets_written = 0
+    for pair in pairs:
+        user_id, session_id = pair["_id"]["user_id"], pair["_id"]["session_id"]
+        done = _bucketed_ids(user_id, session_id)
+        messages = [
+            m for m in conversations_collection.find(
+                {"user_id": user_id, "session_id": session_id},
+                {"role": 1, "content": 1, "timestamp": 1},
+            ).sort([("timestamp", 1), ("_id", 1)])
+            if m["_id"] not in done
+        ]
+        if not messages:
+            continue
+
+        buckets = list(_buckets_for(user_id, session_id, messages))
+        if buckets and not dry_run:
+            conversation_buckets_collection.insert_many(buckets, ordered=True)
+        sessions += 1
+        messages_written += len(messages)
+        buckets_written += len(buckets)
+    return sessions, messages_written, buckets_written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Move chat messages into bucket documents")
+    parser.add_argument("--dry-run", action="store_true", help="count what would be written")
+    args = parser.parse_args(argv)
+
+    sessions, messages, buckets = migrate(dry_run=args.dry_run)
+    verb = "Would bucket" if args.dry_run else "Bucketed"
+    print(f"[OK] {verb} {messages} messages from {sessions} sessions into {buckets} buckets")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,57 @@
-"""Conversation model — persists chat history and provides agent memory."""
+"""
+Conversation model — persists chat history and provides agent memory.
 
-from datetime import datetime
+Messages live either one per document in `conversations` (default) or,
+with CHAT_BUCKET_STORAGE, appended to per-session documents in
+`conversation_buckets` holding up to CHAT_BUCKET_SIZE messages each. All
+reads go through the _recent_* / _ascending_* helpers, which pick the store.
+"""
+
+import base64
+import heapq
+import json
+import os
+import threading
+from datetime import datetime, timedelta
 from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from config import CHAT_BUCKET_SIZE, CHAT_BUCKET_STORAGE
+from models.ttl_cache import TTLCache
 from models.user import db
+from tools.game_names import find_game_mentions
 
 conversations_collection = db.conversations
+conversation_buckets_collection = db.conversation_buckets
+session_summaries_collection = db.session_summaries
+sessions_collection = db.sessions
+user_activity_collection = db.user_activity
+
+# Token budget for history sent on each agent step (summary + verbatim turns)
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "1500"))
+VERBATIM_MESSAGES = 6       # newest messages that are never folded into the summary
+SUMMARY_MAX_CHARS = 1500    # rolling summary keeps its newest lines within this size
+SUMMARY_LINE_CHARS = 160
+SESSION_PREVIEW_CHARS = 100
+HISTORY_PAGE_MAX = 100
+HISTORY_FIELDS = {"role": 1, "content": 1, "timestamp": 1}
+
+# Hot cache of active sessions: newest messages + rolling summary per session.
+# Each process has its own, so every hit is checked against the session's row
+# (one indexed point read) and reloaded when another process has written since.
+SESSION_CACHE_SIZE = int(os.getenv("SESSION_CACHE_SIZE", "2000"))
+SESSION_CACHE_TTL_SECONDS = int(os.getenv("SESSION_CACHE_TTL_SECONDS", "900"))
+SESSION_CACHE_MESSAGES = 40
+session_cache = TTLCache(SESSION_CACHE_SIZE, SESSION_CACHE_TTL_SECONDS)
+
+_summaries_in_flight = set()
+_summaries_lock = threading.Lock()
+
+
+def _message_time():
+    """Now, truncated to the millisecond precision Mongo stores datetimes with."""
+    now = datetime.utcnow()
+    return now.replace(microsecond=now.microsecond // 1000 * 1000)
 
 
 def save_message(user_id, role, content, session_id=None):
@@ -14,21 +61,478 @@ def save_message(user_id, role, content, session_id=None):
         "session_id": session_id or str(ObjectId()),
         "role": role,
         "content": content,
-        "timestamp": datetime.utcnow(),
+        "timestamp": _message_time(),
     }
-    conversations_collection.insert_one(message)
+    if CHAT_BUCKET_STORAGE:
+        append_to_buckets(user_id, message["session_id"], [message])
+    else:
+        conversations_collection.insert_one(message)
+    touch_session(user_id, message["session_id"], [message])
+    remember_messages([message])
     return message
 
 
+def build_turn(user_id, session_id, user_content, assistant_content):
+    """Message documents for one user/assistant exchange, in order."""
+    now = _message_time()
+    # _ids are assigned up front so cached and buffered copies match what gets stored
+    return [
+        {"_id": ObjectId(), "user_id": user_id, "session_id": session_id, "role": "user",
+         "content": user_content, "timestamp": now},
+        # A millisecond apart (the finest step Mongo keeps) so the pair always
+        # sorts user-first and cached copies compare the same as stored ones
+        {"_id": ObjectId(), "user_id": user_id, "session_id": session_id, "role": "assistant",
+         "content": assistant_content, "timestamp": now + timedelta(milliseconds=1)},
+    ]
+
+
+def save_turn(user_id, session_id, user_content, assistant_content):
+    """Persist a whole chat turn: one insert_many plus one session upsert."""
+    messages = build_turn(user_id, session_id, user_content, assistant_content)
+    write_messages(messages)
+    remember_messages(messages)
+    return messages
+
+
+def remember_messages(messages):
+    """Append just-saved messages to their sessions' cache entries, if cached."""
+    for (uid, sid), msgs in _group_by_session(messages).items():
+
+        def _append(entry, msgs=msgs):
+            seen = {m["_id"] for m in entry["recent"]}
+            fresh = [m for m in msgs if m["_id"] not in seen]
+            entry["recent"] = sorted(fresh, key=_message_key, reverse=True) + entry["recent"]
+            del entry["recent"][SESSION_CACHE_MESSAGES:]
+            # Keep the entry's stamp in step with the sessions row these writes bump
+            entry["message_count"] += len(fresh)
+            if fresh:
+                newest = max(m["timestamp"] for m in fresh)
+                entry["last_time"] = max(entry["last_time"] or newest, newest)
+
+        session_cache.update((uid, sid), _append)
+
+
+def _cached_session(user_id, session_id):
+    """
+    {"recent": newest-first messages, "summary": summary doc} — from cache or Mongo.
+
+    A cached entry is used only if the session's row isn't ahead of it, i.e.
+    no other process saved messages the entry hasn't seen. Turns this process
+    saved but hasn't flushed yet (write-behind) put the entry ahead of the
+    row, which is fine; they are kept across a reload.
+    """
+    key = (user_id, session_id)
+    # Read the stamp first so a reloaded entry is never marked newer than its messages
+    stamp = sessions_collection.find_one(
+        {"user_id": user_id, "session_id": session_id}, {"message_count": 1, "last_time": 1}
+    ) or {}
+    entry = session_cache.get(key)
+    if entry is not None and not _entry_behind(entry, stamp):
+        return entry
+
+    recent = _recent_session_messages(user_id, session_id, SESSION_CACHE_MESSAGES)
+    if entry is not None:
+        loaded = {m["_id"] for m in recent}
+        recent = sorted(
+            recent + [m for m in entry["recent"] if m["_id"] not in loaded],
+            key=_message_key,
+            reverse=True,
+        )[:SESSION_CACHE_MESSAGES]
+    entry = {
+        "recent": recent,
+        "summary": session_summaries_collection.find_one(
+            {"user_id": user_id, "session_id": session_id}
+        ),
+        "message_count": stamp.get("message_count", 0),
+        "last_time": stamp.get("last_time"),
+    }
+    session_cache.put(key, entry)
+    return entry
+
+
+def _entry_behind(entry, stamp):
+    if stamp.get("message_count", 0) > entry["message_count"]:
+        return True
+    last_time = stamp.get("last_time")
+    return bool(last_time and (entry["last_time"] is None or last_time > entry["last_time"]))
+
+
+def write_messages(messages):
+    """
+    Insert a batch of messages (any users/sessions) and fold them into sessions.
+
+    Re-running a batch after a partial failure is safe: messages that already
+    carry an _id and were written are skipped as duplicates (in bucket mode,
+    chunks already appended), and only the new ones are counted into their
+    sessions.
+    """
+    if not messages:
+        return
+    if CHAT_BUCKET_STORAGE:
+        appended = {}
+        for (uid, sid), msgs in _group_by_session(messages).items():
+            written = append_to_buckets(uid, sid, msgs)
+            if written:
+                appended[(uid, sid)] = written
+        _touch_sessions(appended)
+        return
+
+    inserted = messages
+    try:
+        conversations_collection.insert_many(messages, ordered=False)
+    except BulkWriteError as e:
+        errors = e.details.get("writeErrors", [])
+        if any(err.get("code") != 11000 for err in errors):
+            raise
+        duplicates = {err["index"] for err in errors}
+        inserted = [m for i, m in enumerate(messages) if i not in duplicates]
+    _touch_sessions(_group_by_session(inserted))
+
+
+def _group_by_session(messages):
+    by_session = {}
+    for m in messages:
+        by_session.setdefault((m["user_id"], m["session_id"]), []).append(m)
+    return by_session
+
+
+def _touch_sessions(by_session):
+    if not by_session:
+        return
+    keys = list(by_session)
+    result = sessions_collection.bulk_write(
+        [UpdateOne(*_session_update(uid, sid, by_session[(uid, sid)]), upsert=True) for uid, sid in keys],
+        ordered=False,
+    )
+    _record_activity(by_session, {keys[i] for i in result.upserted_ids})
+
+
+def append_to_buckets(user_id, session_id, messages):
+    """
+    Append messages to the session's open bucket, rolling over when it is full.
+
+    A bucket is open while it holds fewer than CHAT_BUCKET_SIZE messages; a
+    push may overshoot by one batch rather than split a turn. The upsert
+    starts a new bucket when no open one matches.
+
+    Each chunk lands in one $push, so a chunk whose first message is already
+    in a bucket was written by an earlier attempt and is skipped — $push
+    itself isn't idempotent. Returns the messages actually appended.
+    """
+    appended = []
+    for start in range(0, len(messages), CHAT_BUCKET_SIZE):
+        chunk = messages[start:start + CHAT_BUCKET_SIZE]
+        for m in chunk:
+            m.setdefault("_id", ObjectId())
+        if conversation_buckets_collection.find_one(
+            {"user_id": user_id, "session_id": session_id, "messages._id": chunk[0]["_id"]},
+            {"_id": 1},
+        ):
+            continue
+        conversation_buckets_collection.update_one(
+            {"user_id": user_id, "session_id": session_id, "count": {"$lt": CHAT_BUCKET_SIZE}},
+            {
+                "$push": {"messages": {"$each": [_bucket_entry(m) for m in chunk]}},
+                "$inc": {"count": len(chunk)},
+                "$min": {"first_time": chunk[0]["timestamp"]},
+                "$max": {"last_time": chunk[-1]["timestamp"]},
+            },
+            upsert=True,
+        )
+        appended.extend(chunk)
+    return appended
+
+
+def _bucket_entry(message):
+    return {
+        "_id": message["_id"],
+        "role": message["role"],
+        "content": message["content"],
+        "timestamp": message["timestamp"],
+    }
+
+
+def _game_key(game):
+    # Mongo field names can't contain dots or start with $
+    return game.replace(".", "_").lstrip("$")
+
+
+def activity_update(messages, new_sessions=0):
+    """$inc/$min/$max update folding a user's new messages into their activity counters."""
+    user_messages = [m for m in messages if m["role"] == "user"]
+    inc = {"total_messages": len(user_messages), "assistant_messages": len(messages) - len(user_messages)}
+    if new_sessions:
+        inc["total_sessions"] = new_sessions
+    for m in user_messages:
+        for game in find_game_mentions(m["content"]):
+            key = f"game_mentions.{_game_key(game)}"
+            inc[key] = inc.get(key, 0) + 1
+    return {
+        "$inc": inc,
+        "$min": {"first_active": min(m["timestamp"] for m in messages)},
+        "$max": {"last_active": max(m["timestamp"] for m in messages)},
+    }
+
+
+def _record_activity(by_session, new_session_keys):
+    """One counter upsert per user for everything just saved."""
+    by_user = {}
+    for (uid, sid), msgs in by_session.items():
+        entry = by_user.setdefault(uid, {"messages": [], "new_sessions": 0})
+        entry["messages"].extend(msgs)
+        entry["new_sessions"] += (uid, sid) in new_session_keys
+    try:
+        user_activity_collection.bulk_write(
+            [UpdateOne({"_id": uid}, activity_update(e["messages"], e["new_sessions"]), upsert=True)
+             for uid, e in by_user.items()],
+            ordered=False,
+        )
+    except Exception as e:
+        # Counters are repairable by the reconciliation job; never fail the save for them
+        print(f"[WARN] Activity counter update failed: {e}")
+
+
+def get_user_activity(user_id):
+    """The user's activity counters, or None if none were recorded yet."""
+    return user_activity_collection.find_one({"_id": user_id})
+
+
+def reconcile_user_activity(user_id):
+    """
+    Recompute a user's counters from their stored messages and overwrite them.
+
+    Returns the new counters document. A turn saved while this runs can be
+    counted twice or not at all; the next reconciliation corrects it.
+    """
+    counters = {
+        "total_messages": 0,
+        "assistant_messages": 0,
+        "total_sessions": 0,
+        "game_mentions": {},
+        "first_active": None,
+        "last_active": None,
+    }
+    sessions = set()
+    for m in _ascending_user_messages(user_id):
+        sessions.add(m["session_id"])
+        counters["first_active"] = counters["first_active"] or m["timestamp"]
+        counters["last_active"] = m["timestamp"]
+        if m["role"] != "user":
+            counters["assistant_messages"] += 1
+            continue
+        counters["total_messages"] += 1
+        for game in find_game_mentions(m["content"]):
+            key = _game_key(game)
+            counters["game_mentions"][key] = counters["game_mentions"].get(key, 0) + 1
+    counters["total_sessions"] = len(sessions)
+    counters["reconciled_at"] = datetime.utcnow()
+
+    user_activity_collection.update_one({"_id": user_id}, {"$set": counters}, upsert=True)
+    return {"_id": user_id, **counters}
+
+
+def ensure_bucket_indexes():
+    conversation_buckets_collection.create_index([("user_id", 1), ("session_id", 1), ("last_time", -1)])
+    conversation_buckets_collection.create_index([("user_id", 1), ("last_time", -1)])
+    conversation_buckets_collection.create_index("last_time")
+    # Lets a retried append find chunks that already landed
+    conversation_buckets_collection.create_index([("user_id", 1), ("session_id", 1), ("messages._id", 1)])
+
+
+def touch_session(user_id, session_id, messages):
+    """Fold newly saved messages into the session's materialized summary (one upsert)."""
+    result = sessions_collection.update_one(*_session_update(user_id, session_id, messages), upsert=True)
+    new_sessions = {(user_id, session_id)} if result.upserted_id else set()
+    _record_activity({(user_id, session_id): messages}, new_sessions)
+
+
+def _session_update(user_id, session_id, messages):
+    last = messages[-1]
+    return (
+        {"user_id": user_id, "session_id": session_id},
+        {
+            "$set": {"last_message": last["content"][: SESSION_PREVIEW_CHARS + 1]},
+            "$max": {"last_time": last["timestamp"]},
+            "$inc": {
+                "message_count": len(messages),
+                "user_message_count": sum(1 for m in messages if m["role"] == "user"),
+            },
+            "$setOnInsert": {"created_at": messages[0]["timestamp"]},
+        },
+    )
+
+
+def ensure_session_indexes():
+    """Indexes backing session lists and per-session upserts."""
+    try:
+        sessions_collection.create_index([("user_id", 1), ("session_id", 1)], unique=True)
+        sessions_collection.create_index([("user_id", 1), ("last_time", -1)])
+        # Keyset pagination over a session's messages
+        conversations_collection.create_index(
+            [("user_id", 1), ("session_id", 1), ("timestamp", -1), ("_id", -1)]
+        )
+        if CHAT_BUCKET_STORAGE:
+            ensure_bucket_indexes()
+    except Exception as e:
+        print(f"[WARN] Could not create session indexes: {e}")
+
+
+# ── Storage reads ───────────────────────────────────────────────
+
+
+def _message_key(message):
+    return message["timestamp"], message["_id"]
+
+
+def _newest_from_buckets(query, limit=None, keep=None):
+    """
+    Newest-first messages across the buckets matching query.
+
+    Buckets are read newest-first and reading stops once the next bucket
+    ends before the oldest message already needed, so recent history is
+    usually a single document read.
+    """
+    found = []
+    for bucket in conversation_buckets_collection.find(query).sort("last_time", -1):
+        if limit and len(found) >= limit and bucket["last_time"] < found[limit - 1]["timestamp"]:
+            break
+        for m in bucket["messages"]:
+            if keep is None or keep(m):
+                found.append({**m, "user_id": bucket["user_id"], "session_id": bucket["session_id"]})
+        found.sort(key=_message_key, reverse=True)
+    return found[:limit] if limit else found
+
+
+def _oldest_from_buckets(query, keep=None, batch_size=20):
+    """Stream messages oldest-first across (possibly overlapping) buckets."""
+    heap = []
+    buckets = conversation_buckets_collection.find(query).sort("first_time", 1).batch_size(batch_size)
+    for bucket in buckets:
+        while heap and heap[0][0][0] < bucket["first_time"]:
+            yield heapq.heappop(heap)[1]
+        for m in bucket["messages"]:
+            if keep is None or keep(m):
+                m = {**m, "user_id": bucket["user_id"], "session_id": bucket["session_id"]}
+                heapq.heappush(heap, (_message_key(m), m))
+    while heap:
+        yield heapq.heappop(heap)[1]
+
+
+def _recent_session_messages(user_id, session_id, limit, before=None, fields=None):
+    """A session's newest messages, newest first, optionally before a (timestamp, _id) key."""
+    if CHAT_BUCKET_STORAGE:
+        query = {"user_id": user_id, "session_id": session_id}
+        keep = None
+        if before:
+            query["first_time"] = {"$lte": before[0]}
+            keep = lambda m: _message_key(m) < before
+        return _newest_from_buckets(query, limit, keep)
+
+    query = {"user_id": user_id, "session_id": session_id}
+    if before:
+        query["$or"] = [
+            {"timestamp": {"$lt": before[0]}},
+            {"timestamp": before[0], "_id": {"$lt": before[1]}},
+        ]
+    return list(
+        conversations_collection.find(query, fields)
+        .sort([("timestamp", -1), ("_id", -1)])
+        .limit(limit)
+    )
+
+
+def _ascending_session_messages(user_id, session_id, after=None, until=None, batch_size=500):
+    """Stream a session's messages oldest first, optionally within (after, until]."""
+    if CHAT_BUCKET_STORAGE:
+        query = {"user_id": user_id, "session_id": session_id}
+        if after:
+            query["last_time"] = {"$gt": after}
+        if until:
+            query["first_time"] = {"$lte": until}
+        return _oldest_from_buckets(
+            query,
+            keep=lambda m: (not after or m["timestamp"] > after) and (not until or m["timestamp"] <= until),
+        )
+
+    query = {"user_id": user_id, "session_id": session_id}
+    window = {}
+    if after:
+        window["$gt"] = after
+    if until:
+        window["$lte"] = until
+    if window:
+        query["timestamp"] = window
+    return (
+        conversations_collection.find(query)
+        .sort([("timestamp", 1), ("_id", 1)])
+        .batch_size(batch_size)
+    )
+
+
+def _recent_user_messages(user_id, limit, role="user", since=None, exclude_session_id=None):
+    """A user's newest messages across sessions, newest first."""
+    if CHAT_BUCKET_STORAGE:
+        query = {"user_id": user_id}
+        if since:
+            query["last_time"] = {"$gt": since}
+        if exclude_session_id:
+            query["session_id"] = {"$ne": exclude_session_id}
+        return _newest_from_buckets(
+            query,
+            limit,
+            keep=lambda m: (not role or m["role"] == role) and (not since or m["timestamp"] > since),
+        )
+
+    query = {"user_id": user_id}
+    if role:
+        query["role"] = role
+    if since:
+        query["timestamp"] = {"$gt": since}
+    if exclude_session_id:
+        query["session_id"] = {"$ne": exclude_session_id}
+    return list(conversations_collection.find(query).sort("timestamp", -1).limit(limit))
+
+
+def _ascending_user_messages(user_id):
+    """Stream all of a user's messages (every session and role), oldest first."""
+    if CHAT_BUCKET_STORAGE:
+        return _oldest_from_buckets({"user_id": user_id})
+    return conversations_collection.find({"user_id": user_id}).sort([("timestamp", 1), ("_id", 1)])
+
+
+def get_active_user_messages(since):
+    """Every user's own messages newer than `since`, grouped by user_id, oldest first."""
+    if CHAT_BUCKET_STORAGE:
+        by_user = {}
+        for m in _oldest_from_buckets(
+            {"last_time": {"$gt": since}},
+            keep=lambda m: m["role"] == "user" and m["timestamp"] > since,
+        ):
+            by_user.setdefault(m["user_id"], []).append(
+                {"content": m["content"], "timestamp": m["timestamp"]}
+            )
+        return by_user
+
+    groups = conversations_collection.aggregate([
+        {"$match": {"role": "user", "timestamp": {"$gt": since}}},
+        {"$sort": {"timestamp": 1}},
+        {"$group": {
+            "_id": "$user_id",
+            "messages": {"$push": {"content": "$content", "timestamp": "$timestamp"}},
+        }},
+    ])
+    return {g["_id"]: g["messages"] for g in groups}
+
+
+# ── History ─────────────────────────────────────────────────────
+
+
 def get_conversation_history(user_id, session_id=None, limit=20):
     """Retrieve recent messages formatted for the Gemini API."""
-    query = {"user_id": user_id}
     if session_id:
-        query["session_id"] = session_id
-
-    messages = list(
-        conversations_collection.find(query).sort("timestamp", -1).limit(limit)
-    )
+        messages = _recent_session_messages(user_id, session_id, limit)
+    else:
+        messages = _recent_user_messages(user_id, limit, role=None)
     messages.reverse()
 
     return [
@@ -42,42 +546,241 @@ def get_conversation_history(user_id, session_id=None, limit=20):
 
 def get_user_sessions(user_id, limit=10):
     """List recent chat sessions with previews (episodic memory)."""
-    pipeline = [
-        {"$match": {"user_id": user_id}},
-        {
-            "$group": {
-                "_id": "$session_id",
-                "last_message": {"$last": "$content"},
-                "last_time": {"$max": "$timestamp"},
-                "message_count": {"$sum": 1},
-            }
-        },
-        {"$sort": {"last_time": -1}},
-        {"$limit": limit},
-    ]
-
+    sessions = (
+        sessions_collection.find({"user_id": user_id})
+        .sort("last_time", -1)
+        .limit(limit)
+    )
     return [
         {
-            "session_id": s["_id"],
-            "preview": s["last_message"][:100]
-            + ("..." if len(s["last_message"]) > 100 else ""),
+            "session_id": s["session_id"],
+            "preview": s["last_message"][:SESSION_PREVIEW_CHARS]
+            + ("..." if len(s["last_message"]) > SESSION_PREVIEW_CHARS else ""),
             "last_time": s["last_time"].isoformat(),
             "message_count": s["message_count"],
         }
-        for s in conversations_collection.aggregate(pipeline)
+        for s in sessions
     ]
 
 
-def get_user_context_summary(user_id, limit=5):
-    """Summarize recent user messages for agent context injection."""
-    recent = list(
-        conversations_collection.find({"user_id": user_id, "role": "user"})
-        .sort("timestamp", -1)
-        .limit(limit)
+def encode_cursor(message):
+    """Opaque keyset cursor for a message: its (timestamp, _id)."""
+    raw = json.dumps([message["timestamp"].isoformat(), str(message["_id"])])
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor):
+    """(timestamp, ObjectId) from encode_cursor(); raises ValueError if malformed."""
+    try:
+        timestamp, message_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return datetime.fromisoformat(timestamp), ObjectId(message_id)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+
+
+def get_session_page(user_id, session_id, limit=50, before=None):
+    """
+    One page of a session's messages, oldest first, ending just before `before`.
+
+    Pages walk backwards from the newest message by (timestamp, _id). Returns
+    (messages, next_cursor); next_cursor fetches the page of older messages
+    and is None once the start of the session is reached.
+    """
+    limit = max(1, min(limit, HISTORY_PAGE_MAX))
+    before = decode_cursor(before) if before else None
+    messages = _recent_session_messages(
+        user_id, session_id, limit + 1, before=before, fields=HISTORY_FIELDS
     )
+    has_more = len(messages) > limit
+    messages = messages[:limit]
+    next_cursor = encode_cursor(messages[-1]) if has_more else None
+    messages.reverse()
+    return messages, next_cursor
+
+
+def iter_session_messages(user_id, session_id, batch_size=500):
+    """Stream every message of a session, oldest first, without loading them all."""
+    return _ascending_session_messages(user_id, session_id, batch_size=batch_size)
+
+
+def get_user_messages_since(user_id, since=None, limit=12):
+    """
+    The user's own messages newer than `since`, oldest first.
+
+    Only the newest `limit` are returned; profile evolution treats anything
+    older than that as already folded in.
+    """
+    messages = _recent_user_messages(user_id, limit, since=since)
+    messages.reverse()
+    return [{"content": m["content"], "timestamp": m["timestamp"]} for m in messages]
+
+
+def get_user_context_summary(user_id, limit=5, exclude_session_id=None):
+    """Summarize recent user messages for agent context injection."""
+    recent = _recent_user_messages(user_id, limit, exclude_session_id=exclude_session_id)
 
     if not recent:
         return "This is a new user with no conversation history."
 
     summaries = [msg["content"][:150] for msg in recent]
-    return "Recent topics the user discussed: " + " | ".join(summaries)
\ No newline at end of file
+    return "Recent topics the user discussed: " + " | ".join(summaries)
+
+
+# ── Token-budgeted memory ───────────────────────────────────────
+
+
+def estimate_tokens(text):
+    """Rough token count (~4 characters per token) — good enough for budgeting."""
+    return max(1, len(text or "") // 4)
+
+
+def get_budgeted_history(user_id, session_id, token_budget=None, fetch_limit=40):
+    """
+    Retrieve history for the Gemini API that fits within a token budget.
+
+    Messages newer than the session's rolling summary are kept verbatim,
+    newest first, until the budget runs out. The summary is prepended as a
+    context turn and covers everything older, including any messages the
+    budget cut; it is refreshed in the background when it falls behind.
+    """
+    budget = token_budget or HISTORY_TOKEN_BUDGET
+
+    if fetch_limit <= SESSION_CACHE_MESSAGES:
+        entry = _cached_session(user_id, session_id)
+        recent = entry["recent"][:fetch_limit]
+        summary_doc = entry["summary"]
+    else:
+        recent = _recent_session_messages(user_id, session_id, fetch_limit)
+        summary_doc = session_summaries_collection.find_one(
+            {"user_id": user_id, "session_id": session_id}
+        )
+    # The summary covers everything up to summarized_until; only newer messages
+    # are candidates for the verbatim turns, so nothing appears twice
+    summarized_until = summary_doc.get("summarized_until") if summary_doc else None
+    unsummarized = [
+        m for m in recent if summarized_until is None or m["timestamp"] > summarized_until
+    ]
+    summary_text = _format_summary(summary_doc)
+    used = estimate_tokens(summary_text) if summary_text else 0
+
+    kept = []
+    for msg in unsummarized:
+        cost = estimate_tokens(msg["content"])
+        if kept and used + cost > budget:
+            break
+        kept.append(msg)
+        used += cost
+
+    # The budget cut into messages the summary hasn't absorbed yet: fold them
+    # in for this turn so nothing falls between the summary and the verbatim
+    # turns, and have the stored summary catch up to the same cut
+    folded = unsummarized[len(kept):]
+    if folded:
+        lines = [_summary_line(m) for m in reversed(folded)]
+        summary_text = _format_summary({
+            **(summary_doc or {}),
+            "summary": "\n".join(filter(None, [(summary_doc or {}).get("summary"), *lines])),
+        })
+
+    if folded or len(unsummarized) > VERBATIM_MESSAGES:
+        schedule_summary_update(user_id, session_id, keep=min(len(kept), VERBATIM_MESSAGES))
+    elif summary_doc is None and recent:
+        # New session: seed the summary with context from earlier sessions
+        schedule_summary_update(user_id, session_id)
+
+    kept.reverse()
+    history = []
+    if summary_text:
+        history.append({"role": "user", "parts": [{"text": summary_text}]})
+    history.extend(
+        {
+            "role": msg["role"] if msg["role"] == "user" else "model",
+            "parts": [{"text": msg["content"]}],
+        }
+        for msg in kept
+    )
+    return history
+
+
+def _format_summary(summary_doc):
+    if not summary_doc:
+        return ""
+    sections = []
+    if summary_doc.get("prior_context"):
+        sections.append(f"[Earlier sessions] {summary_doc['prior_context']}")
+    if summary_doc.get("summary"):
+        sections.append(f"[Earlier in this conversation]\n{summary_doc['summary']}")
+    return "\n\n".join(sections)
+
+
+def schedule_summary_update(user_id, session_id, keep=VERBATIM_MESSAGES):
+    """Refresh a session's rolling summary on a background thread (one at a time per session)."""
+    key = (user_id, session_id)
+    with _summaries_lock:
+        if key in _summaries_in_flight:
+            return
+        _summaries_in_flight.add(key)
+
+    def _run():
+        try:
+            update_session_summary(user_id, session_id, keep)
+        except Exception as e:
+            print(f"[WARN] Session summary update failed for {session_id}: {e}")
+        finally:
+            with _summaries_lock:
+                _summaries_in_flight.discard(key)
+
+    thread = threading.Thread(target=_run)
+    thread.daemon = True
+    thread.start()
+
+
+def update_session_summary(user_id, session_id, keep=VERBATIM_MESSAGES):
+    """
+    Fold everything but the newest `keep` messages into the session summary.
+
+    Compression is extractive (one clipped line per message) so it costs no
+    LLM call; the summary keeps its newest lines within SUMMARY_MAX_CHARS.
+    """
+    query = {"user_id": user_id, "session_id": session_id}
+    summary_doc = session_summaries_collection.find_one(query) or {}
+
+    if "prior_context" not in summary_doc:
+        summary_doc["prior_context"] = get_user_context_summary(
+            user_id, exclude_session_id=session_id
+        )
+
+    recent = _recent_session_messages(user_id, session_id, keep + 1)
+
+    lines = [l for l in (summary_doc.get("summary") or "").split("\n") if l]
+    summarized_until = summary_doc.get("summarized_until")
+
+    if len(recent) > keep:
+        boundary = recent[keep]["timestamp"]
+        for msg in _ascending_session_messages(
+            user_id, session_id, after=summarized_until, until=boundary
+        ):
+            lines.append(_summary_line(msg))
+            summarized_until = msg["timestamp"]
+
+    while lines and sum(len(l) + 1 for l in lines) > SUMMARY_MAX_CHARS:
+        lines.pop(0)
+
+    fields = {
+        "summary": "\n".join(lines),
+        "prior_context": summary_doc["prior_context"],
+        "summarized_until": summarized_until,
+        "updated_at": datetime.utcnow(),
+    }
+    session_summaries_collection.update_one(query, {"$set": fields}, upsert=True)
+    session_cache.update(
+        (user_id, session_id), lambda entry: entry.update(summary={**query, **fields})
+    )
+
+
+def _summary_line(msg):
+    speaker = "Player" if msg["role"] == "user" else "Nexus"
+    text = " ".join(msg["content"].split())
+    if len(text) > SUMMARY_LINE_CHARS:
+        text = text[: SUMMARY_LINE_CHARS - 3].rstrip() + "..."
+    return f"- {speaker}: {text}"
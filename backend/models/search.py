@@ -0,0 +1,205 @@
+"""
+Conversation search — ranked full-text search over one user's chat history.
+
+Mongo serves it from a text index whose first key is user_id, so a search
+only touches that user's index entries. Where $text isn't available (no
+index yet, or the in-memory store the benchmarks use) an in-process inverted
+index takes over: built once per user from their messages, then topped up
+with anything newer on each search.
+"""
+
+import math
+import re
+import threading
+from collections import Counter, OrderedDict
+from pymongo.errors import OperationFailure
+from config import CHAT_BUCKET_STORAGE
+from models.conversation import (
+    _ascending_user_messages,
+    _recent_user_messages,
+    conversation_buckets_collection,
+    conversations_collection,
+)
+
+SEARCH_PAGE_MAX = 50
+SNIPPET_CHARS = 160
+BUCKET_CANDIDATES = 25       # buckets pulled from the text index before ranking their messages
+MEMORY_INDEX_USERS = 64      # users whose fallback index stays in memory
+TOKEN_RE = re.compile(r"[a-z0-9']+")
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "but", "by", "do", "for", "from", "how",
+    "i", "in", "is", "it", "me", "my", "of", "on", "or", "so", "that", "the", "this",
+    "to", "was", "what", "when", "with", "you", "your",
+}
+
+
+def tokenize(text):
+    """Lowercased, stopword-free, lightly stemmed terms (close to Mongo's text analyzer)."""
+    terms = []
+    for word in TOKEN_RE.findall((text or "").lower()):
+        word = word.strip("'")
+        if not word or word in STOPWORDS:
+            continue
+        for suffix in ("ing", "ed", "es", "s"):
+            if len(word) > len(suffix) + 2 and word.endswith(suffix):
+                word = word[: -len(suffix)]
+                break
+        terms.append(word)
+    return terms
+
+
+def make_snippet(content, terms, width=SNIPPET_CHARS):
+    """Window of content around the first query term, with ellipses where clipped."""
+    text = " ".join(content.split())
+    lowered = text.lower()
+    hits = [lowered.find(t) for t in terms if t and lowered.find(t) >= 0]
+    if not hits or len(text) <= width:
+        return text[:width] + ("..." if len(text) > width else "")
+    start = max(0, min(hits) - width // 3)
+    end = min(len(text), start + width)
+    return ("..." if start else "") + text[start:end].strip() + ("..." if end < len(text) else "")
+
+
+class InvertedIndex:
+    """Per-user term → posting-list index with TF-IDF ranking."""
+
+    def __init__(self):
+        self.docs = []            # message dicts, index = doc id
+        self.postings = {}        # term → {doc id: term frequency}
+        self.lengths = []
+        self.newest = None
+        self.lock = threading.Lock()
+
+    def add(self, message):
+        doc_id = len(self.docs)
+        terms = tokenize(message["content"])
+        self.docs.append(message)
+        self.lengths.append(len(terms) or 1)
+        for term, count in Counter(terms).items():
+            self.postings.setdefault(term, {})[doc_id] = count
+        if self.newest is None or message["timestamp"] > self.newest:
+            self.newest = message["timestamp"]
+
+    def search(self, terms):
+        """[(score, message)] best first; every result matches at least one term."""
+        scores = {}
+        total = len(self.docs)
+        for term in set(terms):
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            idf = math.log(1 + total / len(posting))
+            for doc_id, tf in posting.items():
+                scores[doc_id] = scores.get(doc_id, 0.0) + tf / self.lengths[doc_id] ** 0.5 * idf
+        ranked = sorted(scores.items(), key=lambda kv: (kv[1], self.docs[kv[0]]["timestamp"]), reverse=True)
+        return [(score, self.docs[doc_id]) for doc_id, score in ranked]
+
+
+_indexes = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def _memory_index(user_id):
+    """The user's fallback index, built on first use and caught up on each call."""
+    with _indexes_lock:
+        index = _indexes.get(user_id)
+        if index is None:
+            index = _indexes[user_id] = InvertedIndex()
+            fresh = True
+        else:
+            _indexes.move_to_end(user_id)
+            fresh = False
+        while len(_indexes) > MEMORY_INDEX_USERS:
+            _indexes.popitem(last=False)
+
+    with index.lock:
+        if fresh:
+            for m in _ascending_user_messages(user_id):
+                index.add(m)
+        elif index.newest:
+            newer = _recent_user_messages(user_id, 0, role=None, since=index.newest)
+            for m in reversed(newer):
+                index.add(m)
+    return index
+
+
+def ensure_search_indexes():
+    """Text index over message content, scoped by user_id."""
+    try:
+        if CHAT_BUCKET_STORAGE:
+            conversation_buckets_collection.create_index(
+                [("user_id", 1), ("messages.content", "text")], name="user_message_text"
+            )
+        else:
+            conversations_collection.create_index(
+                [("user_id", 1), ("content", "text")], name="user_message_text"
+            )
+    except Exception as e:
+        print(f"[WARN] Could not create search index: {e}")
+
+
+def _mongo_search(user_id, query, terms, skip, limit):
+    projection = {"score": {"$meta": "textScore"}}
+    spec = {"user_id": user_id, "$text": {"$search": query}}
+
+    if not CHAT_BUCKET_STORAGE:
+        projection.update({"role": 1, "content": 1, "timestamp": 1, "session_id": 1})
+        cursor = (
+            conversations_collection.find(spec, projection)
+            .sort([("score", {"$meta": "textScore"}), ("timestamp", -1)])
+            .skip(skip)
+            .limit(limit + 1)
+        )
+        return [(m["score"], m) for m in cursor]
+
+    # Buckets match as a whole — rank the messages inside the best ones locally
+    projection.update({"messages": 1, "session_id": 1})
+    index = InvertedIndex()
+    for bucket in (
+        conversation_buckets_collection.find(spec, projection)
+        .sort([("score", {"$meta": "textScore"})])
+        .limit(BUCKET_CANDIDATES)
+    ):
+        for m in bucket["messages"]:
+            index.add({**m, "session_id": bucket["session_id"]})
+    return index.search(terms)[skip : skip + limit + 1]
+
+
+def search_messages(user_id, query, page=1, page_size=20):
+    """
+    Ranked search over the user's messages.
+
+    Returns {"results", "page", "has_more", "engine"}; each result carries a
+    snippet around the first matching term.
+    """
+    page = max(1, page)
+    page_size = max(1, min(page_size, SEARCH_PAGE_MAX))
+    terms = tokenize(query)
+    if not terms:
+        return {"results": [], "page": page, "has_more": False, "engine": "none"}
+
+    skip = (page - 1) * page_size
+    try:
+        hits = _mongo_search(user_id, query, terms, skip, page_size)
+        engine = "text"
+    except OperationFailure:
+        hits = _memory_index(user_id).search(terms)[skip : skip + page_size + 1]
+        engine = "memory"
+
+    has_more = len(hits) > page_size
+    return {
+        "results": [
+            {
+                "message_id": str(m["_id"]),
+                "session_id": m["session_id"],
+                "role": m["role"],
+                "snippet": make_snippet(m["content"], terms),
+                "timestamp": m["timestamp"].isoformat(),
+                "score": round(score, 4),
+            }
+            for score, m in hits[:page_size]
+        ],
+        "page": page,
+        "has_more": has_more,
+        "engine": engine,
+    }
@@ -0,0 +1,70 @@
+"""
+In-process TTL cache — bounded LRU with per-entry expiry.
+
+Used for hot read paths (active chat sessions, authenticated users). Each
+process has its own cache, so cross-process invalidation relies on the TTL;
+writes made in this process invalidate or update entries explicitly.
+"""
+
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire ttl_seconds after being stored."""
+
+    def __init__(self, max_entries, ttl_seconds, copy_values=False):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.copy_values = copy_values
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.time() >= entry[0]:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            value = entry[1]
+        return copy.deepcopy(value) if self.copy_values else value
+
+    def put(self, key, value):
+        if self.copy_values:
+            value = copy.deepcopy(value)
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def update(self, key, fn):
+        """Apply fn(value) in place to a live entry, under the cache lock. No-op on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.time() >= entry[0]:
+                return False
+            fn(entry[1])
+            return True
+
+    def pop(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            }
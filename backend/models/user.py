@@ -1,9 +1,11 @@
 """User model — handles user data, password hashing, and profile management."""
 
-import bcrypt
+import os
 from datetime import datetime
-from pymongo import MongoClient
-from config import MONGO_URI
+from pymongo import MongoClient, ReturnDocument
+from config import BCRYPT_ROUNDS, MONGO_URI
+from models.ttl_cache import TTLCache
+from workers.password_pool import password_pool
 
 client = MongoClient(MONGO_URI)
 db = client.gg_nexus
@@ -11,14 +13,37 @@ db = client.gg_nexus
 users_collection = db.users
 conversations_collection = db.conversations
 
+# Full user documents for the chat hot path; profile writes in this process invalidate them
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "5000"))
+USER_CACHE_TTL_SECONDS = int(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+user_cache = TTLCache(USER_CACHE_SIZE, USER_CACHE_TTL_SECONDS, copy_values=True)
+
 
 def hash_password(password):
-    salt = bcrypt.gensalt(rounds=12)
-    return bcrypt.hashpw(password.encode("utf-8"), salt).decode("utf-8")
+    """bcrypt hash at BCRYPT_ROUNDS, computed in the password pool (may raise PasswordPoolBusy)."""
+    return password_pool.hash(password, BCRYPT_ROUNDS)
 
 
 def verify_password(password, hashed_password):
-    return bcrypt.checkpw(password.encode("utf-8"), hashed_password.encode("utf-8"))
+    """Check a password in the password pool (may raise PasswordPoolBusy)."""
+    return password_pool.verify(password, hashed_password)
+
+
+def needs_rehash(hashed_password):
+    """True if the stored hash was made with a different work factor than BCRYPT_ROUNDS."""
+    try:
+        return int(hashed_password.split("$")[2]) != BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return False
+
+
+def rehash_password(user_id, password, old_hash):
+    """Replace a hash made at an outdated cost, unless the password changed meanwhile."""
+    from bson import ObjectId
+    users_collection.update_one(
+        {"_id": ObjectId(user_id), "password_hash": old_hash},
+        {"$set": {"password_hash": hash_password(password)}},
+    )
 
 
 DEFAULT_PROFILE = {
@@ -64,49 +89,100 @@ def find_user_by_id(user_id):
 
 
 def update_user_profile(user_id, profile_data):
-    """Merge incoming profile data into user's existing profile."""
+    """
+    Merge incoming profile data into the user's profile in one round-trip.
+
+    Each known field becomes its own dotted-path $set (personal is merged
+    per subkey), so concurrent writes to other fields — the background AI
+    profile build included — are never overwritten. profile_version is bumped
+    on every write for caches to key on. Returns the updated user without
+    its password hash, or None if the user doesn't exist.
+    """
     from bson import ObjectId
 
-    current = users_collection.find_one({"_id": ObjectId(user_id)})
-    if not current:
-        return
-
-    existing = current.get("profile", {})
+    fields = {"last_active": datetime.utcnow()}
     for key in DEFAULT_PROFILE:
-        if key not in existing:
-            existing[key] = DEFAULT_PROFILE[key]
+        if key not in profile_data:
+            continue
+        value = profile_data[key]
+        if key == "personal" and isinstance(value, dict):
+            for sub, sub_value in value.items():
+                if isinstance(sub, str) and sub and "." not in sub and not sub.startswith("$"):
+                    fields[f"profile.personal.{sub}"] = sub_value
+        else:
+            fields[f"profile.{key}"] = value
+
+    # A stored welcome message describes the old profile — drop it until the next build
+    user = users_collection.find_one_and_update(
+        {"_id": ObjectId(user_id)},
+        {"$set": fields, "$unset": {"welcome_message": ""}, "$inc": {"profile_version": 1}},
+        projection={"password_hash": 0},
+        return_document=ReturnDocument.AFTER,
+    )
+    user_cache.pop(str(user_id))
+    if user:
+        user["_id"] = str(user["_id"])
+    return user
 
-    for key in DEFAULT_PROFILE:
-        if key in profile_data:
-            if key == "personal" and isinstance(profile_data[key], dict):
-                existing_personal = existing.get("personal", {})
-                existing_personal.update(profile_data[key])
-                existing["personal"] = existing_personal
-            else:
-                existing[key] = profile_data[key]
 
+def update_ai_profile(user_id, ai_profile_data, welcome_message=None, evolve_watermark=None):
+    """Store or update the AI-generated player analysis (and its welcome message)."""
+    from bson import ObjectId
+    fields = {"ai_profile": ai_profile_data, "last_active": datetime.utcnow()}
+    if welcome_message:
+        fields["welcome_message"] = welcome_message
+    if evolve_watermark:
+        fields["evolve_watermark"] = evolve_watermark
     users_collection.update_one(
-        {"_id": ObjectId(user_id)},
-        {"$set": {"profile": existing, "last_active": datetime.utcnow()}},
+        {"_id": ObjectId(user_id)}, {"$set": fields, "$inc": {"profile_version": 1}}
     )
+    user_cache.pop(str(user_id))
 
 
-def update_ai_profile(user_id, ai_profile_data):
-    """Store or update the AI-generated player analysis."""
+def set_welcome_message(user_id, message, profile_version):
+    """
+    Store a welcome for the profile at profile_version; skipped if the profile changed since.
+
+    Touches only welcome_message, so it can never overwrite an ai_profile a build just wrote.
+    """
     from bson import ObjectId
     users_collection.update_one(
-        {"_id": ObjectId(user_id)},
-        {"$set": {"ai_profile": ai_profile_data, "last_active": datetime.utcnow()}},
+        {"_id": ObjectId(user_id), "profile_version": profile_version},
+        {"$set": {"welcome_message": message}},
     )
+    user_cache.pop(str(user_id))
+
+
+def set_evolve_watermark(user_id, timestamp):
+    """Record the newest message profile evolution has processed for this user."""
+    from bson import ObjectId
+    users_collection.update_one(
+        {"_id": ObjectId(user_id)}, {"$max": {"evolve_watermark": timestamp}}
+    )
+    user_cache.pop(str(user_id))
 
 
 def get_full_user(user_id):
     """Get user with all fields including ai_profile (for backend use only)."""
     from bson import ObjectId
-    user = users_collection.find_one({"_id": ObjectId(user_id)})
+    user = users_collection.find_one({"_id": ObjectId(user_id)}, {"password_hash": 0})
     if user:
         user["_id"] = str(user["_id"])
-        user.pop("password_hash", None)
+    return user
+
+
+def get_cached_user(user_id):
+    """
+    get_full_user() through the in-process user cache (callers get their own copy).
+
+    Entries carry the document's profile_version, which every profile write
+    bumps; writes in this process also drop the entry so the next read is fresh.
+    """
+    user = user_cache.get(str(user_id))
+    if user is None:
+        user = get_full_user(user_id)
+        if user:
+            user_cache.put(str(user_id), user)
     return user
 
 
@@ -1,15 +1,18 @@
 """Authentication routes — JWT-based signup, login, and token verification."""
 
-import jwt
 import threading
+import jwt
 from datetime import datetime, timedelta, timezone
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, g, request, jsonify
 from functools import wraps
 from models.user import (
-    create_user, find_user_by_username, find_user_by_id,
-    verify_password, update_user_profile, update_ai_profile,
+    create_user, find_user_by_username, get_cached_user,
+    verify_password, update_user_profile, needs_rehash, rehash_password,
 )
 from config import JWT_SECRET, JWT_EXPIRATION_HOURS
+from routes.rate_limit import rate_limited
+from workers.password_pool import PasswordPoolBusy
+from workers.profile_queue import profile_queue
 
 auth_bp = Blueprint("auth", __name__)
 
@@ -23,6 +26,35 @@ def generate_token(user_id):
     return jwt.encode(payload, JWT_SECRET, algorithm="HS256")
 
 
+def load_request_user(user_id):
+    """The authenticated user for this request: read at most once, usually from the user cache."""
+    user = g.get("current_user")
+    if user is None or user["_id"] != user_id:
+        user = get_cached_user(user_id)
+        g.current_user = user
+    return user
+
+
+def _busy_response():
+    response = jsonify({"error": "Too many sign-ins right now — please try again in a moment"})
+    response.headers["Retry-After"] = "2"
+    return response, 503
+
+
+def _rehash_in_background(user_id, password, old_hash):
+    def _run():
+        try:
+            rehash_password(user_id, password, old_hash)
+        except PasswordPoolBusy:
+            pass  # retried on the next login
+        except Exception as e:
+            print(f"[WARN] Password rehash failed for {user_id}: {e}")
+
+    thread = threading.Thread(target=_run)
+    thread.daemon = True
+    thread.start()
+
+
 def token_required(f):
     @wraps(f)
     def decorated(*args, **kwargs):
@@ -36,7 +68,7 @@ def token_required(f):
 
         try:
             payload = jwt.decode(token, JWT_SECRET, algorithms=["HS256"])
-            current_user = find_user_by_id(payload["user_id"])
+            current_user = load_request_user(payload["user_id"])
             if not current_user:
                 return jsonify({"error": "User not found"}), 401
         except jwt.ExpiredSignatureError:
@@ -49,17 +81,6 @@ def token_required(f):
     return decorated
 
 
-def _build_ai_profile_async(user_id, profile_data, username):
-    """Run AI profile building in a background thread so signup doesn't block."""
-    try:
-        from agents.profile_intelligence import build_ai_profile
-        ai_profile = build_ai_profile(profile_data, username)
-        update_ai_profile(user_id, ai_profile)
-        print(f"[OK] AI profile built for {username}: {ai_profile.get('player_archetype', '?')}")
-    except Exception as e:
-        print(f"[WARN] Background AI profile build failed for {username}: {e}")
-
-
 @auth_bp.route("/api/auth/signup", methods=["POST"])
 def signup():
     data = request.get_json()
@@ -77,7 +98,10 @@ def signup():
     if not password or len(password) < 6:
         return jsonify({"error": "Password must be at least 6 characters"}), 400
 
-    user = create_user(username, email, password)
+    try:
+        user = create_user(username, email, password)
+    except PasswordPoolBusy:
+        return _busy_response()
     if not user:
         return jsonify({"error": "Username or email already exists"}), 409
 
@@ -86,6 +110,7 @@ def signup():
 
 
 @auth_bp.route("/api/auth/login", methods=["POST"])
+@rate_limited("login")
 def login():
     data = request.get_json()
     if not data:
@@ -98,8 +123,15 @@ def login():
         return jsonify({"error": "Username and password are required"}), 400
 
     user = find_user_by_username(username)
-    if not user or not verify_password(password, user["password_hash"]):
-        return jsonify({"error": "Invalid username or password"}), 401
+    try:
+        if not user or not verify_password(password, user["password_hash"]):
+            return jsonify({"error": "Invalid username or password"}), 401
+    except PasswordPoolBusy:
+        return _busy_response()
+
+    # Hashes made at an old work factor are upgraded after the response
+    if needs_rehash(user["password_hash"]):
+        _rehash_in_background(user["_id"], password, user["password_hash"])
 
     token = generate_token(user["_id"])
     user["_id"] = str(user["_id"])
@@ -123,17 +155,15 @@ def update_profile(current_user):
 
     profile_data = data.get("profile", data)
     print(f"[DEBUG] Profile update for {current_user.get('username')}: games={profile_data.get('favorite_games', [])}")
-    update_user_profile(current_user["_id"], profile_data)
+    updated_user = update_user_profile(current_user["_id"], profile_data)
+    if not updated_user:
+        return jsonify({"error": "User not found"}), 404
 
-    # Build AI profile in background (non-blocking)
+    # Build AI profile in the background queue (non-blocking, coalesced per user)
     has_games = bool(profile_data.get("favorite_games"))
     if has_games:
-        thread = threading.Thread(
-            target=_build_ai_profile_async,
-            args=(current_user["_id"], profile_data, current_user.get("username", "Player")),
+        profile_queue.enqueue(
+            current_user["_id"], "build", {"username": current_user.get("username", "Player")}
         )
-        thread.daemon = True
-        thread.start()
 
-    updated_user = find_user_by_id(current_user["_id"])
     return jsonify({"message": "Profile updated", "user": updated_user})
\ No newline at end of file
@@ -0,0 +1,288 @@
+"""
+Rate limiting — per-route policies over pluggable shared storage.
+
+Each policy pairs an algorithm with what it keys on: the authenticated
+user, the client address, or the submitted username plus the client address.
+The client address comes from X-Forwarded-For when TRUSTED_PROXIES is set
+(see app.py); otherwise every client behind a proxy shares one address. Token buckets allow a short burst and then a steady
+rate; sliding windows cap requests per window without the burst a fixed
+window allows at its boundary. Limiter state is a small dict per key, kept
+in one of three stores:
+
+    memory  bounded LRU in this process (single worker, the default)
+    mongo   one document per key, shared by every worker and host
+    sqlite  one file shared by the workers on one host
+
+Limited requests get a 429 with a Retry-After header. If the store itself
+fails the request is let through — an outage there shouldn't take chat down.
+"""
+
+import json
+import math
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from datetime import datetime, timedelta
+from functools import wraps
+from flask import jsonify, request
+from pymongo.errors import DuplicateKeyError
+from config import RATE_LIMIT_SQLITE_PATH, RATE_LIMIT_STORAGE
+
+MEMORY_MAX_KEYS = 10000
+MONGO_CAS_RETRIES = 5
+SQLITE_PURGE_EVERY = 500     # updates between sweeps of expired rows
+
+Decision = namedtuple("Decision", ["allowed", "remaining", "retry_after"])
+
+
+class TokenBucket:
+    """capacity requests at once, refilled at refill_per_second."""
+
+    def __init__(self, capacity, refill_per_second):
+        self.capacity = capacity
+        self.rate = refill_per_second
+        self.ttl_seconds = capacity / refill_per_second
+
+    def apply(self, state, now):
+        tokens = self.capacity
+        if state:
+            tokens = min(self.capacity, state["tokens"] + (now - state["at"]) * self.rate)
+        if tokens >= 1:
+            return {"tokens": tokens - 1, "at": now}, Decision(True, int(tokens - 1), 0)
+        return state, Decision(False, 0, (1 - tokens) / self.rate)
+
+
+class SlidingWindow:
+    """
+    At most limit requests in any window_seconds.
+
+    Counts the current and previous fixed windows and weights the previous
+    one by how much of it still overlaps the sliding window, so state is two
+    counters instead of a timestamp per request.
+    """
+
+    def __init__(self, limit, window_seconds):
+        self.limit = limit
+        self.window = window_seconds
+        self.ttl_seconds = 2 * window_seconds
+
+    def apply(self, state, now):
+        start = now - now % self.window
+        current = previous = 0
+        if state and state["start"] == start:
+            current, previous = state["current"], state["previous"]
+        elif state and state["start"] == start - self.window:
+            previous = state["current"]
+
+        overlap = 1 - (now - start) / self.window
+        estimated = previous * overlap + current
+        if estimated + 1 <= self.limit:
+            new_state = {"start": start, "current": current + 1, "previous": previous}
+            return new_state, Decision(True, int(self.limit - estimated - 1), 0)
+
+        # Earliest moment the weighted count leaves room for one more request
+        if current + 1 <= self.limit:
+            wait = start + self.window * (1 - (self.limit - 1 - current) / previous) - now
+        else:
+            wait = start + self.window * (2 - (self.limit - 1) / current) - now
+        return state, Decision(False, 0, wait)
+
+
+class MemoryStore:
+    """Per-process LRU of limiter state."""
+
+    def __init__(self, max_keys=MEMORY_MAX_KEYS):
+        self.max_keys = max_keys
+        self._states = OrderedDict()
+        self._lock = threading.Lock()
+
+    def update(self, key, fn, ttl_seconds):
+        with self._lock:
+            state, result = fn(self._states.get(key))
+            if state is not None:
+                self._states[key] = state
+                self._states.move_to_end(key)
+                while len(self._states) > self.max_keys:
+                    self._states.popitem(last=False)
+            return result
+
+    def ensure_indexes(self):
+        pass
+
+
+class MongoStore:
+    """Limiter state in a Mongo collection, updated with compare-and-swap on a version."""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def update(self, key, fn, ttl_seconds):
+        for _ in range(MONGO_CAS_RETRIES):
+            doc = self.collection.find_one({"_id": key})
+            state, result = fn(doc["state"] if doc else None)
+            if state is None or (doc and state == doc["state"]):
+                return result
+
+            fields = {
+                "state": state,
+                "expires_at": datetime.utcnow() + timedelta(seconds=ttl_seconds),
+            }
+            if doc is None:
+                try:
+                    self.collection.insert_one({"_id": key, "version": 1, **fields})
+                    return result
+                except DuplicateKeyError:
+                    continue
+            written = self.collection.update_one(
+                {"_id": key, "version": doc["version"]}, {"$set": fields, "$inc": {"version": 1}}
+            )
+            if written.modified_count:
+                return result
+        # Still contended after every retry: this key is being hammered
+        return Decision(False, 0, 1)
+
+    def ensure_indexes(self):
+        self.collection.create_index("expires_at", expireAfterSeconds=0)
+
+
+class SQLiteStore:
+    """Limiter state in a local SQLite file, updated inside an immediate transaction."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._updates = 0
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rate_limits "
+                "(key TEXT PRIMARY KEY, state TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._local.conn = conn
+        return conn
+
+    def update(self, key, fn, ttl_seconds):
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT state FROM rate_limits WHERE key = ?", (key,)).fetchone()
+            state, result = fn(json.loads(row[0]) if row else None)
+            if state is not None:
+                conn.execute(
+                    "INSERT OR REPLACE INTO rate_limits (key, state, expires_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(state), time.time() + ttl_seconds),
+                )
+            self._updates += 1
+            if self._updates % SQLITE_PURGE_EVERY == 0:
+                conn.execute("DELETE FROM rate_limits WHERE expires_at < ?", (time.time(),))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return result
+
+    def ensure_indexes(self):
+        self._connection()
+
+
+Policy = namedtuple("Policy", ["algorithm", "key", "message"])
+
+SLOW_DOWN = "Too many requests — please slow down"
+
+# policy → algorithm, what it keys on ("user", "ip" or "credential") and the 429 message
+POLICIES = {
+    "chat": Policy(
+        TokenBucket(capacity=3, refill_per_second=0.5), "user",
+        "Please wait a moment before sending another message",
+    ),
+    "guides": Policy(SlidingWindow(10, 600), "user", SLOW_DOWN),
+    "tips": Policy(SlidingWindow(30, 60), "user", SLOW_DOWN),
+    "recommendations": Policy(SlidingWindow(10, 60), "user", SLOW_DOWN),
+    # Keyed on username and address so clients sharing an address (behind an
+    # untrusted proxy) don't share one site-wide bucket
+    "login": Policy(
+        SlidingWindow(10, 300), "credential", "Too many sign-in attempts — please try again later"
+    ),
+}
+
+
+def _request_key(kind, args):
+    if kind == "user":
+        return args[0]["_id"]
+    if kind == "credential":
+        username = ((request.get_json(silent=True) or {}).get("username") or "").strip().lower()
+        return f"{username}@{request.remote_addr}"
+    return request.remote_addr
+
+
+class RateLimiter:
+    def __init__(self, store, policies):
+        self.store = store
+        self.policies = policies
+        self._lock = threading.Lock()
+        self._counts = {name: {"allowed": 0, "limited": 0, "errors": 0} for name in policies}
+
+    def check(self, policy_name, key):
+        """Decision for one request under a policy; a store failure lets it through."""
+        policy = self.policies[policy_name]
+        algorithm = policy.algorithm
+        now = time.time()
+        try:
+            decision = self.store.update(
+                f"{policy_name}:{key}", lambda state: algorithm.apply(state, now),
+                algorithm.ttl_seconds,
+            )
+            outcome = "allowed" if decision.allowed else "limited"
+        except Exception as e:
+            print(f"[WARN] Rate limiter store failed ({policy_name}): {e}")
+            decision = Decision(True, 0, 0)
+            outcome = "errors"
+        with self._lock:
+            self._counts[policy_name][outcome] += 1
+        return decision
+
+    def limit(self, policy_name):
+        """Route decorator; goes below token_required for user-keyed policies."""
+        policy = self.policies[policy_name]
+
+        def decorator(f):
+            @wraps(f)
+            def decorated(*args, **kwargs):
+                key = _request_key(policy.key, args)
+                decision = self.check(policy_name, key)
+                if not decision.allowed:
+                    response = jsonify({"error": policy.message})
+                    response.headers["Retry-After"] = str(max(1, math.ceil(decision.retry_after)))
+                    return response, 429
+                return f(*args, **kwargs)
+
+            return decorated
+
+        return decorator
+
+    def ensure_indexes(self):
+        try:
+            self.store.ensure_indexes()
+        except Exception as e:
+            print(f"[WARN] Could not prepare rate limit storage: {e}")
+
+    def stats(self):
+        with self._lock:
+            return {"storage": type(self.store).__name__, "policies": {k: dict(v) for k, v in self._counts.items()}}
+
+
+def _make_store():
+    if RATE_LIMIT_STORAGE == "mongo":
+        from models.user import db
+        return MongoStore(db.rate_limits)
+    if RATE_LIMIT_STORAGE == "sqlite":
+        return SQLiteStore(RATE_LIMIT_SQLITE_PATH)
+    return MemoryStore()
+
+
+rate_limiter = RateLimiter(_make_store(), POLICIES)
+rate_limited = rate_limiter.limit
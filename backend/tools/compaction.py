@@ -0,0 +1,110 @@
+"""
+Observation compaction — fits tool results into the agent's context budget.
+
+Tool results are serialized compactly (no indentation) and, when they are
+still too large, rebuilt field by field in per-tool priority order. Lists are
+trimmed item by item and long strings are clipped, so the observation is
+always valid JSON and the useful fields survive ahead of bulky ones.
+"""
+
+import json
+
+OBSERVATION_TOKEN_BUDGET = 750  # ~3000 characters
+CHARS_PER_TOKEN = 4
+
+# Keys are matched by name at any depth; earlier keys are kept first.
+FIELD_PRIORITIES = {
+    "search_game_info": [
+        "found", "game", "message", "patch", "top_tier", "meta_summary", "tips",
+        "description", "genre", "difficulty", "beginner_tips", "free_rotation",
+        "agents_by_role", "similar_games",
+    ],
+    "recommend_games": ["found", "based_on", "message", "recommendations", "name", "reason"],
+    "compare_games": [
+        "found", "comparison", "error", "genre", "description", "difficulty",
+        "platforms", "developer", "time_commitment", "free_to_play",
+    ],
+    "get_player_profile": ["found", "username", "favorite_games", "goals", "playstyle"],
+}
+
+# Bulky or bookkeeping fields that only go in if everything else fits
+LOW_PRIORITY_FIELDS = {"raw_response", "data_source", "cache_status", "source", "_source", "_cache"}
+
+
+def _dumps(value):
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+def _key_rank(key, priorities):
+    if key in LOW_PRIORITY_FIELDS:
+        return len(priorities) + 1
+    if key in priorities:
+        return priorities.index(key)
+    return len(priorities)
+
+
+def _fit(value, priorities, budget):
+    """Return the largest prefix-by-priority of value whose JSON fits in budget chars, or None."""
+    if len(_dumps(value)) <= budget:
+        return value
+
+    if isinstance(value, dict):
+        fitted = {}
+        ordered = sorted(value, key=lambda k: _key_rank(k, priorities))
+        for key in ordered:
+            overhead = len(_dumps(key)) + 2  # "key": plus separator
+            remaining = budget - len(_dumps(fitted)) - overhead
+            if remaining <= 0:
+                continue
+            child = _fit(value[key], priorities, remaining)
+            if child is not None:
+                fitted[key] = child
+        return fitted if fitted else None
+
+    if isinstance(value, list):
+        fitted = []
+        for index, item in enumerate(value):
+            marker = f"...+{len(value) - index} more"
+            remaining = budget - len(_dumps(fitted)) - len(_dumps(marker)) - 2
+            child = _fit(item, priorities, remaining) if remaining > 0 else None
+            if child is None:
+                fitted.append(marker)
+                return fitted
+            fitted.append(child)
+        return fitted
+
+    if isinstance(value, str) and budget > 8:
+        clipped = value[: budget - 5]
+        while len(_dumps(clipped + "...")) > budget and clipped:
+            clipped = clipped[:-8]
+        return clipped + "..." if clipped else None
+
+    return None
+
+
+def compact_observation(tool_name, result, token_budget=OBSERVATION_TOKEN_BUDGET):
+    """
+    Serialize a tool result for the OBSERVATION message.
+
+    Returns (text, stats) where stats reports the bytes saved relative to the
+    previous indented serialization.
+    """
+    original = json.dumps(result, indent=2, default=str)
+    budget = token_budget * CHARS_PER_TOKEN
+
+    compact = _dumps(result)
+    trimmed = False
+    if len(compact) > budget:
+        fitted = _fit(result, FIELD_PRIORITIES.get(tool_name, []), budget)
+        compact = _dumps(fitted if fitted is not None else {})
+        trimmed = True
+
+    original_bytes = len(original.encode("utf-8"))
+    compact_bytes = len(compact.encode("utf-8"))
+    stats = {
+        "original_bytes": original_bytes,
+        "compact_bytes": compact_bytes,
+        "saved_bytes": original_bytes - compact_bytes,
+        "trimmed": trimmed,
+    }
+    return compact, stats
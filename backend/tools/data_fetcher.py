@@ -12,12 +12,9 @@ import json
 import os
 import requests
 from pathlib import Path
-from google import genai
-from config import GEMINI_API_KEY
+from agents.llm_router import generate
 from models.cache import get_cached, set_cached
 
-client = genai.Client(api_key=GEMINI_API_KEY)
-
 RIOT_API_KEY = os.getenv("RIOT_API_KEY", "")
 KNOWLEDGE_DIR = Path(__file__).parent.parent / "knowledge"
 
@@ -125,9 +122,9 @@ def fetch_via_gemini(game_name, query_type="meta"):
     prompt = prompts.get(query_type, prompts["general"])
 
     try:
-        response = client.models.generate_content(
-            model="gemini-2.0-flash",
-            contents=[prompt],
+        response = generate(
+            "data_fetcher",
+            [prompt],
             config={"temperature": 0.3, "max_output_tokens": 800},
         )
 
@@ -0,0 +1,89 @@
+"""Game name recognition — maps free-text mentions and aliases to canonical names."""
+
+import json
+import re
+from pathlib import Path
+
+KNOWLEDGE_DIR = Path(__file__).parent.parent / "knowledge"
+
+# Alias → canonical name. Known games from the static KB are added on load.
+GAME_ALIASES = {
+    "lol": "League of Legends",
+    "league": "League of Legends",
+    "val": "Valorant",
+    "valo": "Valorant",
+    "cs": "Counter-Strike 2",
+    "cs2": "Counter-Strike 2",
+    "csgo": "Counter-Strike 2",
+    "counter strike": "Counter-Strike 2",
+    "apex": "Apex Legends",
+    "tft": "Teamfight Tactics",
+    "ow": "Overwatch 2",
+    "ow2": "Overwatch 2",
+    "overwatch": "Overwatch 2",
+    "dota": "Dota 2",
+    "r6": "Rainbow Six Siege",
+    "rocket league": "Rocket League",
+    "fortnite": "Fortnite",
+    "minecraft": "Minecraft",
+    "deadlock": "Deadlock",
+    "elden ring": "Elden Ring",
+}
+
+_alias_index = None
+
+
+def _load_alias_index():
+    global _alias_index
+    if _alias_index is not None:
+        return _alias_index
+
+    aliases = dict(GAME_ALIASES)
+    filepath = KNOWLEDGE_DIR / "games.json"
+    if filepath.exists():
+        with open(filepath, "r", encoding="utf-8") as f:
+            for entry in json.load(f).values():
+                if entry.get("name"):
+                    aliases.setdefault(entry["name"].lower(), entry["name"])
+
+    _alias_index = sorted(aliases.items(), key=lambda kv: len(kv[0]), reverse=True)
+    return _alias_index
+
+
+def find_game_mentions(text, extra_games=()):
+    """Return canonical game names mentioned in text, in order of appearance."""
+    lowered = text.lower()
+    candidates = [(g.lower(), g) for g in extra_games if g] + _load_alias_index()
+    candidates.sort(key=lambda kv: len(kv[0]), reverse=True)
+
+    taken = []
+    found = []
+    for alias, canonical in candidates:
+        pattern = r"(?<![a-z0-9])" + re.escape(alias) + r"(?![a-z0-9])"
+        for match in re.finditer(pattern, lowered):
+            span = match.span()
+            if any(span[0] < end and start < span[1] for start, end in taken):
+                continue
+            taken.append(span)
+            found.append((span[0], canonical))
+
+    names = []
+    for _, canonical in sorted(found):
+        if canonical not in names:
+            names.append(canonical)
+    return names
+
+
+def canonical_game_name(name):
+    """
+    Canonical name for a single game reference, or the trimmed input if unknown.
+
+    Only an exact alias or full name maps — "Minecraft Dungeons" stays itself
+    rather than becoming "Minecraft".
+    """
+    cleaned = " ".join((name or "").split())
+    lowered = cleaned.lower()
+    for alias, canonical in _load_alias_index():
+        if alias == lowered or canonical.lower() == lowered:
+            return canonical
+    return cleaned
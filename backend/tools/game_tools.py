@@ -1,7 +1,17 @@
+import copy
 import json
+import threading
+import time
+from collections import OrderedDict
 from tools.data_fetcher import fetch_game_data, fetch_recommendations_for
+from tools.game_names import canonical_game_name
 from models.cache import get_cached, set_cached, get_cache_info
 
+# Per-session memo of tool results — repeats within a turn or the next few turns are free
+TOOL_MEMO_TTL_SECONDS = 120
+TOOL_MEMO_MAX_SESSIONS = 256
+TOOL_MEMO_MAX_ENTRIES = 64
+
 
 TOOL_DEFINITIONS = [
     {
@@ -47,9 +57,75 @@ TOOL_DEFINITIONS = [
 ]
 
 
-def search_game_info(game, query_type="meta"):
-    """Fetch live game data through the multi-source data chain."""
+class ToolMemo:
+    """
+    Short-lived memo of tool results and fetched game data for one chat session.
+
+    Values are deep-copied on the way in and on the way out, so callers can
+    mutate what they get back without corrupting the memo.
+    """
+
+    def __init__(self, ttl_seconds=TOOL_MEMO_TTL_SECONDS, max_entries=TOOL_MEMO_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if time.time() >= expires_at:
+                del self._entries[key]
+                return None
+        return copy.deepcopy(value)
+
+    def put(self, key, value):
+        frozen = copy.deepcopy(value)
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl_seconds, frozen)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+_session_memos = OrderedDict()
+_session_memos_lock = threading.Lock()
+
+
+def get_session_memo(session_id):
+    """Return the ToolMemo for a session, or None when there is no session."""
+    if not session_id:
+        return None
+    with _session_memos_lock:
+        memo = _session_memos.get(session_id)
+        if memo is None:
+            memo = _session_memos[session_id] = ToolMemo()
+        _session_memos.move_to_end(session_id)
+        while len(_session_memos) > TOOL_MEMO_MAX_SESSIONS:
+            _session_memos.popitem(last=False)
+        return memo
+
+
+def _fetch(game, query_type, memo=None):
+    """fetch_game_data through the session memo. Always returns a private copy."""
+    key = ("fetch", canonical_game_name(game).lower(), query_type)
+    if memo:
+        data = memo.get(key)
+        if data is not None:
+            return data
+
     data = fetch_game_data(game, query_type)
+    if memo and data and not data.get("error"):
+        memo.put(key, data)
+    return dict(data) if data else data
+
+
+def search_game_info(game, query_type="meta", memo=None):
+    """Fetch live game data through the multi-source data chain."""
+    data = _fetch(game, query_type, memo)
 
     if not data or data.get("error"):
         return {"found": False, "message": data.get("error", f"No data found for '{game}'")}
@@ -107,10 +183,10 @@ def get_player_profile(user_data):
     }
 
 
-def compare_games(game1, game2):
+def compare_games(game1, game2, memo=None):
     """Compare two games using live data."""
-    data1 = fetch_game_data(game1, "general")
-    data2 = fetch_game_data(game2, "general")
+    data1 = _fetch(game1, "general", memo)
+    data2 = _fetch(game2, "general", memo)
 
     result = {"found": True, "comparison": {}}
 
@@ -125,23 +201,65 @@ def compare_games(game1, game2):
     return result
 
 
-def execute_tool(tool_name, params, user_data=None):
-    """Route a tool call to the correct implementation."""
+def _normalize_call(tool_name, params):
+    """
+    Map legacy names and loose parameters onto (canonical_tool, args).
+
+    Game parameters are canonicalized only on an exact alias or full name
+    ("lol" → "League of Legends"); anything else, e.g. "Minecraft Dungeons",
+    is passed through as the model wrote it so the right game is fetched.
+    """
+    params = params or {}
+    if tool_name in ("search_game_info", "search_knowledge_base", "get_game_meta"):
+        if tool_name == "get_game_meta":
+            query_type = "meta"
+        elif tool_name == "search_knowledge_base":
+            query_type = params.get("query", "meta")
+        else:
+            query_type = params.get("query_type", "meta")
+        return "search_game_info", {
+            "game": canonical_game_name(params.get("game", "")),
+            "query_type": str(query_type).strip().lower() or "meta",
+        }
+    if tool_name == "recommend_games":
+        return tool_name, {"based_on": canonical_game_name(params.get("based_on", ""))}
+    if tool_name == "compare_games":
+        return tool_name, {
+            "game1": canonical_game_name(params.get("game1", "")),
+            "game2": canonical_game_name(params.get("game2", "")),
+        }
+    return tool_name, {}
+
+
+def execute_tool(tool_name, params, user_data=None, session_id=None):
+    """
+    Route a tool call to the correct implementation.
+
+    With a session_id, results are memoized per session for a short TTL under
+    the normalized tool name and parameters.
+    """
+    name, args = _normalize_call(tool_name, params)
+    memo = get_session_memo(session_id)
+
     tool_map = {
-        "search_game_info": lambda: search_game_info(
-            params.get("game", ""), params.get("query_type", "meta")
-        ),
-        "recommend_games": lambda: recommend_games(params.get("based_on", "")),
+        "search_game_info": lambda: search_game_info(args["game"], args["query_type"], memo),
+        "recommend_games": lambda: recommend_games(args["based_on"]),
         "get_player_profile": lambda: get_player_profile(user_data),
-        "compare_games": lambda: compare_games(params.get("game1", ""), params.get("game2", "")),
-        # Legacy tool names (backward compatibility)
-        "search_knowledge_base": lambda: search_game_info(
-            params.get("game", ""), params.get("query", "meta")
-        ),
-        "get_game_meta": lambda: search_game_info(params.get("game", ""), "meta"),
+        "compare_games": lambda: compare_games(args["game1"], args["game2"], memo),
     }
 
-    handler = tool_map.get(tool_name)
-    if handler:
+    handler = tool_map.get(name)
+    if not handler:
+        return {"error": f"Unknown tool: {tool_name}"}
+
+    # Profile lookups depend on user_data, not params — never memoize them
+    if not memo or name == "get_player_profile":
         return handler()
-    return {"error": f"Unknown tool: {tool_name}"}
\ No newline at end of file
+
+    key = ("tool", name, json.dumps(args, sort_keys=True))
+    result = memo.get(key)
+    if result is None:
+        result = handler()
+        if result.get("found"):
+            memo.put(key, result)
+    return result
@@ -0,0 +1,234 @@
+"""
+Chat job queue — runs agent turns off the Flask request threads.
+
+POST /api/chat with "async": true stores a job in Mongo and returns its id.
+A bounded pool of worker threads claims jobs from Mongo, runs the turn and
+writes the result back. Claims carry a lease, so jobs left queued or
+running when a process dies are picked up again by any live worker.
+"""
+
+import os
+import threading
+import time
+import traceback
+from collections import deque
+from datetime import datetime, timedelta
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import ReturnDocument
+from models.user import db
+
+chat_jobs_collection = db.chat_jobs
+
+CHAT_WORKERS = int(os.getenv("CHAT_WORKERS", "4"))
+CHAT_QUEUE_MAX = int(os.getenv("CHAT_QUEUE_MAX", "200"))
+JOB_LEASE_SECONDS = 300      # a running job whose lease expires is considered orphaned
+JOB_MAX_ATTEMPTS = 3         # claims before an orphaned job is failed instead of retried
+JOB_POLL_SECONDS = 5         # idle workers re-check Mongo for orphaned jobs this often
+JOB_RESULT_TTL_HOURS = 24
+JOB_WAIT_MAX_SECONDS = 10     # longest a long-poll or event stream holds a request thread
+
+
+class QueueFull(Exception):
+    """Raised when too many chat jobs are already waiting."""
+
+
+def describe_chat_error(error):
+    """Map an exception from a chat turn to a (user-facing message, HTTP status)."""
+    error_msg = str(error)
+    if "429" in error_msg or "RESOURCE_EXHAUSTED" in error_msg:
+        return "AI is busy — please try again in a few seconds", 429
+    return "Something went wrong. Please try again.", 500
+
+
+class ChatJobQueue:
+    """Mongo-backed chat job queue with a fixed pool of worker threads."""
+
+    def __init__(self, handler, workers=CHAT_WORKERS, max_depth=CHAT_QUEUE_MAX):
+        self.handler = handler
+        self.workers = workers
+        self.max_depth = max_depth
+        self._wakeup = threading.Condition()
+        self._finished = threading.Condition()
+        self._threads = []
+        self._running = 0
+        self._waits_ms = deque(maxlen=200)
+        self._completed = 0
+        self._failed = 0
+        self._lock = threading.Lock()
+
+    def start(self):
+        if self._threads:
+            return
+        try:
+            chat_jobs_collection.create_index([("status", 1), ("created_at", 1)])
+            chat_jobs_collection.create_index(
+                "finished_at", expireAfterSeconds=JOB_RESULT_TTL_HOURS * 3600
+            )
+        except Exception as e:
+            print(f"[WARN] Could not create chat job indexes: {e}")
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"chat-worker-{i}")
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, user_id, payload):
+        """Queue a chat turn and return its job id. Raises QueueFull when over capacity."""
+        if self.depth() >= self.max_depth:
+            raise QueueFull()
+
+        job = {
+            "user_id": user_id,
+            "payload": payload,
+            "status": "queued",
+            "attempts": 0,
+            "created_at": datetime.utcnow(),
+        }
+        chat_jobs_collection.insert_one(job)
+        with self._wakeup:
+            self._wakeup.notify()
+        return str(job["_id"])
+
+    def get(self, job_id, user_id):
+        """Return a job's public view, or None if it doesn't exist or isn't theirs."""
+        try:
+            job = chat_jobs_collection.find_one({"_id": ObjectId(job_id), "user_id": user_id})
+        except InvalidId:
+            return None
+        if not job:
+            return None
+
+        view = {"job_id": str(job["_id"]), "status": job["status"]}
+        if job.get("started_at"):
+            view["wait_ms"] = round((job["started_at"] - job["created_at"]).total_seconds() * 1000)
+        if job["status"] == "done":
+            view["result"] = job.get("result")
+        elif job["status"] == "failed":
+            view["error"] = job.get("error", "Something went wrong. Please try again.")
+            view["error_status"] = job.get("error_status", 500)
+        return view
+
+    def wait(self, job_id, user_id, timeout):
+        """
+        Block until the job finishes (or timeout) and return its view.
+
+        The caller's request thread is held for the whole wait, so keep
+        timeouts short (JOB_WAIT_MAX_SECONDS) and let clients poll again.
+        """
+        deadline = time.time() + timeout
+        while True:
+            view = self.get(job_id, user_id)
+            if view is None or view["status"] in ("done", "failed"):
+                return view
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return view
+            with self._finished:
+                # Woken by local completions; the timeout covers jobs finished elsewhere
+                self._finished.wait(min(remaining, 1.0))
+
+    def depth(self):
+        return chat_jobs_collection.count_documents({"status": "queued"})
+
+    def stats(self):
+        with self._lock:
+            waits = sorted(self._waits_ms)
+            return {
+                "depth": self.depth(),
+                "running": self._running,
+                "workers": self.workers,
+                "completed": self._completed,
+                "failed": self._failed,
+                "avg_wait_ms": round(sum(waits) / len(waits)) if waits else 0,
+                "p95_wait_ms": waits[min(len(waits) - 1, int(0.95 * len(waits)))] if waits else 0,
+            }
+
+    def _fail_exhausted(self):
+        """Fail orphaned jobs that already crashed JOB_MAX_ATTEMPTS workers."""
+        now = datetime.utcnow()
+        chat_jobs_collection.update_many(
+            {"status": "running", "lease_until": {"$lt": now}, "attempts": {"$gte": JOB_MAX_ATTEMPTS}},
+            {
+                "$set": {
+                    "status": "failed",
+                    "error": "Something went wrong. Please try again.",
+                    "error_status": 500,
+                    "finished_at": now,
+                },
+                "$unset": {"lease_until": ""},
+            },
+        )
+
+    def _claim(self):
+        now = datetime.utcnow()
+        return chat_jobs_collection.find_one_and_update(
+            {
+                "$or": [
+                    {"status": "queued"},
+                    {
+                        "status": "running",
+                        "lease_until": {"$lt": now},
+                        "attempts": {"$lt": JOB_MAX_ATTEMPTS},
+                    },
+                ]
+            },
+            {
+                "$set": {
+                    "status": "running",
+                    "started_at": now,
+                    "lease_until": now + timedelta(seconds=JOB_LEASE_SECONDS),
+                },
+                "$inc": {"attempts": 1},
+            },
+            sort=[("created_at", 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    def _work(self):
+        while True:
+            try:
+                self._fail_exhausted()
+                job = self._claim()
+            except Exception as e:
+                print(f"[WARN] Chat job claim failed: {e}")
+                job = None
+
+            if not job:
+                with self._wakeup:
+                    self._wakeup.wait(JOB_POLL_SECONDS)
+                continue
+
+            # A failed result write leaves the job running; its lease expiry retries it
+            try:
+                self._run(job)
+            except Exception as e:
+                print(f"[WARN] Chat job {job['_id']} could not be finished: {e}")
+
+    def _run(self, job):
+        wait_ms = (job["started_at"] - job["created_at"]).total_seconds() * 1000
+        with self._lock:
+            self._running += 1
+            self._waits_ms.append(round(wait_ms))
+
+        update = {"finished_at": datetime.utcnow()}
+        try:
+            update["result"] = self.handler(job["user_id"], job["payload"])
+            update["status"] = "done"
+        except Exception as e:
+            print(f"[ERROR] Chat job {job['_id']}: {e}")
+            traceback.print_exc()
+            update["status"] = "failed"
+            update["error"], update["error_status"] = describe_chat_error(e)
+        finally:
+            with self._lock:
+                self._running -= 1
+                if update.get("status") == "done":
+                    self._completed += 1
+                else:
+                    self._failed += 1
+
+        update["finished_at"] = datetime.utcnow()
+        chat_jobs_collection.update_one({"_id": job["_id"]}, {"$set": update, "$unset": {"lease_until": ""}})
+        with self._finished:
+            self._finished.notify_all()
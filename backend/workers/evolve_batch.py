@@ -0,0 +1,218 @@
+"""
+Batch profile evolution — evolve every recently active user in one off-peak run.
+
+Scans user messages newer than the last run, groups them per user and
+slices each user's batch at their evolution watermark. Users whose new
+messages carry profile signal are packed several to a Gemini request, the
+requests run with bounded parallelism, and all results are written back in
+one unordered bulk_write. Run from backend/:
+
+    python -m workers.evolve_batch
+    python -m workers.evolve_batch --since 2025-01-01T00:00:00 --dry-run
+"""
+
+import argparse
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from bson import ObjectId
+from pymongo import UpdateOne
+from agents.llm_router import generate
+from agents.profile_intelligence import (
+    EVOLVE_MAX_MESSAGES,
+    EVOLVE_MESSAGE_CHARS,
+    has_profile_signal,
+    merge_insights,
+    parse_insights,
+    profile_digest,
+)
+from models.conversation import get_active_user_messages
+from models.user import db, users_collection
+
+job_runs_collection = db.job_runs
+
+JOB_ID = "evolve_batch"
+USERS_PER_REQUEST = int(os.getenv("EVOLVE_BATCH_USERS_PER_REQUEST", "8"))
+PARALLEL_REQUESTS = int(os.getenv("EVOLVE_BATCH_PARALLELISM", "4"))
+FIRST_RUN_LOOKBACK_HOURS = 24
+
+BATCH_INSTRUCTION = (
+    "You are analyzing several gamers' recent messages to update their player profiles. "
+    "Each player is independent — never mix insights between players.\n\n"
+    "For EACH player id, extract only genuinely NEW insights. Respond with ONE JSON object "
+    "keyed by player id, each value shaped like:\n"
+    '{"new_interests": ["any new games or topics they mentioned"], '
+    '"mood_pattern": "their general mood/attitude in these messages", '
+    '"skill_observations": "anything revealed about their skill level", '
+    '"updated_personality_notes": "refined understanding of their personality", '
+    '"topics_to_follow_up": ["specific things to remember for next time"]}\n'
+    "Use {} for a player with nothing new. Respond ONLY with valid JSON."
+)
+
+
+def _last_run():
+    run = job_runs_collection.find_one({"_id": JOB_ID})
+    if run and run.get("last_run_at"):
+        return run["last_run_at"]
+    return datetime.utcnow() - timedelta(hours=FIRST_RUN_LOOKBACK_HOURS)
+
+
+def collect_slices(since):
+    """
+    New user messages per active user, cut at each user's watermark.
+
+    Returns a list of {"user_id", "ai_profile", "profile_version", "watermark",
+    "messages", "newest"}.
+    """
+    by_user = get_active_user_messages(since)
+    if not by_user:
+        return []
+
+    ids = [ObjectId(uid) for uid in by_user if ObjectId.is_valid(uid)]
+    users = users_collection.find(
+        {"_id": {"$in": ids}}, {"ai_profile": 1, "profile_version": 1, "evolve_watermark": 1}
+    )
+
+    slices = []
+    for user in users:
+        user_id = str(user["_id"])
+        watermark = user.get("evolve_watermark")
+        messages = [
+            m for m in by_user.get(user_id, []) if not watermark or m["timestamp"] > watermark
+        ][-EVOLVE_MAX_MESSAGES:]
+        if messages:
+            slices.append({
+                "user_id": user_id,
+                "ai_profile": user.get("ai_profile"),
+                "profile_version": user.get("profile_version"),
+                "watermark": watermark,
+                "messages": [m["content"] for m in messages],
+                "newest": messages[-1]["timestamp"],
+            })
+    return slices
+
+
+def _packed_prompt(chunk):
+    parts = []
+    for i, item in enumerate(chunk, 1):
+        lines = "\n".join(f"- {m[:EVOLVE_MESSAGE_CHARS]}" for m in item["messages"])
+        parts.append(
+            f"PLAYER p{i}\nCurrent profile (summary):\n{profile_digest(item['ai_profile'])}\n"
+            f"New messages:\n{lines}"
+        )
+    return "\n\n".join(parts)
+
+
+def evolve_chunk(chunk):
+    """One packed Gemini request for several users → {user_id: insights}."""
+    response = generate(
+        "evolve_batch",
+        [_packed_prompt(chunk)],
+        config={
+            "system_instruction": BATCH_INSTRUCTION,
+            "temperature": 0.3,
+            "max_output_tokens": 300 * len(chunk),
+        },
+    )
+    results = parse_insights(response.text)
+    return {item["user_id"]: results.get(f"p{i}") or {} for i, item in enumerate(chunk, 1)}
+
+
+def _update_for(item, insights):
+    # Guarded on the watermark and profile version we read: if the online path
+    # evolved this user or a profile build landed meanwhile, the batch result
+    # was merged into a stale profile and the write is skipped (next run retries).
+    match = {
+        "_id": ObjectId(item["user_id"]),
+        "evolve_watermark": item["watermark"],
+        "profile_version": item["profile_version"],
+    }
+    fields = {"evolve_watermark": item["newest"]}
+    update = {"$set": fields}
+    updated = merge_insights(item["ai_profile"], insights) if insights is not None else None
+    if updated:
+        fields["ai_profile"] = updated
+        # Caches keyed on profile_version must see every ai_profile change
+        update["$inc"] = {"profile_version": 1}
+    return UpdateOne(match, update), bool(updated)
+
+
+def run_batch(since=None, dry_run=False):
+    """Evolve all users active since `since` (default: the last run). Returns counters."""
+    started_at = datetime.utcnow()
+    since = since or _last_run()
+    slices = collect_slices(since)
+
+    with_signal, without_signal = [], []
+    for item in slices:
+        (with_signal if has_profile_signal(item["messages"]) else without_signal).append(item)
+    chunks = [
+        with_signal[i:i + USERS_PER_REQUEST] for i in range(0, len(with_signal), USERS_PER_REQUEST)
+    ]
+
+    insights_by_user = {}
+    failed_chunks = 0
+    with ThreadPoolExecutor(max_workers=PARALLEL_REQUESTS) as pool:
+        for chunk, result in zip(chunks, pool.map(_safe_evolve_chunk, chunks)):
+            if result is None:
+                failed_chunks += 1
+                continue
+            insights_by_user.update(result)
+
+    operations = []
+    evolved = 0
+    for item in without_signal:
+        operations.append(_update_for(item, None)[0])
+    for item in with_signal:
+        if item["user_id"] not in insights_by_user:
+            continue  # its chunk failed — keep the watermark so the next run retries
+        op, changed = _update_for(item, insights_by_user[item["user_id"]])
+        operations.append(op)
+        evolved += changed
+
+    written = 0
+    if operations and not dry_run:
+        written = users_collection.bulk_write(operations, ordered=False).modified_count
+
+    # A failed chunk leaves the last-run marker in place so its users are rescanned
+    if not dry_run and not failed_chunks:
+        job_runs_collection.update_one(
+            {"_id": JOB_ID},
+            {"$set": {"last_run_at": started_at, "users_scanned": len(slices), "users_evolved": evolved}},
+            upsert=True,
+        )
+
+    return {
+        "since": since.isoformat(),
+        "users_scanned": len(slices),
+        "users_with_signal": len(with_signal),
+        "requests": len(chunks),
+        "failed_requests": failed_chunks,
+        "users_evolved": evolved,
+        "documents_written": written,
+        "dry_run": dry_run,
+    }
+
+
+def _safe_evolve_chunk(chunk):
+    try:
+        return evolve_chunk(chunk)
+    except Exception as e:
+        print(f"[WARN] Batch evolution request for {len(chunk)} users failed: {e}")
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Evolve profiles of all recently active users")
+    parser.add_argument("--since", help="ISO timestamp; defaults to the last successful run")
+    parser.add_argument("--dry-run", action="store_true", help="call Gemini but write nothing")
+    args = parser.parse_args(argv)
+
+    since = datetime.fromisoformat(args.since) if args.since else None
+    report = run_batch(since=since, dry_run=args.dry_run)
+    print(f"[OK] Batch evolution finished: {json.dumps(report)}")
+
+
+if __name__ == "__main__":
+    main()
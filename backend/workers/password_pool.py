@@ -0,0 +1,135 @@
+"""
+Password pool — bcrypt hashing and verification in worker processes.
+
+bcrypt is deliberately slow and holds the GIL while it runs, so doing it on
+the request thread stalls every other request on that worker. Here it runs
+in a process pool sized to the cores; the request thread just waits on the
+result. In-flight work is capped, and callers get PasswordPoolBusy at once
+when the cap is hit so the route can answer 503 instead of queueing logins
+behind each other.
+
+Workers come from a forkserver (spawn where that isn't available) rather
+than a fork of the request process, which by then has Mongo clients and
+queue threads a forked child could inherit mid-lock. A pool whose worker
+died is replaced and the call retried once; a call that outlives
+BCRYPT_TIMEOUT_SECONDS is reported as busy.
+
+The fork server preloads only this module, which imports nothing but bcrypt.
+multiprocessing still re-imports the main script in each worker as
+__mp_main__: cheap under a WSGI server, but under `python app.py` that is
+app.py itself, so each worker pays its import once (app.py starts no
+background work there).
+"""
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+import bcrypt
+
+BCRYPT_WORKERS = int(os.getenv("BCRYPT_WORKERS", str(os.cpu_count() or 2)))
+BCRYPT_QUEUE_MAX = int(os.getenv("BCRYPT_QUEUE_MAX", str(max(1, BCRYPT_WORKERS) * 4)))
+BCRYPT_TIMEOUT_SECONDS = 10
+
+
+class PasswordPoolBusy(Exception):
+    """Too many hashes in flight — the caller should shed load (503)."""
+
+
+def _mp_context():
+    if "forkserver" not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("spawn")
+    context = multiprocessing.get_context("forkserver")
+    # The default preload is __main__, which would load app.py into the server
+    context.set_forkserver_preload([__name__])
+    return context
+
+
+def _hash(password, rounds):
+    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds=rounds)).decode("utf-8")
+
+
+def _verify(password, hashed_password):
+    return bcrypt.checkpw(password.encode("utf-8"), hashed_password.encode("utf-8"))
+
+
+class PasswordPool:
+    """Bounded front for a lazily started bcrypt process pool (inline when workers=0)."""
+
+    def __init__(self, workers=BCRYPT_WORKERS, queue_max=BCRYPT_QUEUE_MAX):
+        self.workers = workers
+        self._slots = threading.BoundedSemaphore(queue_max)
+        self._executor = None
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=_mp_context(),
+                )
+            return self._executor
+
+    def _reset(self, broken):
+        """Drop a broken executor so the next call starts a fresh one."""
+        with self._lock:
+            if self._executor is not broken:
+                return
+            self._executor = None
+        print("[WARN] bcrypt worker pool broke — starting a new one")
+        broken.shutdown(wait=False)
+
+    def _submit(self, fn, *args):
+        """(executor, future) for fn(*args); raises PasswordPoolBusy when full."""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise PasswordPoolBusy()
+        try:
+            executor = self._pool()
+            try:
+                future = executor.submit(fn, *args)
+            except BrokenProcessPool:
+                self._reset(executor)
+                executor = self._pool()
+                future = executor.submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return executor, future
+
+    def submit(self, fn, *args):
+        """Future for fn(*args) in the pool; raises PasswordPoolBusy when full."""
+        return self._submit(fn, *args)[1]
+
+    def run(self, fn, *args):
+        if self.workers <= 0:
+            return fn(*args)
+        for attempt in range(2):
+            executor, future = self._submit(fn, *args)
+            try:
+                return future.result(timeout=BCRYPT_TIMEOUT_SECONDS)
+            except FutureTimeout:
+                raise PasswordPoolBusy()
+            except BrokenProcessPool:
+                # A worker died mid-call (OOM kill, crash); retry once on a fresh pool
+                self._reset(executor)
+                if attempt:
+                    raise
+
+    def hash(self, password, rounds):
+        return self.run(_hash, password, rounds)
+
+    def verify(self, password, hashed_password):
+        return self.run(_verify, password, hashed_password)
+
+    def stats(self):
+        with self._lock:
+            return {"workers": self.workers, "started": self._executor is not None, "rejected": self.rejected}
+
+
+password_pool = PasswordPool()
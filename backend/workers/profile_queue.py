@@ -0,0 +1,326 @@
+"""
+Profile task queue — durable background work for profile intelligence.
+
+AI profile builds and evolutions are stored as tasks in Mongo and run by a
+fixed pool of worker threads. Enqueueing coalesces per user and kind, so
+only the latest pending job runs. A per-user lease lock keeps two workers
+(in any process) from writing one user's ai_profile at the same time.
+Failures retry with exponential backoff, and workers hold off while
+interactive requests are in flight.
+"""
+
+import os
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from models.user import db, get_full_user, set_evolve_watermark, update_ai_profile
+
+profile_tasks_collection = db.profile_tasks
+profile_locks_collection = db.profile_task_locks
+
+PROFILE_WORKERS = int(os.getenv("PROFILE_WORKERS", "2"))
+MAX_ATTEMPTS = 4
+BACKOFF_BASE_SECONDS = 5
+TASK_LEASE_SECONDS = 120
+POLL_SECONDS = 2
+MAX_DEFER_SECONDS = 10       # longest a worker yields to interactive traffic before running anyway
+DONE_TTL_DAYS = 7
+
+
+class InteractiveGauge:
+    """Counts in-flight interactive requests so background work can yield to them."""
+
+    def __init__(self):
+        self._active = 0
+        self._lock = threading.Lock()
+
+    def enter(self):
+        with self._lock:
+            self._active += 1
+
+    def exit(self):
+        with self._lock:
+            self._active = max(0, self._active - 1)
+
+    def __enter__(self):
+        self.enter()
+        return self
+
+    def __exit__(self, *exc):
+        self.exit()
+
+    @property
+    def active(self):
+        return self._active
+
+
+interactive = InteractiveGauge()
+
+
+class ProfileReadiness:
+    """
+    In-process notification that a user's profile build finished.
+
+    Waiters take a version() before reading the user, then wait() for it to
+    move past that — so a build that finishes in between is never missed.
+    """
+
+    def __init__(self):
+        self._cv = threading.Condition()
+        self._versions = {}
+
+    def version(self, user_id):
+        with self._cv:
+            return self._versions.get(user_id, 0)
+
+    def notify(self, user_id):
+        with self._cv:
+            self._versions[user_id] = self._versions.get(user_id, 0) + 1
+            self._cv.notify_all()
+
+    def wait(self, user_id, since, timeout):
+        """True if a build finished after `since` within timeout seconds."""
+        with self._cv:
+            return self._cv.wait_for(lambda: self._versions.get(user_id, 0) > since, timeout)
+
+
+profile_ready = ProfileReadiness()
+
+
+def _run_build(user_id, payload):
+    from agents.profile_intelligence import build_ai_profile, generate_welcome_message
+
+    try:
+        user = get_full_user(user_id)
+        if not user:
+            return
+        username = user.get("username", payload.get("username", "Player"))
+        profile = user.get("profile", {})
+        ai_profile = build_ai_profile(profile, username)
+        welcome = generate_welcome_message(profile, ai_profile, username)
+        update_ai_profile(user_id, ai_profile, welcome_message=welcome)
+        print(f"[OK] AI profile built for {username}: {ai_profile.get('player_archetype', '?')}")
+    finally:
+        # Wake welcome waiters even on failure so they fall back instead of hanging
+        profile_ready.notify(user_id)
+
+
+def _run_evolve(user_id, payload):
+    from agents.profile_intelligence import EVOLVE_MAX_MESSAGES, evolve_profile
+    from models.conversation import get_user_messages_since
+
+    user = get_full_user(user_id)
+    if not user:
+        return
+    messages = get_user_messages_since(user_id, user.get("evolve_watermark"), EVOLVE_MAX_MESSAGES)
+    if not messages:
+        return
+
+    # None means nothing new (or no signal, so no LLM call): the watermark still
+    # advances past these messages. An LLM or parse error raises instead, leaving
+    # the watermark in place for the task's retry.
+    watermark = messages[-1]["timestamp"]
+    updated = evolve_profile(user_id, [m["content"] for m in messages], user.get("ai_profile"))
+    if updated:
+        update_ai_profile(user_id, updated, evolve_watermark=watermark)
+        print(f"[OK] Profile evolved for user {user_id}")
+    else:
+        set_evolve_watermark(user_id, watermark)
+
+
+TASK_HANDLERS = {
+    "build": _run_build,
+    "evolve": _run_evolve,
+}
+
+
+class ProfileTaskQueue:
+    """Mongo-backed, per-user coalescing task queue with a fixed worker pool."""
+
+    def __init__(self, workers=PROFILE_WORKERS):
+        self.workers = workers
+        self._wakeup = threading.Condition()
+        self._threads = []
+
+    def start(self):
+        if self._threads:
+            return
+        try:
+            profile_tasks_collection.create_index(
+                [("user_id", 1), ("kind", 1)],
+                unique=True,
+                partialFilterExpression={"status": "pending"},
+                name="one_pending_per_user_kind",
+            )
+            profile_tasks_collection.create_index([("status", 1), ("run_after", 1)])
+            profile_tasks_collection.create_index(
+                "finished_at", expireAfterSeconds=DONE_TTL_DAYS * 86400
+            )
+            # Evolution reads each user's own messages past their watermark
+            db.conversations.create_index([("user_id", 1), ("role", 1), ("timestamp", -1)])
+        except Exception as e:
+            print(f"[WARN] Could not create profile task indexes: {e}")
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"profile-worker-{i}")
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+
+    def enqueue(self, user_id, kind, payload=None):
+        """Queue a task, replacing any pending task of the same kind for this user."""
+        now = datetime.utcnow()
+        query = {"user_id": user_id, "kind": kind, "status": "pending"}
+        update = {
+            "$set": {"payload": payload or {}, "run_after": now, "updated_at": now},
+            "$setOnInsert": {"attempts": 0, "created_at": now},
+        }
+        try:
+            profile_tasks_collection.update_one(query, update, upsert=True)
+        except DuplicateKeyError:
+            # Lost an upsert race — the other pending task now exists, so update it
+            profile_tasks_collection.update_one(query, update)
+        with self._wakeup:
+            self._wakeup.notify()
+
+    def has_pending(self, user_id, kind):
+        """True if a task of this kind is queued or running for the user."""
+        return profile_tasks_collection.count_documents(
+            {"user_id": user_id, "kind": kind, "status": {"$in": ["pending", "running"]}}, limit=1
+        ) > 0
+
+    def stats(self):
+        return {
+            "pending": profile_tasks_collection.count_documents({"status": "pending"}),
+            "running": profile_tasks_collection.count_documents({"status": "running"}),
+            "failed": profile_tasks_collection.count_documents({"status": "failed"}),
+            "workers": self.workers,
+        }
+
+    # ── Locking ──
+
+    def _lock_user(self, user_id):
+        """Take the user's lock; returns the lease token, or None if someone else holds it."""
+        until = datetime.utcnow() + timedelta(seconds=TASK_LEASE_SECONDS)
+        token = ObjectId()
+        try:
+            profile_locks_collection.insert_one({"_id": user_id, "lease_until": until, "owner": token})
+            return token
+        except DuplicateKeyError:
+            result = profile_locks_collection.update_one(
+                {"_id": user_id, "lease_until": {"$lt": datetime.utcnow()}},
+                {"$set": {"lease_until": until, "owner": token}},
+            )
+            return token if result.modified_count == 1 else None
+
+    def _unlock_user(self, user_id, token):
+        # Only our own lease: if it expired and another worker took the lock, leave theirs
+        profile_locks_collection.delete_one({"_id": user_id, "owner": token})
+
+    # ── Claiming ──
+
+    def _claim(self):
+        now = datetime.utcnow()
+        lease = {"status": "running", "lease_until": now + timedelta(seconds=TASK_LEASE_SECONDS)}
+        for query in (
+            {"status": "pending", "run_after": {"$lte": now}},
+            {"status": "running", "lease_until": {"$lt": now}},
+        ):
+            task = profile_tasks_collection.find_one_and_update(
+                query,
+                {"$set": lease},
+                sort=[("run_after", 1)],
+                return_document=ReturnDocument.AFTER,
+            )
+            if task:
+                return task
+        return None
+
+    def _requeue(self, task, delay_seconds, attempts=None):
+        """Put a task back as pending, or drop it if a newer pending task superseded it."""
+        update = {"status": "pending", "run_after": datetime.utcnow() + timedelta(seconds=delay_seconds)}
+        if attempts is not None:
+            update["attempts"] = attempts
+        try:
+            profile_tasks_collection.update_one(
+                {"_id": task["_id"]}, {"$set": update, "$unset": {"lease_until": ""}}
+            )
+        except DuplicateKeyError:
+            profile_tasks_collection.delete_one({"_id": task["_id"]})
+
+    def _yield_to_interactive(self):
+        waited = 0.0
+        while interactive.active > 0 and waited < MAX_DEFER_SECONDS:
+            time.sleep(0.25)
+            waited += 0.25
+
+    def _work(self):
+        while True:
+            try:
+                task = self._claim()
+            except Exception as e:
+                print(f"[WARN] Profile task claim failed: {e}")
+                task = None
+
+            if not task:
+                with self._wakeup:
+                    self._wakeup.wait(POLL_SECONDS)
+                continue
+
+            # Builds run straight away: the welcome endpoint is waiting on them
+            if task["kind"] != "build":
+                self._yield_to_interactive()
+
+            # A Mongo error here must not kill the worker; the task's lease expiry retries it
+            try:
+                self._process(task)
+            except Exception as e:
+                print(f"[WARN] Profile task {task['kind']} for {task['user_id']} could not be processed: {e}")
+
+    def _process(self, task):
+        token = self._lock_user(task["user_id"])
+        if not token:
+            # Another worker is busy with this user — try again shortly
+            self._requeue(task, POLL_SECONDS)
+            return
+        try:
+            self._run(task)
+        finally:
+            self._unlock_user(task["user_id"], token)
+
+    def _run(self, task):
+        handler = TASK_HANDLERS.get(task["kind"])
+        attempts = task.get("attempts", 0) + 1
+        try:
+            if not handler:
+                raise ValueError(f"Unknown profile task kind: {task['kind']}")
+            handler(task["user_id"], task.get("payload", {}))
+        except Exception as e:
+            print(f"[WARN] Profile task {task['kind']} failed for {task['user_id']} (attempt {attempts}): {e}")
+            traceback.print_exc()
+            if attempts < MAX_ATTEMPTS:
+                self._requeue(task, BACKOFF_BASE_SECONDS * 2 ** (attempts - 1), attempts)
+            else:
+                profile_tasks_collection.update_one(
+                    {"_id": task["_id"]},
+                    {
+                        "$set": {"status": "failed", "attempts": attempts, "error": str(e),
+                                 "finished_at": datetime.utcnow()},
+                        "$unset": {"lease_until": ""},
+                    },
+                )
+            return
+
+        profile_tasks_collection.update_one(
+            {"_id": task["_id"]},
+            {
+                "$set": {"status": "done", "attempts": attempts, "finished_at": datetime.utcnow()},
+                "$unset": {"lease_until": ""},
+            },
+        )
+
+
+profile_queue = ProfileTaskQueue()
@@ -0,0 +1,45 @@
+"""
+Activity counter reconciliation — repair drift in user_activity.
+
+Counters are kept with $inc on every saved turn, so a failed counter write
+or a crash between the message and counter writes leaves them slightly off.
+This job recomputes each user's counters from their stored messages and
+reports how many had drifted. Run from backend/ (e.g. nightly):
+
+    python -m workers.reconcile_activity
+    python -m workers.reconcile_activity --user 64f0c0ffee0000000000abcd
+"""
+
+import argparse
+from models.conversation import get_user_activity, reconcile_user_activity
+from models.user import users_collection
+
+COMPARED_FIELDS = ("total_messages", "assistant_messages", "total_sessions", "game_mentions")
+
+
+def reconcile(user_ids=None):
+    """Reconcile the given users (default: all); returns (checked, drifted)."""
+    if user_ids is None:
+        user_ids = (str(u["_id"]) for u in users_collection.find({}, {"_id": 1}))
+
+    checked = drifted = 0
+    for user_id in user_ids:
+        before = get_user_activity(user_id) or {}
+        after = reconcile_user_activity(user_id)
+        checked += 1
+        if any((before.get(f) or 0) != (after.get(f) or 0) for f in COMPARED_FIELDS):
+            drifted += 1
+    return checked, drifted
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Recompute per-user activity counters")
+    parser.add_argument("--user", action="append", help="only this user id (repeatable)")
+    args = parser.parse_args(argv)
+
+    checked, drifted = reconcile(args.user)
+    print(f"[OK] Reconciled activity for {checked} users ({drifted} had drifted)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Turn writer — write-behind buffer for chat persistence.
+
+With CHAT_WRITE_BEHIND on, finished chat turns are queued in memory and a
+background thread writes them in batches (one insert_many and one session
+bulk_write per flush), so the response never waits on Mongo. When the
+buffer is full the caller writes its own turn synchronously instead of
+dropping it, a failed flush puts its turns back in full, and the buffer is
+drained on interpreter shutdown.
+
+With it off, save() writes the turn inline with save_turn().
+"""
+
+import atexit
+import os
+import threading
+import traceback
+from config import CHAT_WRITE_BEHIND
+from models.conversation import build_turn, remember_messages, save_turn, write_messages
+
+FLUSH_INTERVAL_SECONDS = float(os.getenv("CHAT_WRITE_BEHIND_INTERVAL", "0.25"))
+FLUSH_BATCH_TURNS = 200
+MAX_BUFFERED_TURNS = int(os.getenv("CHAT_WRITE_BEHIND_MAX", "2000"))
+SHUTDOWN_TIMEOUT_SECONDS = 10
+
+
+class TurnWriter:
+    """Buffers chat turns and flushes them off the request thread."""
+
+    def __init__(self, enabled=CHAT_WRITE_BEHIND):
+        self.enabled = enabled
+        self._buffer = []
+        self._cv = threading.Condition()
+        self._thread = None
+        self._stopping = False
+        self._flushed_turns = 0
+        self._sync_writes = 0
+        self._failed_flushes = 0
+        self._dropped_turns = 0
+
+    def start(self):
+        if not self.enabled or self._thread:
+            return
+        self._thread = threading.Thread(target=self._run, name="turn-writer")
+        self._thread.daemon = True
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def save(self, user_id, session_id, user_content, assistant_content):
+        """Persist one chat turn — buffered when write-behind is on, inline otherwise."""
+        if not self.enabled or self._stopping:
+            return save_turn(user_id, session_id, user_content, assistant_content)
+
+        messages = build_turn(user_id, session_id, user_content, assistant_content)
+        # The session cache sees the turn now, so the next turn's history has it before the flush
+        remember_messages(messages)
+        with self._cv:
+            if len(self._buffer) < MAX_BUFFERED_TURNS:
+                self._buffer.append(messages)
+                if len(self._buffer) >= FLUSH_BATCH_TURNS:
+                    self._cv.notify()
+                return messages
+            self._sync_writes += 1
+
+        # Buffer full: back-pressure onto this request rather than losing the turn
+        write_messages(messages)
+        return messages
+
+    def flush(self):
+        """Write everything buffered so far; failed batches go back to the buffer."""
+        with self._cv:
+            batch, self._buffer = self._buffer, []
+        if not batch:
+            return 0
+        try:
+            write_messages([m for turn in batch for m in turn])
+        except Exception as e:
+            print(f"[ERROR] Chat write-behind flush of {len(batch)} turns failed: {e}")
+            traceback.print_exc()
+            with self._cv:
+                self._failed_flushes += 1
+                # Already-inserted messages are skipped as duplicates on the retry.
+                # Nothing is cut to fit: these turns were already acknowledged, and
+                # while the buffer is over MAX_BUFFERED_TURNS new turns write inline.
+                self._buffer = batch + self._buffer
+            return 0
+        with self._cv:
+            self._flushed_turns += len(batch)
+        return len(batch)
+
+    def stop(self):
+        """Stop the flusher and drain the buffer on the calling thread."""
+        if not self._thread:
+            return
+        with self._cv:
+            self._stopping = True
+            self._cv.notify()
+        self._thread.join(timeout=SHUTDOWN_TIMEOUT_SECONDS)
+        self.flush()
+        with self._cv:
+            if self._buffer:
+                # Last flush failed too; these turns die with the process
+                self._dropped_turns += len(self._buffer)
+                print(f"[ERROR] Chat write-behind lost {len(self._buffer)} turns at shutdown")
+
+    def stats(self):
+        with self._cv:
+            return {
+                "enabled": self.enabled,
+                "buffered_turns": len(self._buffer),
+                "flushed_turns": self._flushed_turns,
+                "sync_writes_when_full": self._sync_writes,
+                "failed_flushes": self._failed_flushes,
+                "dropped_turns": self._dropped_turns,
+            }
+
+    def _run(self):
+        while True:
+            with self._cv:
+                if not self._stopping and len(self._buffer) < FLUSH_BATCH_TURNS:
+                    self._cv.wait(timeout=FLUSH_INTERVAL_SECONDS)
+                if self._stopping:
+                    return
+            self.flush()
+
+
+turn_writer = TurnWriter()
@@ -51,9 +51,13 @@ export default function Chat() {
   const [showHistory, setShowHistory] = useState(false);
   const [sessions, setSessions] = useState([]);
   const [currentSession, setCurrentSession] = useState(getSessionId());
+  const [olderCursor, setOlderCursor] = useState(null);
   const messagesEndRef = useRef(null);
+  const messagesContainerRef = useRef(null);
   const inputRef = useRef(null);
   const welcomeFetched = useRef(false);
+  const loadingOlder = useRef(false);
+  const scrollAnchor = useRef(null);
 
   const scrollToBottom = () => {
     messagesEndRef.current?.scrollIntoView({ behavior: 'smooth' });
@@ -84,6 +88,13 @@ export default function Chat() {
   }, []); // eslint-disable-line react-hooks/exhaustive-deps
 
   useEffect(() => {
+    // Older messages were prepended — keep the view where it was instead of jumping down
+    const el = messagesContainerRef.current;
+    if (scrollAnchor.current !== null && el) {
+      el.scrollTop = el.scrollHeight - scrollAnchor.current;
+      scrollAnchor.current = null;
+      return;
+    }
     scrollToBottom();
   }, [messages]);
 
@@ -154,6 +165,7 @@ export default function Chat() {
   const handleNewSession = () => {
     const id = newSession();
     setCurrentSession(id);
+    setOlderCursor(null);
     fetchFreshWelcome();
   };
 
@@ -166,6 +178,7 @@ export default function Chat() {
         role: m.role,
         content: stripMoodTags(m.content),
       }));
+      setOlderCursor(data.next_cursor || null);
       if (msgs.length > 0) {
         setMessages(msgs);
       } else {
@@ -177,6 +190,23 @@ export default function Chat() {
     }
   };
 
+  const loadOlderMessages = async () => {
+    const el = messagesContainerRef.current;
+    if (!olderCursor || loadingOlder.current || !el || el.scrollTop > 40) return;
+    loadingOlder.current = true;
+    try {
+      const data = await getSessionHistory(currentSession, olderCursor);
+      const older = (data.messages || []).map(m => ({
+        role: m.role,
+        content: stripMoodTags(m.content),
+      }));
+      scrollAnchor.current = el.scrollHeight - el.scrollTop;
+      setMessages(prev => [...older, ...prev]);
+      setOlderCursor(data.next_cursor || null);
+    } catch { /* ignore */ }
+    loadingOlder.current = false;
+  };
+
   const loadSessions = async () => {
     try {
       const data = await getChatSessions();
@@ -248,7 +278,7 @@ export default function Chat() {
       )}
 
       {/* Messages */}
-      <div className="flex-1 overflow-y-auto px-4 py-6 space-y-4">
+      <div ref={messagesContainerRef} onScroll={loadOlderMessages} className="flex-1 overflow-y-auto px-4 py-6 space-y-4">
         {welcomeLoading && messages.length === 0 && (
           <div className="flex gap-3">
             <BotAvatar mood="thinking" size={32} />
@@ -2,9 +2,11 @@ import { useState, useEffect, useRef } from 'react';
 import { useNavigate } from 'react-router-dom';
 import { RiChatSmile2Line, RiRefreshLine, RiArrowRightLine, RiLightbulbLine, RiTrophyLine, RiSwordLine, RiStarLine, RiGamepadLine } from 'react-icons/ri';
 import { useAuth } from '../context/Authcontext';
-import { getDashboardGames, getDashboardTip } from '../services/api';
+import { getDashboardGames, getDashboardTip, getPendingDashboardGames } from '../services/api';
 import BotAvatar from '../components/BotAvatar';
 
+const PENDING_POLL_ROUNDS = 5;
+
 const GAME_COLORS = {
   'League of Legends': '#c8aa6e', 'Valorant': '#ff4655', 'TFT': '#e8b840',
   'Minecraft': '#62b44b', 'Call of Duty': '#ff8c00', 'Apex Legends': '#cd3333',
@@ -25,7 +27,7 @@ function GameCard({ game, onClick }) {
   const tips = meta.tips || [];
   const topTier = meta.top_tier || {};
   const summary = meta.meta_summary || null;
-  const hasError = !!meta.error;
+  const hasError = !!meta.error || game.status === 'pending';
 
   return (
     <button onClick={onClick}
@@ -121,6 +123,8 @@ export default function Dashboard() {
     try {
       const data = await getDashboardGames();
       setGames(data.games || []);
+      setLoading(false);
+      await collectPending(data.pending || []);
     } catch (err) {
       console.error('Failed to fetch dashboard games:', err);
     } finally {
@@ -129,6 +133,16 @@ export default function Dashboard() {
     }
   };
 
+  // Slow cards render as placeholders first, then fill in as their fetches finish
+  const collectPending = async (pending) => {
+    for (let round = 0; pending.length > 0 && round < PENDING_POLL_ROUNDS; round++) {
+      const data = await getPendingDashboardGames(pending);
+      const late = Object.fromEntries((data.games || []).map((game) => [game.name, game]));
+      setGames((prev) => prev.map((game) => late[game.name] || game));
+      pending = data.pending || [];
+    }
+  };
+
   const fetchTip = async () => {
     setTipLoading(true);
     try {
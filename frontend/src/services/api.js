@@ -73,8 +73,21 @@ export async function getChatSessions() {
   return response.data;
 }
 
-export async function getSessionHistory(sessionId) {
-  const response = await api.get(`/chat/history/${sessionId}`);
+// Newest page first; pass the previous response's next_cursor to load older messages
+export async function getSessionHistory(sessionId, before = null, limit = 50) {
+  const params = { limit };
+  if (before) params.before = before;
+  const response = await api.get(`/chat/history/${sessionId}`, { params });
+  return response.data;
+}
+
+export async function searchHistory(query, page = 1, limit = 20) {
+  const response = await api.get('/chat/search', { params: { q: query, page, limit } });
+  return response.data;
+}
+
+export async function exportSessionHistory(sessionId) {
+  const response = await api.get(`/chat/history/${sessionId}/export`, { responseType: 'blob' });
   return response.data;
 }
 
@@ -84,6 +97,14 @@ export async function getDashboardGames() {
   return response.data;
 }
 
+// Late results for game cards the dashboard returned as pending
+export async function getPendingDashboardGames(games) {
+  const params = new URLSearchParams();
+  games.forEach((game) => params.append('game', game));
+  const response = await api.get('/dashboard/games/pending', { params });
+  return response.data;
+}
+
 export async function getDashboardGameDetail(gameName) {
   const response = await api.get(`/dashboard/game/${encodeURIComponent(gameName)}`);
   return response.data;
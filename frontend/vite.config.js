@@ -6,7 +6,8 @@ export default defineConfig({
   plugins: [react(), tailwindcss()],
   server: {
     proxy: {
-      '/api': 'http://localhost:5000'
+      // xfwd passes the browser's address on as X-Forwarded-For (see TRUSTED_PROXIES)
+      '/api': { target: 'http://localhost:5000', xfwd: true }
     }
   }
 })
\ No newline at end of file